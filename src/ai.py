@@ -0,0 +1,739 @@
+#!/usr/bin/env python3
+"""
+Module containing the computer opponent.
+
+The search is a negamax with alpha-beta pruning over a 'BitBoard',
+using iterative deepening so that it always has a move ready when its
+time budget runs out. 'ParallelNegamax' splits the moves at the root
+over a process pool. This module does not import pygame.
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Optional
+
+from bitboard import BitBoard
+from transposition import TranspositionTable
+
+
+class SearchTimeout(Exception):
+    """
+    Custom exception to handle
+    the case that the search has
+    run out of time.
+    """
+    pass
+
+
+class SearchStats():
+    """
+    Class describing the work done by one search.
+    """
+    def __init__(self, nodes: int, elapsed: float, depth: int) -> None:
+        """
+        Constructor for 'SearchStats'.
+        """
+        self._nodes = nodes
+        self._elapsed = elapsed
+        self._depth = depth
+
+    @property
+    def nodes(self) -> int:
+        """
+        getter property for the number of nodes searched
+
+        Returns:
+            int: the integer count of positions visited.
+        """
+        return self._nodes
+
+    @property
+    def elapsed(self) -> float:
+        """
+        getter property for the search time
+
+        Returns:
+            float: the wall-clock time of the search in seconds.
+        """
+        return self._elapsed
+
+    @property
+    def depth(self) -> int:
+        """
+        getter property for the deepest completed iteration
+
+        Returns:
+            int: the depth in plies of the last completed iteration.
+        """
+        return self._depth
+
+    @property
+    def nodes_per_second(self) -> float:
+        """
+        getter property for the search speed
+
+        Returns:
+            float: the number of nodes searched per second.
+        """
+        if self._elapsed <= 0:
+            return 0.0
+        return self._nodes / self._elapsed
+
+
+class Negamax():
+    """
+    Class implementing a negamax search with alpha-beta pruning.
+    """
+    WIN_SCORE: int = 1_000_000
+
+    def __init__(self, time_budget: float = 1.0,
+                 max_depth: Optional[int] = None,
+                 table: Optional[TranspositionTable] = None) -> None:
+        """
+        Constructor for 'Negamax'.
+        """
+        self._time_budget = time_budget
+        self._max_depth = max_depth
+        self._table = table
+        self._deadline = 0.0
+        self._nodes = 0
+        self._stats = SearchStats(0, 0.0, 0)
+
+    @property
+    def time_budget(self) -> float:
+        """
+        getter property for the time budget per move
+
+        Returns:
+            float: the number of seconds the search may run for.
+        """
+        return self._time_budget
+
+    @property
+    def stats(self) -> SearchStats:
+        """
+        getter property for the statistics of the last search
+
+        Returns:
+            SearchStats: the nodes, time and depth of the last search.
+        """
+        return self._stats
+
+    @property
+    def table(self) -> Optional[TranspositionTable]:
+        """
+        getter property for the transposition table
+
+        Returns:
+            Optional[TranspositionTable]: the table shared by every
+            search, or None if positions are not cached.
+        """
+        return self._table
+
+    def _to_table(self, score: int, ply: int) -> int:
+        """
+        Make a win or loss score relative to the position being stored
+        rather than to the root of the search.
+        """
+        if score > self.WIN_SCORE // 2:
+            return score + ply
+        if score < -self.WIN_SCORE // 2:
+            return score - ply
+        return score
+
+    def _from_table(self, score: int, ply: int) -> int:
+        """
+        Undo '_to_table' for a score read back at a given ply.
+        """
+        if score > self.WIN_SCORE // 2:
+            return score - ply
+        if score < -self.WIN_SCORE // 2:
+            return score + ply
+        return score
+
+    @staticmethod
+    def column_order(cols: int) -> list[int]:
+        """
+        Get the columns ordered from the center outwards, since central
+        columns take part in the most lines.
+        """
+        return sorted(range(cols), key=lambda col: abs(2 * col - cols + 1))
+
+    def evaluate(self, state: BitBoard, player_number: int) -> int:
+        """
+        Score a position from the point of view of a player.
+
+        Open threats are worth the most, with a small bonus for pieces
+        in the center column.
+        """
+        other = 3 - player_number
+        center = state.cols // 2
+        center_mask = ((1 << state.rows) - 1) << (center * state.stride)
+        score = 8 * (state.threats(player_number).bit_count() -
+                     state.threats(other).bit_count())
+        score += ((state.bitboard(player_number) & center_mask).bit_count() -
+                  (state.bitboard(other) & center_mask).bit_count())
+        return score
+
+    def _probe(self, key: int, depth: int, alpha: int, beta: int,
+               ply: int) -> tuple[Optional[int], int, int, int]:
+        """
+        Look a position up in the transposition table.
+
+        Returns the score if the stored result settles the position,
+        otherwise None, along with the narrowed alpha-beta window and the
+        stored best move (-1 if there is none).
+        """
+        if self._table is None:
+            return None, alpha, beta, -1
+        entry = self._table.lookup(key)
+        if entry is None:
+            return None, alpha, beta, -1
+        stored_depth, stored_score, flag, move = entry
+        if stored_depth >= depth:
+            score = self._from_table(stored_score, ply)
+            if flag == TranspositionTable.EXACT:
+                return score, alpha, beta, move
+            if flag == TranspositionTable.LOWER:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score, alpha, beta, move
+        return None, alpha, beta, move
+
+    def _record(self, key: int, depth: int, best: int, alpha: int,
+                beta: int, move: int, ply: int) -> None:
+        """
+        Store the result of a search in the transposition table, with
+        'alpha' and 'beta' being the window the search started with.
+        """
+        if self._table is None:
+            return
+        if best <= alpha:
+            flag = TranspositionTable.UPPER
+        elif best >= beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        self._table.store(key, depth, self._to_table(best, ply), flag, move)
+
+    @staticmethod
+    def _orient(state: BitBoard, move: int) -> int:
+        """
+        Convert a move between the position and the orientation its
+        table entry is stored in, which are mirror images of each other
+        unless the position is canonical. Converting twice gives the
+        move back.
+        """
+        if move < 0 or state.is_canonical():
+            return move
+        return state.mirror_col(move)
+
+    def _leaf(self, state: BitBoard, depth: int, player_number: int,
+              ply: int) -> Optional[int]:
+        """
+        Score a position without searching further, if possible: a full
+        board is a draw, a playable threat is a win, and at depth 0 the
+        heuristic evaluation is used. Returns None otherwise.
+        """
+        playable = state.playable()
+        if not playable:
+            return 0
+        if state.threats(player_number) & playable:
+            return self.WIN_SCORE - ply
+        if depth == 0:
+            return self.evaluate(state, player_number)
+        return None
+
+    def _negamax(self, state: BitBoard, order: list[int], depth: int,
+                 alpha: int, beta: int, player_number: int, ply: int) -> int:
+        """
+        Search a position and return its score for 'player_number'.
+        """
+        self._nodes += 1
+        if self._nodes & 1023 == 0 and time.perf_counter() > self._deadline:
+            raise SearchTimeout
+        leaf = self._leaf(state, depth, player_number, ply)
+        if leaf is not None:
+            return leaf
+
+        # A position and its mirror image share a table entry
+        key = state.canonical_zobrist << 1 | (player_number - 1)
+        # The bound stored is against the window asked for, not the one
+        # narrowed by a shallower entry
+        window = (alpha, beta)
+        known, alpha, beta, first = self._probe(key, depth, alpha, beta, ply)
+        if known is not None:
+            return known
+        first = self._orient(state, first)
+        moves = order
+        if first >= 0:
+            moves = [first] + [col for col in order if col != first]
+
+        other = 3 - player_number
+        best = -self.WIN_SCORE
+        best_move = -1
+        # Every move is taken back before the next, so the mask holds
+        legal = state.legal_mask
+        for col in moves:
+            if not legal >> col & 1:
+                continue
+            state.drop(col, player_number)
+            score = -self._negamax(state, order, depth - 1, -beta, -alpha,
+                                   other, ply + 1)
+            state.undo(col)
+            if score > best:
+                best = score
+                best_move = col
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        self._record(key, depth, best, window[0], window[1],
+                     self._orient(state, best_move), ply)
+        return best
+
+    def score_move(self, state: BitBoard, col: int, depth: int,
+                   alpha: int, player_number: int,
+                   bound: Optional[Callable[[], int]] = None) -> int:
+        """
+        Score dropping a piece in 'col', searching 'depth' plies deep.
+
+        Scores at or below 'alpha' only say that the move is no better
+        than one already found. 'bound' is asked again before each
+        reply of the opponent, for a higher 'alpha' found meanwhile by
+        searches of the other moves.
+        """
+        order = self.column_order(state.cols)
+        other = 3 - player_number
+        row = state.drop(col, player_number)
+        self._nodes += 1
+        try:
+            if state.wins_at(col, row, player_number):
+                return self.WIN_SCORE
+            leaf = self._leaf(state, depth - 1, other, 1)
+            if leaf is not None:
+                return -leaf
+            # The opponent's search, with its beta following 'alpha'
+            best = -self.WIN_SCORE
+            legal = state.legal_mask
+            for reply in order:
+                if bound is not None:
+                    alpha = max(alpha, bound())
+                if best >= -alpha:
+                    break
+                if not legal >> reply & 1:
+                    continue
+                state.drop(reply, other)
+                score = -self._negamax(state, order, depth - 2, alpha,
+                                       -best, player_number, 2)
+                state.undo(reply)
+                best = max(best, score)
+            return -best
+        finally:
+            state.undo(col)
+
+    def search(self, state: BitBoard, player_number: int) -> int:
+        """
+        Choose a column for 'player_number' to play.
+
+        Deepens one ply at a time until the time budget or maximum depth
+        is reached, and returns the best move of the deepest completed
+        iteration.
+        """
+        start = time.perf_counter()
+        self._deadline = start + self._time_budget
+        self._nodes = 0
+        if self._table is not None:
+            self._table.new_search()
+        state = state.copy()
+        order = self.column_order(state.cols)
+        legal = state.legal_mask
+        moves = [col for col in order if legal >> col & 1]
+        if not moves:
+            raise ValueError("No legal moves left")
+        best_move = moves[0]
+        completed = 0
+        max_depth = self._max_depth or state.cols * state.rows
+        other = 3 - player_number
+        try:
+            for depth in range(1, max_depth + 1):
+                alpha = -self.WIN_SCORE
+                iteration_best = moves[0]
+                for col in moves:
+                    state.drop(col, player_number)
+                    if state.wins_at(col, state.height(col) - 1,
+                                     player_number):
+                        score = self.WIN_SCORE
+                    else:
+                        score = -self._negamax(state, order, depth - 1,
+                                               -self.WIN_SCORE, -alpha,
+                                               other, 1)
+                    state.undo(col)
+                    if score > alpha:
+                        alpha = score
+                        iteration_best = col
+                best_move = iteration_best
+                completed = depth
+                # Search the previous best move first on the next pass.
+                moves.remove(best_move)
+                moves.insert(0, best_move)
+                if abs(alpha) >= self.WIN_SCORE - max_depth:
+                    break
+        except SearchTimeout:
+            pass
+        self._stats = SearchStats(self._nodes, time.perf_counter() - start,
+                                  completed)
+        return best_move
+
+
+def default_workers() -> int:
+    """
+    Get the number of processes to search with by default: one per
+    core this process may run on, which can be fewer than the machine
+    has. 'AIPlayer' searches without a pool when it is 1.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return multiprocessing.cpu_count()
+
+
+# The search, shared bound and position last searched from by a
+# 'ParallelNegamax' worker process
+_worker_search: Optional[Negamax] = None
+_worker_alpha: Any = None
+_worker_root: Optional[int] = None
+
+
+def _start_worker(alpha: Any) -> None:
+    """
+    Set up a worker process. Its transposition table is kept from one
+    task to the next.
+    """
+    global _worker_search, _worker_alpha
+    _worker_search = Negamax(table=TranspositionTable())
+    _worker_alpha = alpha
+
+
+def _bound() -> int:
+    """
+    Get the best score found so far by any worker.
+    """
+    return int(_worker_alpha.value)
+
+
+def _score_root_move(state: BitBoard, player_number: int, col: int,
+                     depth: int, seconds: float
+                     ) -> tuple[int, Optional[int], int]:
+    """
+    Score one root move in a worker process. Returns the column, its
+    score, or None if the time ran out, and the nodes searched.
+    """
+    global _worker_root
+    search = _worker_search
+    assert search is not None and search.table is not None
+    root = state.key(player_number)
+    if root != _worker_root:
+        # A new position, so the last one's results may be replaced
+        search.table.new_search()
+        _worker_root = root
+    search._deadline = time.perf_counter() + seconds
+    search._nodes = 0
+    try:
+        score: Optional[int] = search.score_move(state, col, depth,
+                                                 _bound(), player_number,
+                                                 _bound)
+    except SearchTimeout:
+        score = None
+    return col, score, search._nodes
+
+
+class ParallelNegamax(Negamax):
+    """
+    Class implementing a negamax search that scores each move at the
+    root in its own task over a pool of worker processes.
+
+    The best score found so far is kept in shared memory, and every
+    worker reads it between the opponent's replies, so a good move found
+    by one worker narrows the searches of the others. A root move is
+    always scored by the same worker, whose transposition table still
+    holds the positions it searched below it one ply shallower.
+    """
+    def __init__(self, time_budget: float = 1.0,
+                 max_depth: Optional[int] = None,
+                 workers: Optional[int] = None) -> None:
+        """
+        Constructor for 'ParallelNegamax'. The pool has 'workers'
+        processes, one per core by default. It is started by 'start',
+        or else by the first search, and stopped by 'close'.
+        """
+        super().__init__(time_budget, max_depth)
+        self._workers = workers or default_workers()
+        # Spawned workers do not inherit the locks of the game's threads
+        self._context = multiprocessing.get_context("spawn")
+        self._alpha = self._context.Value("q", -self.WIN_SCORE, lock=False)
+        # one single-process executor per worker, so that tasks can be
+        # handed to a chosen worker
+        self._pool: list[ProcessPoolExecutor] = []
+        # whether the last iteration found a forced win or loss
+        self._won = False
+
+    def __enter__(self) -> 'ParallelNegamax':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    @property
+    def workers(self) -> int:
+        """
+        getter property for the size of the process pool
+
+        Returns:
+            int: the number of processes searching at once.
+        """
+        return self._workers
+
+    def start(self) -> None:
+        """
+        Start every worker process, so that the first search does not
+        spend its time budget on it.
+        """
+        if not self._pool:
+            self._pool = [ProcessPoolExecutor(
+                1, self._context, initializer=_start_worker,
+                initargs=(self._alpha,)) for worker in range(self._workers)]
+        for future in [worker.submit(time.sleep, 0)
+                       for worker in self._pool]:
+            future.result()
+
+    def close(self) -> None:
+        """
+        Stop the worker processes.
+        """
+        for worker in self._pool:
+            worker.shutdown(cancel_futures=True)
+        self._pool = []
+
+    def _worker(self, col: int) -> ProcessPoolExecutor:
+        """
+        Get the worker that scores the root move in 'col' at every
+        depth.
+        """
+        return self._pool[col % len(self._pool)]
+
+    def _iteration(self, state: BitBoard, moves: list[int], depth: int,
+                   player_number: int) -> tuple[Optional[int], int]:
+        """
+        Score every root move 'depth' plies deep. Returns the best move,
+        or None if the time ran out first, and the nodes searched.
+        """
+        self._alpha.value = alpha = -self.WIN_SCORE
+        seconds = self._deadline - time.perf_counter()
+        futures = [self._worker(col).submit(_score_root_move, state,
+                                            player_number, col, depth,
+                                            seconds)
+                   for col in moves]
+        best_move: Optional[int] = None
+        nodes = 0
+        finished = True
+        for future in as_completed(futures):
+            col, score, searched = future.result()
+            nodes += searched
+            if score is None:
+                finished = False
+            elif score > alpha:
+                self._alpha.value = alpha = score
+                best_move = col
+        if abs(alpha) >= self.WIN_SCORE - depth:
+            self._won = True
+        return best_move if finished else None, nodes
+
+    def search(self, state: BitBoard, player_number: int) -> int:
+        """
+        Choose a column for 'player_number' to play, deepening one ply
+        at a time like 'Negamax.search'.
+        """
+        start = time.perf_counter()
+        self._deadline = start + self._time_budget
+        if not self._pool:
+            self.start()
+        legal = state.legal_mask
+        moves = [col for col in self.column_order(state.cols)
+                 if legal >> col & 1]
+        if not moves:
+            raise ValueError("No legal moves left")
+        best_move = moves[0]
+        completed = 0
+        nodes = 0
+        self._won = False
+        max_depth = self._max_depth or state.cols * state.rows
+        for depth in range(1, max_depth + 1):
+            iteration_best, searched = self._iteration(state, moves, depth,
+                                                       player_number)
+            nodes += searched
+            if iteration_best is None:
+                break
+            best_move = iteration_best
+            completed = depth
+            # Hand out the previous best move first on the next pass.
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+            if self._won:
+                break
+        self._stats = SearchStats(nodes, time.perf_counter() - start,
+                                  completed)
+        return best_move
+
+
+def speedup(state: BitBoard, player_number: int, depth: int,
+            workers: Optional[int] = None) -> dict[str, float]:
+    """
+    Time a search 'depth' plies deep on one core and over a process
+    pool, and give the times, the nodes searched and the speedup.
+    """
+    serial = Negamax(math.inf, depth, TranspositionTable())
+    serial.search(state, player_number)
+    with ParallelNegamax(math.inf, depth, workers) as parallel:
+        parallel.start()
+        parallel.search(state, player_number)
+    return {"workers": parallel.workers,
+            "serial": serial.stats.elapsed,
+            "parallel": parallel.stats.elapsed,
+            "serial_nodes": serial.stats.nodes,
+            "parallel_nodes": parallel.stats.nodes,
+            "speedup": serial.stats.elapsed / parallel.stats.elapsed}
+
+
+class AIPlayer():
+    """
+    Class describing a computer player that searches in a
+    background thread, so the game loop keeps drawing frames.
+    """
+    def __init__(self, player_number: int = 2,
+                 time_budget: float = 1.0,
+                 max_depth: Optional[int] = None,
+                 workers: int = 1) -> None:
+        """
+        Constructor for 'AIPlayer'. With more than one worker, the
+        search is split over that many processes, which are started
+        here rather than in the first move's time, and stopped by
+        'close'.
+        """
+        self._player_number = player_number
+        self._search: Negamax
+        if workers > 1:
+            parallel = ParallelNegamax(time_budget, max_depth, workers)
+            parallel.start()
+            self._search = parallel
+        else:
+            self._search = Negamax(time_budget, max_depth,
+                                   TranspositionTable())
+        self._thread: Optional[threading.Thread] = None
+        self._result: Optional[int] = None
+
+    @property
+    def player_number(self) -> int:
+        """
+        getter property for the player the AI plays as
+
+        Returns:
+            int: the player number, 1 or 2.
+        """
+        return self._player_number
+
+    @property
+    def stats(self) -> SearchStats:
+        """
+        getter property for the statistics of the last search
+
+        Returns:
+            SearchStats: the nodes, time and depth of the last search.
+        """
+        return self._search.stats
+
+    def choose_move(self, state: BitBoard) -> int:
+        """
+        Search a position and return the chosen column, blocking
+        until the search is done.
+        """
+        return self._search.search(state, self._player_number)
+
+    def _run(self, state: BitBoard) -> None:
+        """
+        Thread target storing the chosen column.
+        """
+        self._result = self.choose_move(state)
+
+    def start(self, state: BitBoard) -> None:
+        """
+        Start searching a copy of a position in the background.
+        """
+        self._result = None
+        self._thread = threading.Thread(target=self._run,
+                                        args=(state.copy(),),
+                                        daemon=True)
+        self._thread.start()
+
+    def thinking(self) -> bool:
+        """
+        Check if a background search is in progress.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def result(self) -> Optional[int]:
+        """
+        Collect the column chosen by a finished background search.
+        Returns None while the search is still running or if no
+        search was started.
+        """
+        if self._thread is None or self._thread.is_alive():
+            return None
+        self._thread = None
+        return self._result
+
+    def close(self) -> None:
+        """
+        Stop the processes searching for the player, if any.
+        """
+        if isinstance(self._search, ParallelNegamax):
+            self._search.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Main function. When called, this function times a search of a
+    position on one core and over a process pool, and prints the
+    speedup.
+    """
+    parser = argparse.ArgumentParser(
+        description="Compare the parallel search with a single core.")
+    parser.add_argument("moves", nargs="?", default="",
+                        help="columns played so far, 1 being the leftmost")
+    parser.add_argument("--depth", type=int, default=9)
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="processes to search with (default: one "
+                             "per core this process may use)")
+    args = parser.parse_args(argv or [])
+
+    state = BitBoard()
+    for turn, move in enumerate(args.moves):
+        state.drop(int(move) - 1, 1 + turn % 2)
+    result = speedup(state, 1 + len(args.moves) % 2, args.depth,
+                     args.workers)
+    print(f"depth {args.depth}: 1 core {result['serial']:.3f} s "
+          f"({result['serial_nodes']:.0f} nodes), "
+          f"{result['workers']:.0f} workers {result['parallel']:.3f} s "
+          f"({result['parallel_nodes']:.0f} nodes), "
+          f"{result['speedup']:.2f}x speedup")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Module to store many games compactly.
+
+An archive starts with a header giving the board size and the number of
+pieces in a row needed to win, followed by one record per game:
+
+- the number of moves, as a variable-length integer,
+- the winner, as one byte (0 for a tie),
+- the columns played, packed 'bits_per_move' bits each (3 bits for the
+  standard 7 columns), padded to a whole byte.
+
+A finished archive ends with an index of where each record starts and
+a footer, so the reader can jump straight to any game. An archive whose
+writer was never closed has no index and is read record by record.
+
+A game and its left/right mirror image are the same game for analysis,
+so writers can be asked to keep only the first of the two.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Iterator, Optional
+
+from board import Board
+
+HEADER: struct.Struct = struct.Struct("<4sBBBBB3x")
+FOOTER: struct.Struct = struct.Struct("<QQ4s")
+MAGIC: bytes = b"C4MA"
+INDEX_MAGIC: bytes = b"C4IX"
+VERSION: int = 1
+
+
+def bits_per_move(cols: int) -> int:
+    """
+    Get the number of bits needed to store a column number.
+    """
+    return max(1, (cols - 1).bit_length())
+
+
+def pack_moves(moves: list[int], bits: int) -> bytes:
+    """
+    Pack column numbers 'bits' bits each, the first move in the lowest
+    bits.
+    """
+    value = 0
+    for index, move in enumerate(moves):
+        value |= move << (index * bits)
+    return value.to_bytes((len(moves) * bits + 7) // 8, "little")
+
+
+def unpack_moves(data: bytes, count: int, bits: int) -> list[int]:
+    """
+    Undo 'pack_moves'.
+    """
+    value = int.from_bytes(data, "little")
+    mask = (1 << bits) - 1
+    return [(value >> (index * bits)) & mask for index in range(count)]
+
+
+def mirror_moves(moves: list[int], cols: int) -> list[int]:
+    """
+    Get the moves of the mirror image of a game.
+    """
+    return [cols - 1 - move for move in moves]
+
+
+def canonical_moves(moves: list[int], cols: int) -> list[int]:
+    """
+    Get the moves of a game or of its mirror image, whichever comes
+    first in order, so both give the same list.
+    """
+    return min(moves, mirror_moves(moves, cols))
+
+
+def _varint(value: int) -> bytes:
+    """
+    Encode a non-negative integer 7 bits per byte, lowest first, with
+    the top bit set on every byte but the last.
+    """
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+class ArchiveWriter():
+    """
+    Class that appends games to an archive as they are played.
+    """
+    def __init__(self, path: str, cols: int = 7, rows: int = 6,
+                 connect: int = 4, unique: bool = False) -> None:
+        """
+        Constructor for 'ArchiveWriter'.
+
+        With 'unique', a game is skipped if it or its mirror image was
+        written before.
+        """
+        if cols > 255 or rows > 255 or connect > 255:
+            raise ValueError("Board too large for an archive")
+        self._file: BinaryIO = open(path, "wb")
+        self._cols = cols
+        self._bits = bits_per_move(cols)
+        self._file.write(HEADER.pack(MAGIC, VERSION, cols, rows, connect,
+                                     self._bits))
+        self._offsets = array("Q")
+        self._position = HEADER.size
+        self._seen: Optional[set[bytes]] = set() if unique else None
+        self._skipped = 0
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    @property
+    def count(self) -> int:
+        """
+        getter property for the number of games written
+
+        Returns:
+            int: the integer count of games in the archive.
+        """
+        return len(self._offsets)
+
+    @property
+    def skipped(self) -> int:
+        """
+        getter property for the number of repeated games left out
+
+        Returns:
+            int: the integer count of games not written because they,
+            or their mirror images, were already in the archive.
+        """
+        return self._skipped
+
+    def write(self, moves: list[int], winner: int) -> bool:
+        """
+        Append a game given by the columns played and its winner.
+        Returns false if it was left out as a repeat.
+        """
+        if any(not 0 <= move < self._cols for move in moves):
+            raise ValueError("Move outside the board")
+        if self._seen is not None:
+            key = _varint(len(moves)) + pack_moves(
+                canonical_moves(moves, self._cols), self._bits)
+            if key in self._seen:
+                self._skipped += 1
+                return False
+            self._seen.add(key)
+        record = (_varint(len(moves)) + bytes((winner,)) +
+                  pack_moves(moves, self._bits))
+        self._offsets.append(self._position)
+        self._file.write(record)
+        self._position += len(record)
+        return True
+
+    def close(self) -> None:
+        """
+        Write the index and close the file.
+        """
+        if self._file.closed:
+            return
+        offsets = self._offsets
+        if sys.byteorder == "big":
+            # The index is little-endian, like the header and footer
+            offsets = array("Q", offsets)
+            offsets.byteswap()
+        self._file.write(offsets.tobytes())
+        self._file.write(FOOTER.pack(self._position, len(self._offsets),
+                                     INDEX_MAGIC))
+        self._file.close()
+
+
+class ArchiveReader():
+    """
+    Class that reads games from a memory-mapped archive, decoding
+    only the games asked for.
+    """
+    def __init__(self, path: str) -> None:
+        """
+        Constructor for 'ArchiveReader'.
+        """
+        with open(path, "rb") as archive:
+            size = os.fstat(archive.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"Not a game archive: {path}")
+            self._map = mmap.mmap(archive.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        magic, version, self._cols, self._rows, self._connect, \
+            self._bits = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"Not a game archive: {path}")
+        self._offsets = self._read_index()
+
+    def _read_index(self) -> 'array[int]':
+        """
+        Read the index of a closed archive, or build it by walking the
+        records of one that was not closed.
+        """
+        size = len(self._map)
+        if size >= HEADER.size + FOOTER.size:
+            end, count, magic = FOOTER.unpack_from(self._map,
+                                                   size - FOOTER.size)
+            if magic == INDEX_MAGIC and end + 8 * count + FOOTER.size == size:
+                offsets = array("Q")
+                offsets.frombytes(self._map[end:end + 8 * count])
+                if sys.byteorder == "big":
+                    offsets.byteswap()
+                return offsets
+        offsets = array("Q")
+        position = HEADER.size
+        while position < size:
+            count, start = self._header_at(position)
+            following = start + 1 + (count * self._bits + 7) // 8
+            if following > size:
+                # The last record was cut short
+                break
+            offsets.append(position)
+            position = following
+        return offsets
+
+    def _header_at(self, position: int) -> tuple[int, int]:
+        """
+        Decode the move count of the record at 'position'. Returns the
+        count and the position of the winner byte.
+        """
+        count = 0
+        shift = 0
+        while True:
+            if position >= len(self._map):
+                return 0, len(self._map)
+            byte = self._map[position]
+            position += 1
+            count |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return count, position
+            shift += 7
+
+    def __enter__(self) -> 'ArchiveReader':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    @property
+    def cols(self) -> int:
+        """
+        getter property for the column count of the games' board
+
+        Returns:
+            int: the integer count for columns.
+        """
+        return int(self._cols)
+
+    @property
+    def rows(self) -> int:
+        """
+        getter property for the row count of the games' board
+
+        Returns:
+            int: the integer count for rows.
+        """
+        return int(self._rows)
+
+    @property
+    def connect(self) -> int:
+        """
+        getter property for the run length needed to win
+
+        Returns:
+            int: the number of pieces a player needs in a row.
+        """
+        return int(self._connect)
+
+    def game(self, index: int) -> tuple[list[int], int]:
+        """
+        Get the columns played and the winner of a game.
+        """
+        count, start = self._header_at(self._offsets[index])
+        data = self._map[start + 1:start + 1 + (count * self._bits + 7) // 8]
+        return unpack_moves(data, count, self._bits), self._map[start]
+
+    def __getitem__(self, index: int) -> tuple[list[int], int]:
+        return self.game(index)
+
+    def __iter__(self) -> Iterator[tuple[list[int], int]]:
+        for index in range(len(self._offsets)):
+            yield self.game(index)
+
+    def replay(self, index: int, moves: Optional[int] = None) -> Board:
+        """
+        Play a game, or its first 'moves' moves, onto a new board.
+        """
+        board = Board(self.cols, self.rows, self.connect)
+        played, unused = self.game(index)
+        for turn, column in enumerate(played[:moves]):
+            board.drop_piece(column, 1 + turn % 2)
+        return board
+
+    def close(self) -> None:
+        """
+        Unmap the file.
+        """
+        self._map.close()
+
+
+def dedupe(source: str, target: str) -> tuple[int, int]:
+    """
+    Copy an archive, leaving out the games that repeat an earlier game
+    or its mirror image. Returns the numbers of games kept and left out.
+    """
+    with ArchiveReader(source) as reader, \
+            ArchiveWriter(target, reader.cols, reader.rows, reader.connect,
+                          unique=True) as writer:
+        for moves, winner in reader:
+            writer.write(moves, winner)
+    return writer.count, writer.skipped
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Main function. When called, this function converts games saved as
+    JSON lines, such as the output of 'simulate.py', to an archive.
+    """
+    parser = argparse.ArgumentParser(
+        description="Pack games saved as JSON lines into an archive.")
+    parser.add_argument("input", help="JSON lines with 'moves' and "
+                                      "'winner' fields")
+    parser.add_argument("output")
+    parser.add_argument("--cols", type=int, default=7)
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--connect", type=int, default=4)
+    parser.add_argument("--unique", action="store_true",
+                        help="leave out games repeating an earlier game "
+                             "or its mirror image")
+    args = parser.parse_args(argv or [])
+
+    with open(args.input) as games, \
+            ArchiveWriter(args.output, args.cols, args.rows, args.connect,
+                          args.unique) as archive:
+        for line in games:
+            if line.strip():
+                record = json.loads(line)
+                archive.write(record["moves"], record["winner"])
+    before = os.path.getsize(args.input)
+    after = os.path.getsize(args.output)
+    if archive.skipped:
+        print(f"{archive.skipped} repeated games left out")
+    print(f"{archive.count} games: {before} bytes -> {after} bytes "
+          f"({before / max(after, 1):.1f}x smaller)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,119 @@
+"""
+Module to evaluate many positions at once with NumPy.
+
+A batch of positions is an '(N, rows, cols)' int8 array holding the
+values 'Board.get_player_at_spot' returns, so 'boards[n, y, x]' is 0 for
+an empty cell or the number of the player whose piece is there, with
+row 0 at the bottom.
+"""
+
+from typing import Iterable
+
+import numpy as np
+import numpy.typing as npt
+
+from board import Board
+
+# The four line directions as (row step, column step).
+DIRECTIONS: tuple[tuple[int, int], ...] = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def to_array(boards: Iterable[Board]) -> npt.NDArray[np.int8]:
+    """
+    Stack boards of the same size into an '(N, rows, cols)' array.
+    """
+    stack = list(boards)
+    if not stack:
+        return np.zeros((0, 0, 0), dtype=np.int8)
+    cells = b"".join(board.cells() for board in stack)
+    return np.frombuffer(cells, dtype=np.int8).reshape(
+        len(stack), stack[0].height, stack[0].width).copy()
+
+
+def from_moves(games: Iterable[list[int]], cols: int = 7,
+               rows: int = 6) -> npt.NDArray[np.int8]:
+    """
+    Build the final positions of games given as lists of columns
+    played, such as the 'moves' of simulation records. Player 1 is
+    assumed to move first.
+    """
+    positions = []
+    for moves in games:
+        grid = np.zeros((rows, cols), dtype=np.int8)
+        height = [0] * cols
+        for turn, col in enumerate(moves):
+            grid[height[col], col] = 1 + turn % 2
+            height[col] += 1
+        positions.append(grid)
+    return np.array(positions, dtype=np.int8).reshape(-1, rows, cols)
+
+
+def _lines(pieces: npt.NDArray[np.bool_], dy: int, dx: int,
+           connect: int) -> npt.NDArray[np.bool_]:
+    """
+    Find the cells that start a run of 'connect' pieces in direction
+    (dy, dx), by AND-ing shifted views of the board together.
+    """
+    rows, cols = pieces.shape[1:]
+    span = connect - 1
+    ylen = rows - span * dy
+    xlen = cols - span * abs(dx)
+    x0 = span if dx < 0 else 0
+    if ylen <= 0 or xlen <= 0:
+        return np.zeros((len(pieces), 0, 0), dtype=bool)
+    run = pieces[:, 0:ylen, x0:x0 + xlen].copy()
+    for k in range(1, connect):
+        y = k * dy
+        x = x0 + k * dx
+        run &= pieces[:, y:y + ylen, x:x + xlen]
+    return run
+
+
+def has_won(boards: npt.NDArray[np.int8], player_number: int,
+            connect: int = 4) -> npt.NDArray[np.bool_]:
+    """
+    Check which positions have a line of 'connect' pieces for a player.
+    """
+    pieces = boards == player_number
+    found = np.zeros(len(boards), dtype=bool)
+    for dy, dx in DIRECTIONS:
+        run = _lines(pieces, dy, dx, connect)
+        found |= run.reshape(len(boards), -1).any(axis=1)
+    return found
+
+
+def winners(boards: npt.NDArray[np.int8],
+            connect: int = 4) -> npt.NDArray[np.int8]:
+    """
+    Get the winner of each position: 0 if nobody has a line, 1 or 2 for
+    the player who does, and 3 if both do (which cannot happen in play).
+    """
+    return (has_won(boards, 1, connect).astype(np.int8) +
+            2 * has_won(boards, 2, connect).astype(np.int8))
+
+
+def heights(boards: npt.NDArray[np.int8]) -> npt.NDArray[np.int64]:
+    """
+    Get the height of every column: one more than the row of its
+    highest piece, or 0 if it is empty.
+    """
+    rows = boards.shape[1]
+    occupied = boards != 0
+    top = rows - np.argmax(occupied[:, ::-1, :], axis=1)
+    return np.where(occupied.any(axis=1), top, 0).astype(np.int64)
+
+
+def legal_moves(boards: npt.NDArray[np.int8]) -> npt.NDArray[np.bool_]:
+    """
+    Get an '(N, cols)' mask of the columns that can still be played.
+    """
+    return np.asarray(boards[:, -1, :] == 0)
+
+
+def is_draw(boards: npt.NDArray[np.int8],
+            connect: int = 4) -> npt.NDArray[np.bool_]:
+    """
+    Check which positions are full boards without a winner.
+    """
+    return np.asarray(~legal_moves(boards).any(axis=1) &
+                      (winners(boards, connect) == 0))
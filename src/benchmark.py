@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Benchmark module.
+
+Times the hot paths of the game: dropping pieces, checking for a win,
+iterating over the board, drawing it and playing whole games without a
+window. Results are saved as JSON and compared against a stored
+baseline, so that a change making one of them slower is noticed.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+from typing import Any, Callable, Optional
+
+from board import Board, BoardIterator
+from graphics import Renderer
+from simulate import GreedyPolicy, RandomPolicy, play_game
+
+# The baseline shipped with the repository.
+BASELINE_PATH: str = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "benchmarks", "baseline.json")
+
+# A benchmark builds the function to time, and says how many operations
+# one call of it performs.
+Benchmark = Callable[[], tuple[Callable[[], object], int]]
+
+
+def filling_moves(seed: int = 0) -> list[int]:
+    """
+    Get an order of the columns that fills the standard board.
+    """
+    moves = [col for col in range(7) for row in range(6)]
+    random.Random(seed).shuffle(moves)
+    return moves
+
+
+def dropped_board(count: int) -> Board:
+    """
+    Get a board holding the first 'count' pieces of 'filling_moves',
+    dropped one by one.
+    """
+    board = Board()
+    for turn, col in enumerate(filling_moves()[:count]):
+        board.drop_piece(col, 1 + turn % 2)
+    return board
+
+
+def loaded_board(count: int) -> Board:
+    """
+    Get the same board as 'dropped_board', with the pieces placed cell
+    by cell, so that win checks have to scan it.
+    """
+    board = Board()
+    # Emptying a cell by hand is enough to make an empty board scanned
+    board.set_player_at_spot(0, 0, 0)
+    for row, col, player_number in dropped_board(count).occupied():
+        board.set_player_at_spot(col, row, player_number)
+    return board
+
+
+def bench_drop_piece() -> tuple[Callable[[], object], int]:
+    """
+    Fill a board, one 'drop_piece' per operation.
+    """
+    board = Board()
+    moves = list(enumerate(filling_moves()))
+
+    def fill() -> None:
+        board.reset()
+        for turn, col in moves:
+            board.drop_piece(col, 1 + turn % 2)
+    return fill, len(moves)
+
+
+def bench_has_won(make_board: Callable[[int], Board],
+                  count: int) -> Benchmark:
+    """
+    Check both players of the board 'make_board' gives for 'count'
+    pieces for a win, one 'has_won' per operation. The board is only
+    made when the benchmark is run.
+    """
+    def build() -> tuple[Callable[[], object], int]:
+        board = make_board(count)
+
+        def check() -> None:
+            board.has_won(1)
+            board.has_won(2)
+        return check, 2
+    return build
+
+
+def bench_board_iter() -> tuple[Callable[[], object], int]:
+    """
+    Iterate over every cell of a board, one cell per operation.
+    """
+    board = dropped_board(21)
+
+    def traverse() -> None:
+        for cell in board:
+            pass
+    return traverse, board.width * board.height
+
+
+def bench_board_iterator() -> tuple[Callable[[], object], int]:
+    """
+    Walk a 'BoardIterator' over every cell, one cell per operation.
+    """
+    board = dropped_board(21)
+
+    def traverse() -> None:
+        for cell in BoardIterator(board.state):
+            pass
+    return traverse, board.width * board.height
+
+
+def _draw(board: Board) -> Renderer:
+    """
+    Get a renderer drawing 'board' to the game window, on a dummy
+    display unless a real one was chosen. It draws the same way as the
+    game's 'Draw' singleton, which may have been made for another board.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    return Renderer(board)
+
+
+def bench_draw_full() -> tuple[Callable[[], object], int]:
+    """
+    Redraw the whole board, one 'gameboard' call per operation.
+    """
+    draw = _draw(dropped_board(21))
+
+    def redraw() -> None:
+        draw.invalidate()
+        draw.gameboard()
+    return redraw, 1
+
+
+def bench_draw_move() -> tuple[Callable[[], object], int]:
+    """
+    Draw a board after a piece is dropped or taken back, one
+    'gameboard' call per operation.
+    """
+    board = dropped_board(21)
+    draw = _draw(board)
+    draw.invalidate()
+    draw.gameboard()
+
+    def move() -> None:
+        board.drop_piece(3, 1)
+        draw.gameboard()
+        board.undo_move()
+        draw.gameboard()
+    return move, 2
+
+
+def bench_game() -> tuple[Callable[[], object], int]:
+    """
+    Play whole headless games between greedy and random players, one
+    game per operation.
+    """
+    seeds = iter(range(1 << 30))
+
+    def play() -> None:
+        seed = next(seeds)
+        play_game((GreedyPolicy(seed), RandomPolicy(seed + 1)))
+    return play, 1
+
+
+BENCHMARKS: dict[str, Benchmark] = {
+    "drop_piece": bench_drop_piece,
+    "has_won_empty": bench_has_won(dropped_board, 0),
+    "has_won_mid": bench_has_won(dropped_board, 21),
+    "has_won_full": bench_has_won(dropped_board, 42),
+    "has_won_scan_empty": bench_has_won(loaded_board, 0),
+    "has_won_scan_mid": bench_has_won(loaded_board, 21),
+    "has_won_scan_full": bench_has_won(loaded_board, 42),
+    "board_iter": bench_board_iter,
+    "board_iterator": bench_board_iterator,
+    "draw_gameboard_full": bench_draw_full,
+    "draw_gameboard_move": bench_draw_move,
+    "game_throughput": bench_game,
+}
+
+
+def measure(benchmark: Benchmark, min_time: float = 0.2,
+            repeat: int = 5) -> dict[str, float]:
+    """
+    Time a benchmark. Each of 'repeat' rounds runs it for about
+    'min_time' seconds; the fastest round gives the time per operation,
+    since slower ones were disturbed by something else.
+    """
+    func, ops = benchmark()
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 0.2)))
+    rounds = sorted(timer.repeat(repeat, number))
+    seconds = rounds[0] / (number * ops)
+    return {"seconds": seconds,
+            "median": rounds[len(rounds) // 2] / (number * ops),
+            "ops_per_second": 1 / seconds if seconds else 0.0,
+            "calls": number * repeat}
+
+
+def run(names: Optional[list[str]] = None, min_time: float = 0.2,
+        repeat: int = 5) -> dict[str, Any]:
+    """
+    Run the benchmarks given by name, or all of them, and return the
+    results in the format saved as JSON.
+    """
+    results = {}
+    for name in names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark: {name}")
+        results[name] = measure(BENCHMARKS[name], min_time, repeat)
+    return {"python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "benchmarks": results}
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any],
+            tolerance: float = 0.25) -> dict[str, dict[str, Any]]:
+    """
+    Compare results with a baseline. For every benchmark in both, gives
+    the ratio of the new time to the baseline time and whether it is
+    more than 'tolerance' slower.
+    """
+    comparison = {}
+    old = baseline.get("benchmarks", {})
+    for name, result in results["benchmarks"].items():
+        if name in old and old[name]["seconds"] > 0:
+            ratio = result["seconds"] / old[name]["seconds"]
+            comparison[name] = {"ratio": ratio,
+                                "regression": ratio > 1 + tolerance}
+    return comparison
+
+
+def report(results: dict[str, Any],
+           comparison: dict[str, dict[str, Any]]) -> str:
+    """
+    Format results, and their comparison with a baseline, as a table.
+    """
+    lines = []
+    for name, result in results["benchmarks"].items():
+        line = f"{name:<22}{result['seconds'] * 1e6:>12.3f} us/op"
+        if name in comparison:
+            line += f"{comparison[name]['ratio']:>8.2f}x baseline"
+            if comparison[name]["regression"]:
+                line += "  SLOWER"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Main function. When called, this function runs the benchmarks,
+    saves the results and compares them with the baseline, exiting
+    with an error if any of them got slower.
+    """
+    parser = argparse.ArgumentParser(
+        description="Time the hot paths of the game.")
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help=f"benchmarks to run (default: all of "
+                             f"{', '.join(BENCHMARKS)})")
+    parser.add_argument("--output", default="benchmark.json",
+                        help="where to save the results as JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="how much slower than the baseline a "
+                             "benchmark may be, as a fraction")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="seconds each timing round runs for")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv or [])
+
+    results = run(args.names, args.min_time, args.repeat)
+    comparison: dict[str, dict[str, Any]] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline:
+            comparison = compare(results, json.load(baseline),
+                                 args.tolerance)
+        results["baseline"] = comparison
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print(report(results, comparison))
+    slower = [name for name, item in comparison.items()
+              if item["regression"]]
+    if slower:
+        raise SystemExit(f"Slower than the baseline: {', '.join(slower)}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
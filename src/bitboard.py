@@ -0,0 +1,528 @@
+"""Module containing the compact bitboard game state engine."""
+
+import random
+import sys
+from typing import Any
+
+# Zobrist keys per board geometry, shared by every 'BitBoard' of that size.
+_zobrist_tables: dict[tuple[int, int], tuple[list[int], list[int]]] = {}
+
+
+def zobrist_keys(cols: int, rows: int) -> tuple[list[int], list[int]]:
+    """
+    Get the random 64-bit Zobrist keys for each player and bit position
+    of a board geometry. The keys are seeded from the geometry, so hashes
+    are the same in every process.
+    """
+    keys = _zobrist_tables.get((cols, rows))
+    if keys is None:
+        rng = random.Random(f"connect4-{cols}x{rows}")
+        size = cols * (rows + 1)
+        keys = ([rng.getrandbits(64) for i in range(size)],
+                [rng.getrandbits(64) for i in range(size)])
+        _zobrist_tables[(cols, rows)] = keys
+    return keys
+
+
+class BitBoard:
+    """
+    Class describing a game state as two integer bitboards.
+
+    Each column occupies 'rows + 1' bits: one bit per cell plus a
+    sentinel bit on top, so that shifted lines never wrap from one
+    column into the next. Cell (col, row) lives at bit
+    'col * (rows + 1) + row', with row 0 at the bottom. Column heights
+    are packed one byte per column, and the columns that still have room
+    are kept as a mask with bit 'col' set for each, so the legal moves
+    are known without looking at any cell.
+
+    The left/right mirror image of the position is kept up to date
+    alongside it, so a position and its mirror share one canonical key
+    without flipping the board on every lookup.
+    """
+    __slots__ = ('_cols', '_rows', '_connect', '_stride', '_players',
+                 '_heights', '_legal', '_bottom', '_board_mask', '_keys',
+                 '_zobrist', '_mirrored', '_mirror_zobrist')
+    _cols: int
+    _rows: int
+    _connect: int
+    _stride: int
+    _players: list[int]
+    _heights: bytearray
+    _legal: int
+    _bottom: int
+    _board_mask: int
+    _keys: tuple[list[int], list[int]]
+    _zobrist: int
+    # the players' pieces and Zobrist hash of the mirror image
+    _mirrored: list[int]
+    _mirror_zobrist: int
+
+    def __init__(self, cols: int = 7, rows: int = 6,
+                 connect: int = 4) -> None:
+        """
+        Constructor for 'BitBoard'.
+
+        'connect' is the number of pieces in a row needed to win.
+        """
+        if cols < 1 or not 1 <= rows <= 255:
+            raise ValueError(f"Unsupported board size: {cols}x{rows}")
+        if connect < 1:
+            raise ValueError(f"Unsupported run length: {connect}")
+        self._cols = cols
+        self._rows = rows
+        self._connect = connect
+        self._stride = rows + 1
+        self._players = [0, 0]
+        self._heights = bytearray(cols)
+        self._legal = (1 << cols) - 1
+        self._bottom = sum(1 << (col * self._stride) for col in range(cols))
+        self._board_mask = self._bottom * ((1 << rows) - 1)
+        self._keys = zobrist_keys(cols, rows)
+        self._zobrist = 0
+        self._mirrored = [0, 0]
+        self._mirror_zobrist = 0
+
+    def __getstate__(self) -> dict[str, Any]:
+        """
+        Leave the shared Zobrist keys out of pickles.
+        """
+        return {name: getattr(self, name) for name in self.__slots__
+                if name != '_keys'}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        """
+        Restore a pickled position and look its Zobrist keys back up.
+        """
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._keys = zobrist_keys(self._cols, self._rows)
+
+    @property
+    def cols(self) -> int:
+        """
+        getter property for the column count
+
+        Returns:
+            int: the integer count for columns.
+        """
+        return self._cols
+
+    @property
+    def rows(self) -> int:
+        """
+        getter property for the row count
+
+        Returns:
+            int: the integer count for rows.
+        """
+        return self._rows
+
+    @property
+    def connect(self) -> int:
+        """
+        getter property for the run length needed to win
+
+        Returns:
+            int: the number of pieces a player needs in a row.
+        """
+        return self._connect
+
+    @property
+    def stride(self) -> int:
+        """
+        getter property for the number of bits used by one column
+
+        Returns:
+            int: the column stride in bits.
+        """
+        return self._stride
+
+    @property
+    def mask(self) -> int:
+        """
+        getter property for the bitboard of all occupied cells
+
+        Returns:
+            int: a bitboard with one bit set per piece on the board.
+        """
+        return self._players[0] | self._players[1]
+
+    @property
+    def zobrist(self) -> int:
+        """
+        getter property for the Zobrist hash of the position
+
+        Returns:
+            int: a 64-bit hash, updated incrementally as pieces are
+            dropped and removed.
+        """
+        return self._zobrist
+
+    @property
+    def mirror_zobrist(self) -> int:
+        """
+        getter property for the Zobrist hash of the mirror image
+
+        Returns:
+            int: the hash the position would have with its columns in
+            reverse order.
+        """
+        return self._mirror_zobrist
+
+    @property
+    def canonical_zobrist(self) -> int:
+        """
+        getter property for the Zobrist hash shared with the mirror image
+
+        Returns:
+            int: the smaller of 'zobrist' and 'mirror_zobrist'.
+        """
+        return min(self._zobrist, self._mirror_zobrist)
+
+    @property
+    def board_mask(self) -> int:
+        """
+        getter property for the bitboard of every cell on the board
+
+        Returns:
+            int: a bitboard with one bit set per cell, sentinels excluded.
+        """
+        return self._board_mask
+
+    @property
+    def legal_mask(self) -> int:
+        """
+        getter property for the columns that still have room
+
+        Returns:
+            int: a mask with bit 'col' set for every column a piece can
+            be dropped into.
+        """
+        return self._legal
+
+    def legal_moves(self) -> list[int]:
+        """
+        Get the columns a piece can be dropped into, left to right.
+        """
+        moves = []
+        legal = self._legal
+        while legal:
+            low = legal & -legal
+            moves.append(low.bit_length() - 1)
+            legal ^= low
+        return moves
+
+    def playable(self) -> int:
+        """
+        Get the bitboard of the cells the next piece in each column
+        would land in.
+        """
+        return (self.mask + self._bottom) & self._board_mask
+
+    def bitboard(self, player_number: int) -> int:
+        """
+        Get the bitboard of the pieces owned by a player.
+        """
+        return self._players[player_number - 1]
+
+    def mirrored_bitboard(self, player_number: int) -> int:
+        """
+        Get the bitboard of a player's pieces in the mirror image.
+        """
+        return self._mirrored[player_number - 1]
+
+    def key(self, player_number: int) -> int:
+        """
+        Get a key identifying the position with 'player_number' to move.
+
+        Adding the occupied cells to the player's pieces sets one bit
+        above the top piece of each column, which makes the key unique;
+        unlike the Zobrist hash it cannot collide.
+        """
+        return self._players[player_number - 1] + self.mask
+
+    def mirror_key(self, player_number: int) -> int:
+        """
+        Get the 'key' of the mirror image.
+        """
+        return (self._mirrored[player_number - 1] +
+                (self._mirrored[0] | self._mirrored[1]))
+
+    def canonical_key(self, player_number: int) -> int:
+        """
+        Get the key shared by the position and its mirror image: the
+        smaller of 'key' and 'mirror_key'.
+        """
+        return min(self.key(player_number), self.mirror_key(player_number))
+
+    def is_canonical(self) -> bool:
+        """
+        Check if the position is the orientation its canonical Zobrist
+        hash was taken from. Moves stored under that hash must be
+        mirrored with 'mirror_col' otherwise.
+        """
+        return self._zobrist <= self._mirror_zobrist
+
+    def mirror_col(self, col: int) -> int:
+        """
+        Get the column matching 'col' in the mirror image.
+        """
+        return self._cols - 1 - col
+
+    def bit(self, col: int, row: int) -> int:
+        """
+        Get the single-bit mask of a cell.
+        """
+        return 1 << (col * self._stride + row)
+
+    def height(self, col: int) -> int:
+        """
+        Get the number of pieces in a column.
+        """
+        return self._heights[col]
+
+    def can_play(self, col: int) -> bool:
+        """
+        Check if a piece can still be dropped into a column. Columns
+        past the right edge have no room.
+        """
+        return bool(self._legal >> col & 1)
+
+    def drop(self, col: int, player_number: int) -> int:
+        """
+        Drop a piece into a column and return the row it landed in.
+
+        The caller is responsible for checking 'can_play' first.
+        """
+        row = self._heights[col]
+        pos = col * self._stride + row
+        mirror = (self._cols - 1 - col) * self._stride + row
+        keys = self._keys[player_number - 1]
+        self._players[player_number - 1] |= 1 << pos
+        self._mirrored[player_number - 1] |= 1 << mirror
+        self._zobrist ^= keys[pos]
+        self._mirror_zobrist ^= keys[mirror]
+        self._heights[col] = row + 1
+        if row + 1 == self._rows:
+            self._legal &= ~(1 << col)
+        return row
+
+    def undo(self, col: int) -> None:
+        """
+        Remove the top piece of a column.
+        """
+        row = self._heights[col] - 1
+        pos = col * self._stride + row
+        mirror = (self._cols - 1 - col) * self._stride + row
+        index = 0 if self._players[0] >> pos & 1 else 1
+        self._players[index] &= ~(1 << pos)
+        self._mirrored[index] &= ~(1 << mirror)
+        self._zobrist ^= self._keys[index][pos]
+        self._mirror_zobrist ^= self._keys[index][mirror]
+        self._heights[col] = row
+        self._legal |= 1 << col
+
+    def set_cell(self, col: int, row: int, player_number: int) -> None:
+        """
+        Place a piece directly in a cell, ignoring gravity.
+
+        Used to load arbitrary positions. A 'player_number' of 0
+        clears the cell.
+        """
+        pos = col * self._stride + row
+        mirror = (self._cols - 1 - col) * self._stride + row
+        bit = 1 << pos
+        for index in (0, 1):
+            if self._players[index] & bit:
+                self._players[index] &= ~bit
+                self._mirrored[index] &= ~(1 << mirror)
+                self._zobrist ^= self._keys[index][pos]
+                self._mirror_zobrist ^= self._keys[index][mirror]
+        if player_number:
+            self._players[player_number - 1] |= bit
+            self._mirrored[player_number - 1] |= 1 << mirror
+            self._zobrist ^= self._keys[player_number - 1][pos]
+            self._mirror_zobrist ^= self._keys[player_number - 1][mirror]
+        column = (self.mask >> (col * self._stride)) & ((1 << self._rows) - 1)
+        self._heights[col] = column.bit_length()
+        if column.bit_length() < self._rows:
+            self._legal |= 1 << col
+        else:
+            self._legal &= ~(1 << col)
+
+    def player_at(self, col: int, row: int) -> int:
+        """
+        Get the player number in a cell, or 0 if it is empty.
+        """
+        bit = 1 << (col * self._stride + row)
+        if self._players[0] & bit:
+            return 1
+        if self._players[1] & bit:
+            return 2
+        return 0
+
+    def is_full(self) -> bool:
+        """
+        Check if every column is full.
+        """
+        return not self._legal
+
+    def _aligned(self, bits: int, shift: int) -> bool:
+        """
+        Check for 'connect' aligned bits along one direction.
+
+        Each pass doubles the length of the runs 'bits' marks the start
+        of, so a run of N takes about log2(N) shifts.
+        """
+        length = 1
+        while length < self._connect and bits:
+            step = min(length, self._connect - length)
+            bits &= bits >> step * shift
+            length += step
+        return bits != 0
+
+    def wins_at(self, col: int, row: int, player_number: int) -> bool:
+        """
+        Check if the piece in a cell is part of 'connect' in a row.
+
+        Only the four lines through that cell are examined, and at most
+        'connect - 1' cells each way along them, so this is the cheap
+        check to run after each move whatever the size of the board.
+        """
+        bits = self._players[player_number - 1]
+        pos = col * self._stride + row
+        connect = self._connect
+        for shift in (1, self._stride, self._stride + 1, self._stride - 1):
+            count = 1
+            probe = pos + shift
+            while count < connect and (bits >> probe) & 1:
+                count += 1
+                probe += shift
+            probe = pos - shift
+            while count < connect and probe >= 0 and (bits >> probe) & 1:
+                count += 1
+                probe -= shift
+            if count >= connect:
+                return True
+        return False
+
+    def threats(self, player_number: int) -> int:
+        """
+        Get the bitboard of empty cells that would give a player
+        'connect' in a row, whether or not they can be played yet.
+        """
+        bits = self._players[player_number - 1]
+        if self._connect == 4:
+            found = self._threats4(bits)
+        else:
+            found = self._threats_n(bits)
+        return found & (self._board_mask ^ self.mask)
+
+    def threats_after(self, player_number: int, move: int) -> int:
+        """
+        Get the bitboard of the threats a player would have after
+        taking the cells in 'move', without playing it.
+        """
+        bits = self._players[player_number - 1] | move
+        if self._connect == 4:
+            found = self._threats4(bits)
+        else:
+            found = self._threats_n(bits)
+        return found & (self._board_mask ^ (self.mask | move))
+
+    def _threats4(self, bits: int) -> int:
+        """
+        Unrolled 'threats' for the standard four in a row, which the
+        search calls at every node.
+        """
+        found = (bits << 1) & (bits << 2) & (bits << 3)
+        for shift in (self._stride, self._stride + 1, self._stride - 1):
+            pair = (bits << shift) & (bits << 2 * shift)
+            found |= pair & (bits << 3 * shift)
+            found |= pair & (bits >> shift)
+            pair = (bits >> shift) & (bits >> 2 * shift)
+            found |= pair & (bits << shift)
+            found |= pair & (bits >> 3 * shift)
+        return found
+
+    def _threats_n(self, bits: int) -> int:
+        """
+        'threats' for any run length, before masking out the
+        occupied cells.
+        """
+        span = self._connect - 1
+        # Cells stacked on top of 'span' pieces; the cells above an
+        # empty cell are always empty, so no other vertical run counts.
+        found = -1
+        for step in range(1, span + 1):
+            found &= bits << step
+        for shift in (self._stride, self._stride + 1, self._stride - 1):
+            # 'before[i]' and 'after[i]' mark the cells with 'i' pieces
+            # in a row right before or after them along this line.
+            before = [-1]
+            after = [-1]
+            for step in range(1, span + 1):
+                before.append(before[-1] & (bits << step * shift))
+                after.append(after[-1] & (bits >> step * shift))
+            for i in range(span + 1):
+                found |= before[i] & after[span - i]
+        return found
+
+    def diagonal_win(self, player_number: int) -> bool:
+        """
+        Check if a player has 'connect' in a row along either diagonal.
+        """
+        bits = self._players[player_number - 1]
+        return (self._aligned(bits, self._stride + 1) or
+                self._aligned(bits, self._stride - 1))
+
+    def has_won(self, player_number: int) -> bool:
+        """
+        Check if a player has 'connect' in a row in any direction.
+        """
+        bits = self._players[player_number - 1]
+        return (self._aligned(bits, 1) or
+                self._aligned(bits, self._stride) or
+                self.diagonal_win(player_number))
+
+    def reset(self) -> None:
+        """
+        Remove every piece from the board.
+        """
+        self._players = [0, 0]
+        self._heights = bytearray(self._cols)
+        self._legal = (1 << self._cols) - 1
+        self._zobrist = 0
+        self._mirrored = [0, 0]
+        self._mirror_zobrist = 0
+
+    def memory_footprint(self) -> int:
+        """
+        Get the number of bytes used by this position, not counting the
+        Zobrist keys shared by all positions of the same size.
+        """
+        return sum(sys.getsizeof(item) for item in (
+            self, self._players, self._players[0], self._players[1],
+            self._heights, self._legal, self._zobrist, self._mirrored,
+            self._mirrored[0], self._mirrored[1], self._mirror_zobrist))
+
+    def copy(self) -> 'BitBoard':
+        """
+        Return an independent copy of this game state.
+        """
+        clone = BitBoard.__new__(BitBoard)
+        clone._cols = self._cols
+        clone._rows = self._rows
+        clone._connect = self._connect
+        clone._stride = self._stride
+        clone._players = self._players[:]
+        clone._heights = self._heights[:]
+        clone._legal = self._legal
+        clone._bottom = self._bottom
+        clone._board_mask = self._board_mask
+        clone._keys = self._keys
+        clone._zobrist = self._zobrist
+        clone._mirrored = self._mirrored[:]
+        clone._mirror_zobrist = self._mirror_zobrist
+        return clone
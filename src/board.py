@@ -1,7 +1,16 @@
-"""Module Containing Game Board and Piece classes."""
+"""
+Module Containing Game Board and Piece classes.
+
+This module is pure game logic and does not import pygame, so boards
+can be created in worker processes without opening a window.
+"""
+import copy
+import functools
+import sys
+from array import array
 from typing import Optional, Iterator
 
-import pygame
+from bitboard import BitBoard
 
 
 class FullError(Exception):
@@ -12,71 +21,22 @@ class FullError(Exception):
     pass
 
 
-class Screen():
-    def __init__(self, rows: int, cols: int) -> None:
-        """
-        Constructor for 'Screen'.
-        """
-        self._square_size = 100
-        self._window_width = cols * self._square_size
-        self._window_height = (rows+1) * self._square_size
-        self._window_size = (self._window_width, self._window_height)
-        self._window = pygame.display.set_mode(self._window_size)
-
-    @property
-    def window(self) -> pygame.Surface:
-        """
-        getter property for the screen window
-
-        Returns:
-            pygame.Surface: an instance of pygame's 'Surface' class.
-        """
-        return self._window
-
-    @property
-    def window_size(self) -> tuple[int, int]:
-        """
-        getter property for the screen window's size
-
-        Returns:
-            tuple[int, int]: 'x' and 'y' values representing the
-            and height of the screen window.
-        """
-        return self._window_size
-
-    @property
-    def square_size(self) -> int:
-        """
-        getter property for the square size
-
-        Returns:
-            int: an integer representing the square size.
-        """
-        return self._square_size
-
-    @property
-    def window_width(self) -> int:
-        """
-        getter property for the screen window width
-
-        Returns:
-            int: an integer representing the window width.
-        """
-        return self._window_width
-
-    @property
-    def window_height(self) -> int:
-        """
-        getter property for the screen window height
-
-        Returns:
-            int: an integer representing the window height.
-        """
-        return self._window_height
+class HistoryError(Exception):
+    """
+    Custom exception to handle
+    the case that there is no move to undo or redo.
+    """
+    pass
 
 
 class Piece:
-    """Class describing a game piece."""
+    """
+    Class describing a game piece.
+
+    Pieces are immutable, so the pieces of players 1 and 2 are shared
+    flyweights handed out by 'Piece.of'.
+    """
+    __slots__ = ('_player_number',)
     _player_number: int
 
     def __init__(self, player_number: int) -> None:
@@ -88,9 +48,21 @@ class Piece:
         """The player number of the player owning this piece."""
         return self._player_number
 
+    @staticmethod
+    def of(player_number: int) -> 'Piece':
+        """Get the shared piece of a player."""
+        piece = _pieces.get(player_number)
+        if piece is None:
+            return Piece(player_number)
+        return piece
+
+
+_pieces: dict[int, Piece] = {1: Piece(1), 2: Piece(2)}
+
 
 class Spot:
     """Class describing a spot in a game board that can hold a piece."""
+    __slots__ = ('_piece',)
     _piece: Optional[Piece]
 
     def __init__(self) -> None:
@@ -107,7 +79,7 @@ class Spot:
 
     def add_piece(self, player_number: int) -> None:
         if self._piece is None:
-            self._piece = Piece(player_number)
+            self._piece = Piece.of(player_number)
         else:
             raise FullError('Piece already in this spot')
 
@@ -122,50 +94,182 @@ class Spot:
             return self._piece.player_number
 
 
-class BoardIterator:
-    _x: int = 0
-    _y: int = 0
+@functools.lru_cache(maxsize=None)
+def cell_table(cols: int, rows: int) -> tuple[tuple[int, int, int], ...]:
+    """
+    Get the (row, column, bit) of every cell of a board size, in the
+    order boards are iterated: row by row from the bottom. The table is
+    built once per size and shared.
+    """
+    return tuple((row, col, col * (rows + 1) + row)
+                 for row in range(rows) for col in range(cols))
+
 
-    _board: list[list[Spot]]
-    _width: int
-    _height: int
+class SpotView(Spot):
+    """
+    Class describing a spot shared by every board view of a cell with
+    the same occupant. Views cannot be changed, since they are shared.
+    """
+    __slots__ = ()
+
+    def add_piece(self, player_number: int) -> None:
+        raise TypeError('Board views cannot be changed')
+
+
+def _spot_view(player_number: int) -> SpotView:
+    """
+    Get a view of a spot holding 'player_number', or nothing for 0.
+    """
+    spot = SpotView()
+    if player_number:
+        spot._piece = Piece.of(player_number)
+    return spot
+
+
+# The views of an empty spot and of one holding each player's piece
+_spot_views: tuple[SpotView, ...] = tuple(_spot_view(player)
+                                          for player in range(3))
+
+
+@functools.lru_cache(maxsize=None)
+def cell_views(cols: int, rows: int
+               ) -> tuple[tuple[int, tuple[tuple[int, int, Spot], ...]],
+                          ...]:
+    """
+    Get the bit of every cell of a board size, in 'cell_table' order,
+    with the (row, column, spot) the cell is iterated as when it is
+    empty or holds either player's piece. Iterating a board only picks
+    one of them, so it allocates nothing per cell.
+    """
+    return tuple((bit, tuple((row, col, spot) for spot in _spot_views))
+                 for row, col, bit in cell_table(cols, rows))
+
+
+def iter_cells(state: BitBoard) -> Iterator[tuple[int, int, Spot]]:
+    """
+    Iterate over the (row, column, spot) of every cell of a position,
+    row by row from the bottom. The spots are shared views.
+    """
+    first = state.bitboard(1)
+    second = state.bitboard(2)
+    for bit, views in cell_views(state.cols, state.rows):
+        if first >> bit & 1:
+            yield views[1]
+        elif second >> bit & 1:
+            yield views[2]
+        else:
+            yield views[0]
+
+
+class BoardIterator:
+    """
+    Class iterating over the cells of a position like 'iter_cells'.
+    """
+    __slots__ = ('_cells',)
+    _cells: Iterator[tuple[int, int, Spot]]
 
-    def __init__(self, board: list[list[Spot]]) -> None:
-        self._board = board
-        self._width = len(board[0])
-        self._height = len(board)
+    def __init__(self, state: BitBoard) -> None:
+        self._cells = iter_cells(state)
 
     def __iter__(self) -> Iterator[tuple[int, int, Spot]]:
         return self
 
     def __next__(self) -> tuple[int, int, Spot]:
-        if self._x >= self._width:
-            self._x = 0
-            self._y += 1
-        if self._y >= self._height:
-            raise StopIteration
-        return_val: tuple[int, int, Spot] = (self._y, self._x,
-                                             self._board[self._y][self._x])
-        self._x += 1
-        return return_val
+        return next(self._cells)
+
 
+class Board():
+    """
+    Class describing the game board.
 
-class Board(Screen):
-    """Class describing the game board."""
-    _board: list[list[Spot]]
+    The pieces live in a 'BitBoard'; iterating the board yields shared
+    'SpotView's, and 'spot_at' makes a 'Spot' snapshot.
 
-    def __init__(self, cols: int = 7, rows: int = 6) -> None:
+    Dropped pieces are kept on a move stack, so 'undo_move' and
+    'redo_move' take moves back and forth in place without copying
+    the board.
+    """
+    __slots__ = ('_rows', '_cols', '_state', '_last_move', '_won',
+                 '_incremental', '_moves', '_redo')
+    _rows: int
+    _cols: int
+    _state: BitBoard
+    _last_move: Optional[tuple[int, int, int]]
+    # bit 'player_number - 1' is set once that player has won
+    _won: int
+    _incremental: bool
+    # 'column << 2 | _won' before each drop, last on top
+    _moves: 'array[int]'
+    # 'column << 2 | player_number' of each move taken back, last on top
+    _redo: 'array[int]'
+
+    def __init__(self, cols: int = 7, rows: int = 6,
+                 connect: int = 4) -> None:
         """
         Constructor for the board.
+
+        'connect' is the number of pieces in a row needed to win.
         """
         self._rows = rows
         self._cols = cols
-        super().__init__(rows, cols)
-        self._spot = Spot()
-        self._board = [[Spot() for i in range(cols)] for j in range(rows)]
+        self._state = BitBoard(cols, rows, connect)
+        self._last_move = None
+        self._won = 0
+        self._incremental = True
+        self._moves = array('I')
+        self._redo = array('I')
 
     def __iter__(self) -> Iterator[tuple[int, int, Spot]]:
-        return BoardIterator(self._board)
+        return iter_cells(self._state)
+
+    @property
+    def positions(self) -> tuple[tuple[int, int, int], ...]:
+        """
+        getter property for the shared table of cell positions
+
+        Returns:
+            tuple[tuple[int, int, int], ...]: the (row, column, bit) of
+            each cell, in the same order as 'cells'.
+        """
+        return cell_table(self.width, self.height)
+
+    def cells(self) -> bytes:
+        """
+        Get the player number in every cell, row by row from the
+        bottom, as one byte per cell.
+        """
+        one = self._state.bitboard(1)
+        two = self._state.bitboard(2)
+        return bytes((one >> bit & 1) | (two >> bit & 1) << 1
+                     for row, col, bit in cell_table(self.width,
+                                                     self.height))
+
+    def column(self, x: int) -> bytes:
+        """
+        Get the player number in each cell of a column, from the
+        bottom up.
+        """
+        return bytes(self._state.player_at(x, y) for y in range(self.height))
+
+    def row(self, y: int) -> bytes:
+        """
+        Get the player number in each cell of a row, from left to right.
+        """
+        return bytes(self._state.player_at(x, y) for x in range(self.width))
+
+    def occupied(self) -> Iterator[tuple[int, int, int]]:
+        """
+        Iterate over the occupied cells only, yielding the row, column
+        and player number of each piece.
+        """
+        stride = self._state.stride
+        for player_number in (1, 2):
+            bits = self._state.bitboard(player_number)
+            while bits:
+                low = bits & -bits
+                col, row = divmod(low.bit_length() - 1, stride)
+                yield row, col, player_number
+                bits ^= low
 
     @property
     def spot(self) -> Spot:
@@ -173,9 +277,41 @@ class Board(Screen):
         getter property for a spot on the board
 
         Returns:
-            Spot: an instance of the 'Spot' class.
+            Spot: a new, empty instance of the 'Spot' class.
         """
-        return self._spot
+        return Spot()
+
+    def spot_at(self, x: int, y: int) -> Spot:
+        """
+        Get a 'Spot' view of the piece in a specific spot on the board.
+        The view is a snapshot and does not change the board.
+        """
+        spot = Spot()
+        occupant = self._state.player_at(x, y)
+        if occupant:
+            spot._piece = Piece.of(occupant)
+        return spot
+
+    def memory_footprint(self) -> int:
+        """
+        Get the number of bytes used by this board and the objects it
+        owns, not counting the Zobrist keys shared by all boards.
+        """
+        owned: list[object] = [self, self._moves, self._redo]
+        if self._last_move is not None:
+            owned.append(self._last_move)
+        return (sum(sys.getsizeof(item) for item in owned) +
+                self._state.memory_footprint())
+
+    @property
+    def state(self) -> BitBoard:
+        """
+        getter property for the bitboard game state
+
+        Returns:
+            BitBoard: the 'BitBoard' holding the pieces on this board.
+        """
+        return self._state
 
     @property
     def rows(self) -> int:
@@ -197,25 +333,147 @@ class Board(Screen):
         """
         return self._cols
 
+    @property
+    def connect(self) -> int:
+        """
+        getter property for the run length needed to win
+
+        Returns:
+            int: the number of pieces a player needs in a row.
+        """
+        return self._state.connect
+
+    @property
+    def last_move(self) -> Optional[tuple[int, int, int]]:
+        """
+        getter property for the most recently dropped piece
+
+        Returns:
+            Optional[tuple[int, int, int]]: the column, row and player
+            number of the last piece dropped, or None if there is none.
+        """
+        return self._last_move
+
+    @property
+    def key(self) -> int:
+        """
+        getter property for the key of the position
+
+        Returns:
+            int: a number identifying the pieces on the board, different
+            for every position. See 'BitBoard.key'.
+        """
+        return self._state.key(1)
+
+    @property
+    def canonical_key(self) -> int:
+        """
+        getter property for the key shared with the mirror image
+
+        Returns:
+            int: the smaller of the keys of the position and of its
+            left/right mirror image, kept up to date as pieces are
+            dropped.
+        """
+        return self._state.canonical_key(1)
+
+    def mirrored(self) -> 'Board':
+        """
+        Get a new board holding the left/right mirror image of this
+        one, with the moves played so far mirrored as well.
+        """
+        board = Board(self.width, self.height, self.connect)
+        last = self.width - 1
+        if not self._incremental:
+            for row, col, player_number in self.occupied():
+                board.set_player_at_spot(last - col, row, player_number)
+            return board
+        heights = bytearray(self.width)
+        for x in self.moves:
+            board._drop(last - x, self._state.player_at(x, heights[x]))
+            heights[x] += 1
+        return board
+
+    @property
+    def moves(self) -> list[int]:
+        """
+        getter property for the move history
+
+        Returns:
+            list[int]: the columns dropped into that can be undone,
+            oldest first.
+        """
+        return [move >> 2 for move in self._moves]
+
+    @property
+    def can_undo(self) -> bool:
+        """
+        getter property for whether there is a move to undo
+
+        Returns:
+            bool: true if 'undo_move' has a move to take back.
+        """
+        return len(self._moves) > 0
+
+    @property
+    def can_redo(self) -> bool:
+        """
+        getter property for whether there is a move to redo
+
+        Returns:
+            bool: true if 'redo_move' has a move to play again.
+        """
+        return len(self._redo) > 0
+
+    def _clear_history(self) -> None:
+        """
+        Forget the moves that could be undone or redone.
+        """
+        del self._moves[:]
+        del self._redo[:]
+
     def reset(self) -> None:
         """
         Function to reset the board in the event
         of a replay.
         """
-        for row in self._board:
-            for spot in row:
-                spot._piece = None
+        self._state.reset()
+        self._last_move = None
+        self._won = 0
+        self._incremental = True
+        self._clear_history()
+
+    def copy(self) -> 'Board':
+        """
+        Return a copy of the board with an independent game state.
+        """
+        clone = copy.copy(self)
+        clone._state = self._state.copy()
+        clone._moves = self._moves[:]
+        clone._redo = self._redo[:]
+        return clone
 
     def get_player_at_spot(self, x: int, y: int) -> int:
         """
         Get the player number of the piece in a specific spot on the board.
-        If there is no piece there, return None.
+        If there is no piece there, return 0.
         """
-        relevant_piece: Optional[Piece] = self._board[y][x].piece
-        if relevant_piece is None:
-            return 0
-        else:
-            return relevant_piece.player_number
+        return self._state.player_at(x, y)
+
+    def set_player_at_spot(self, x: int, y: int, player_number: int) -> None:
+        """
+        Place a player's piece in a specific spot on the board, ignoring
+        gravity. A player number of 0 empties the spot.
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise ValueError
+        self._state.set_cell(x, y, player_number)
+        # The position no longer follows from the drops we have seen,
+        # so win checks fall back to a full scan and the moves played
+        # so far can no longer be taken back.
+        self._last_move = None
+        self._incremental = False
+        self._clear_history()
 
     @property
     def width(self) -> int:
@@ -225,7 +483,7 @@ class Board(Screen):
         Returns:
             int: the integer value for the board width.
         """
-        return len(self._board[0])
+        return self._state.cols
 
     @property
     def height(self) -> int:
@@ -235,17 +493,91 @@ class Board(Screen):
         Returns:
             int: the integer value for the board height.
         """
-        return len(self._board)
+        return self._state.rows
+
+    @property
+    def legal_mask(self) -> int:
+        """
+        getter property for the columns that still have room
+
+        Returns:
+            int: a mask with bit 'x' set for every column a piece can
+            be dropped into.
+        """
+        return self._state.legal_mask
+
+    def legal_moves(self) -> list[int]:
+        """
+        Get the columns a piece can be dropped into, left to right.
+        """
+        return self._state.legal_moves()
+
+    def is_full(self) -> bool:
+        """
+        Check if no piece can be dropped anywhere.
+        """
+        return self._state.is_full()
 
     def drop_piece(self, x: int, player_number: int) -> None:
-        if not (x >= 0 and x < self.window_width):
-            raise ValueError
-        for y in range(self.height):
-            if self._board[y][x].is_empty():
-                self._board[y][x].add_piece(player_number)
-                break
-        else:
+        """
+        Drop a player's piece into column 'x'. Raises 'ValueError' if
+        there is no such column and 'FullError' if it has no room.
+        """
+        if not 0 <= x < self._state.cols:
+            raise ValueError(f"No column {x} on the board")
+        if not self._state.legal_mask >> x & 1:
             raise FullError
+        self._drop(x, player_number)
+        # A new move replaces the moves that were taken back
+        if self._redo:
+            del self._redo[:]
+
+    def _drop(self, x: int, player_number: int) -> None:
+        """
+        Drop a piece into a column that has room and push it on the
+        move stack.
+        """
+        y = self._state.drop(x, player_number)
+        self._last_move = (x, y, player_number)
+        self._moves.append(x << 2 | self._won)
+        won = 1 << (player_number - 1)
+        if (self._incremental and not self._won & won and
+                self._state.wins_at(x, y, player_number)):
+            self._won |= won
+
+    def undo_move(self) -> tuple[int, int, int]:
+        """
+        Take back the last piece dropped. Returns its column, row and
+        player number.
+        """
+        if not self._moves:
+            raise HistoryError('No move to undo')
+        move = self._moves.pop()
+        x = move >> 2
+        y = self._state.height(x) - 1
+        player_number = self._state.player_at(x, y)
+        self._state.undo(x)
+        self._won = move & 3
+        self._redo.append(x << 2 | player_number)
+        if self._moves:
+            last = self._moves[-1] >> 2
+            row = self._state.height(last) - 1
+            self._last_move = (last, row, self._state.player_at(last, row))
+        else:
+            self._last_move = None
+        return x, y, player_number
+
+    def redo_move(self) -> tuple[int, int, int]:
+        """
+        Play again the last move taken back. Returns its column, row
+        and player number.
+        """
+        if not self._redo:
+            raise HistoryError('No move to redo')
+        move = self._redo.pop()
+        self._drop(move >> 2, move & 3)
+        assert self._last_move is not None
+        return self._last_move
 
     def is_player(self, x: int, y: int, player_number: int) -> bool:
         """
@@ -255,48 +587,23 @@ class Board(Screen):
         if it does, and false in all other cases.
         """
         return (x >= 0 and x < self.width and y >= 0 and y < self.height and
-                self._board[y][x].is_player(player_number))
+                self._state.player_at(x, y) == player_number)
 
     def _diagonal_win(self, player_number: int) -> bool:
         """
         Check for a diagonal win.
         Return true if it has occurred, false if not.
         """
-        # Check for positive diagonals (bottom-left to top-right)
-        for y in range(self.height - 3):
-            for x in range(self.width - 3):
-                if all(self.is_player(x + i, y + i,
-                                      player_number) for i in range(4)):
-                    return True
-
-        # Check for negative diagonals (top-left to bottom-right)
-        for y in range(3, self.height):
-            for x in range(self.width - 3):
-                if all(self.is_player(x + i, y - i,
-                                      player_number) for i in range(4)):
-                    return True
-
-        return False
+        return self._state.diagonal_win(player_number)
 
     def has_won(self, player_number: int) -> bool:
         """
         Check if a player has won, returning true if they have and false if not
+
+        While the board has only been filled through 'drop_piece', the
+        answer comes from the lines through each dropped piece. Otherwise
+        the whole board is scanned.
         """
-        for y in range(self.height):
-            for x in range(self.width):
-                if self.is_player(x, y, player_number):
-                    # horizontal
-                    for x2 in range(x + 1, x + 4):
-                        if not self.is_player(x2, y, player_number):
-                            break
-                    else:
-                        return True
-                    # vertical
-                    for y2 in range(y + 1, y + 4):
-                        if not self.is_player(x, y2, player_number):
-                            break
-                    else:
-                        return True
-        if self._diagonal_win(player_number):
-            return True
-        return False
+        if self._incremental:
+            return bool(self._won >> (player_number - 1) & 1)
+        return self._state.has_won(player_number)
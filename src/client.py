@@ -0,0 +1,300 @@
+"""
+Module to play against someone connected to a game server.
+
+See 'server.py' for the protocol. Server lines are read by a background
+thread, so the game loop keeps drawing frames while it waits for the
+opponent, the same way it waits for the computer player.
+"""
+
+import queue
+import socket
+import threading
+from typing import Optional
+
+import pygame
+
+from game import Game
+from profiler import Profiler
+from records import RecordStore
+
+
+class ProtocolError(Exception):
+    """
+    Custom exception to handle
+    the case that the server does not speak the game protocol.
+    """
+    pass
+
+
+class Connection():
+    """
+    Class holding a connection to a game server.
+    """
+    def __init__(self, sock: socket.socket) -> None:
+        """
+        Constructor for 'Connection'. Reads the board size the server
+        plays on, then starts reading its lines in the background.
+        """
+        self._socket = sock
+        self._file = sock.makefile("rb")
+        hello = self._file.readline().split()
+        if len(hello) != 4 or hello[0] != b"HELLO":
+            sock.close()
+            raise ProtocolError("Not a game server")
+        self._cols, self._rows, self._connect = map(int, hello[1:])
+        self._lines: queue.SimpleQueue[list[str]] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def open(cls, host: str, port: int,
+             timeout: float = 5.0) -> 'Connection':
+        """
+        Connect to the server at 'host' and 'port'.
+        """
+        sock = socket.create_connection((host, port), timeout)
+        sock.settimeout(None)
+        return cls(sock)
+
+    @property
+    def cols(self) -> int:
+        """
+        getter property for the column count of the server's board
+
+        Returns:
+            int: the integer count for columns.
+        """
+        return self._cols
+
+    @property
+    def rows(self) -> int:
+        """
+        getter property for the row count of the server's board
+
+        Returns:
+            int: the integer count for rows.
+        """
+        return self._rows
+
+    @property
+    def connect(self) -> int:
+        """
+        getter property for the run length needed to win
+
+        Returns:
+            int: the number of pieces a player needs in a row.
+        """
+        return self._connect
+
+    def _read(self) -> None:
+        """
+        Thread target queueing each line from the server as its words,
+        and 'CLOSED' once the server hangs up.
+        """
+        try:
+            for line in self._file:
+                self._lines.put(line.decode().split())
+        except OSError:
+            pass
+        self._lines.put(["CLOSED"])
+
+    def send(self, *words: object) -> None:
+        """
+        Send one command line.
+        """
+        line = " ".join(str(word) for word in words) + "\n"
+        self._socket.sendall(line.encode())
+
+    def poll(self) -> Optional[list[str]]:
+        """
+        Get the words of the next line from the server, or None if
+        none has arrived.
+        """
+        try:
+            return self._lines.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        """
+        Leave the server.
+        """
+        try:
+            self.send("QUIT")
+        except OSError:
+            pass
+        self._socket.close()
+
+
+class NetworkGame(Game):
+    """
+    Game against a player connected to the same server. The local
+    player clicks as usual; the opponent's moves arrive from the server.
+    """
+    def __init__(self, connection: Connection,
+                 store: Optional[RecordStore] = None,
+                 profiler: Optional[Profiler] = None) -> None:
+        """
+        constructor
+
+        The board is the size the server plays on.
+        """
+        self._connection: Connection = connection
+        # 0 until the server has found an opponent
+        self._player_number: int = 0
+        self._lost: bool = False
+        super().__init__(None, connection.cols, connection.rows,
+                         connection.connect, store, profiler)
+
+    @property
+    def connection(self) -> Connection:
+        """
+        getter property for the connection to the server
+
+        Returns:
+            Connection: an instance of the 'Connection' class.
+        """
+        return self._connection
+
+    @property
+    def player_number(self) -> int:
+        """
+        getter property for the player the local side plays as
+
+        Returns:
+            int: the player number, 1 or 2, or 0 while waiting for an
+            opponent.
+        """
+        return self._player_number
+
+    def game_loop(self) -> None:
+        """
+        function to run the game loop, leaving the server when the
+        player quits.
+        """
+        try:
+            super().game_loop()
+        finally:
+            self._connection.close()
+
+    @property
+    def lost(self) -> bool:
+        """
+        getter property for whether the server has hung up
+
+        Returns:
+            bool: true once the connection to the server is lost.
+        """
+        return self._lost
+
+    def handle_event(self, event: pygame.event.EventType) -> bool:
+        """
+        function to move the game along in response to one event.
+        Once the connection is lost and the message about it has been
+        shown, the game ends, since there is no one to play again.
+        """
+        if (self._lost and self._state != self.PLAYING and
+                pygame.time.get_ticks() - self._ended_at > 3000):
+            return False
+        return super().handle_event(event)
+
+    def _start_game(self) -> None:
+        """
+        function to start a new game and ask the server for an
+        opponent.
+        """
+        super()._start_game()
+        self._player_number = 0
+        try:
+            self._connection.send("PLAY")
+        except OSError:
+            self._state = self.GAME_OVER
+            self._ended_at = self._lose_connection()
+
+    def _end_online(self, message: str) -> int:
+        """
+        function to end a game the server did not finish, telling the
+        player why in the strip above the board. Returns the time the
+        game ended.
+        """
+        self._show_message(message, self.color.lightblue)
+        return pygame.time.get_ticks()
+
+    def _lose_connection(self) -> int:
+        """
+        function to tell the player the server has hung up. Returns
+        the time the game ended.
+        """
+        self._lost = True
+        return self._end_online("Connection lost")
+
+    def _ai_turn(self) -> bool:
+        """
+        function to check if it is the opponent's turn, or if there is
+        no opponent yet.
+        """
+        return self.turn._player_turn != self._player_number
+
+    def play_column(self, column: int) -> Optional[int]:
+        """
+        function to drop the local player's piece in a column, and
+        send the move to the server. The piece is not dropped if the
+        server cannot be reached.
+        """
+        if (not self._ai_turn() and 0 <= column and
+                self.board.legal_mask >> column & 1):
+            try:
+                self._connection.send("MOVE", column)
+            except OSError:
+                return self._lose_connection()
+        return super().play_column(column)
+
+    def undo(self) -> bool:
+        """
+        function to take back moves, which online games do not allow.
+        """
+        return False
+
+    def redo(self) -> Optional[int]:
+        """
+        function to replay moves, which online games do not allow.
+        """
+        return None
+
+    def _poll_ai(self) -> Optional[int]:
+        """
+        function to handle the lines the server has sent. Returns the
+        time the game ended, or None if it goes on.
+        """
+        words = self._connection.poll()
+        while words is not None:
+            ended_at = self._server_line(words)
+            if ended_at is not None:
+                return ended_at
+            words = self._connection.poll()
+        return None
+
+    def _server_line(self, words: list[str]) -> Optional[int]:
+        """
+        function to handle one line from the server. Returns the time
+        the game ended, or None if it goes on.
+        """
+        if not words:
+            return None
+        if words[0] == "START":
+            self._player_number = int(words[1])
+            print(f"Playing as player {self._player_number}")
+        elif words[0] == "WAIT":
+            print("Waiting for an opponent...")
+        elif (words[0] == "MOVED" and self._player_number != 0 and
+              int(words[1]) != self._player_number):
+            # Moves arriving before 'START' are left over from the last
+            # game, whose end was seen before the server sent them
+            return super().play_column(int(words[2]))
+        elif words[0] == "ERROR":
+            print("Server:", " ".join(words[1:]))
+        elif words[0] == "LEFT":
+            return self._end_online("Your opponent left")
+        elif words[0] == "CLOSED":
+            return self._lose_connection()
+        return None
@@ -7,9 +7,16 @@ from typing import Optional
 import pygame
 import sys
 import math
-
-from graphics import Color, Draw, MultiError
-from board import Screen, Board, FullError
+import threading
+
+from ai import AIPlayer, Negamax, SearchTimeout
+from bitboard import BitBoard
+from graphics import Color, Draw, MultiError, Renderer, TextCache
+from screen import Screen
+from board import Board, FullError
+from profiler import Profiler
+from records import GameRecord, RecordStore
+from solver import Solver, load_book
 from turns import Turns
 
 
@@ -17,14 +24,37 @@ class Game():
     """
     Game mediator class
     """
-    def __init__(self) -> None:
+    PLAYING: str = "playing"
+    GAME_OVER: str = "game over"
+    REPLAY: str = "replay"
+
+    def __init__(self, ai: Optional[AIPlayer] = None, cols: int = 7,
+                 rows: int = 6, connect: int = 4,
+                 store: Optional[RecordStore] = None,
+                 profiler: Optional[Profiler] = None) -> None:
         """
         constructor
+
+        Pass an 'AIPlayer' to have the computer play one of the sides.
+        The board is 'cols' by 'rows', and 'connect' pieces in a row
+        win. Pass a 'RecordStore' to save every finished game, and a
+        'Profiler' to time the game loop and its hot paths.
         """
-        self._turn: Turns = Turns()
-        self._board: Board = Board()
+        self._ai: Optional[AIPlayer] = ai
+        self._store: Optional[RecordStore] = store
+        self._profiler: Optional[Profiler] = profiler
+        self._state: str = self.PLAYING
+        self._ended_at: int = 0
+        self._turn: Turns = Turns(cols * rows)
+        self._board: Board = Board(cols, rows, connect)
+        self._record: GameRecord = self._new_record()
         self._screen: Screen = Screen(self._board.height, self._board.width)
         self._color: Color = Color()
+        self._text: TextCache = TextCache()
+        # Made by the first hint, since most games never ask for one
+        self._solver: Optional[Solver] = None
+        self._hint_thread: Optional[threading.Thread] = None
+        self._hint: Optional[tuple[int, int]] = None
         self._draw: Draw = Draw(self._board)
         self._draw2: Draw = Draw(self._board)
 
@@ -84,32 +114,208 @@ class Game():
         """
         return self._draw
 
+    @property
+    def ai(self) -> Optional[AIPlayer]:
+        """
+        getter property for the computer player
+
+        Returns:
+            Optional[AIPlayer]: the computer player, or None in a
+            two-player game.
+        """
+        return self._ai
+
+    @property
+    def state(self) -> str:
+        """
+        getter property for the state of the game loop
+
+        Returns:
+            str: 'playing', 'game over' while the result is shown,
+            or 'replay' while asking to play again.
+        """
+        return self._state
+
+    @property
+    def text(self) -> TextCache:
+        """
+        getter property for the text label cache
+
+        Returns:
+            TextCache: an instance of the 'TextCache' class.
+        """
+        return self._text
+
+    @property
+    def solver(self) -> Solver:
+        """
+        getter property for the solver giving hints
+
+        Returns:
+            Solver: an instance of the 'Solver' class, made the first
+            time it is needed.
+        """
+        if self._solver is None:
+            self._solver = Solver(load_book(), time_budget=1.0)
+        return self._solver
+
+    def hint(self) -> int:
+        """
+        function to suggest a column for the player whose turn it is.
+        This is the perfect move if the solver finds it within its time
+        budget, and the move of a short search otherwise.
+        """
+        return self._find_hint(self.board.state, self.turn.player_turn)
+
+    def _find_hint(self, state: BitBoard, player: int) -> int:
+        """
+        function to suggest a column for 'player' in a position.
+        """
+        try:
+            return self.solver.best_move(state, player)
+        except SearchTimeout:
+            return Negamax(0.5).search(state, player)
+
+    def hinting(self) -> bool:
+        """
+        function to check if a hint is being looked for.
+        """
+        return self._hint_thread is not None and self._hint_thread.is_alive()
+
+    def _show_hint(self) -> None:
+        """
+        function to start looking for a hint in a background thread,
+        so the window keeps drawing frames. '_poll_hint' shows it.
+        """
+        if self.hinting():
+            return
+        self._hint = None
+        self._hint_thread = threading.Thread(
+            target=self._run_hint,
+            args=(self.board.state.copy(), self.turn.player_turn),
+            daemon=True)
+        self._hint_thread.start()
+
+    def _run_hint(self, state: BitBoard, player: int) -> None:
+        """
+        Thread target storing the hint with the position it is for.
+        """
+        self._hint = (state.key(player), self._find_hint(state, player))
+
+    def _poll_hint(self) -> None:
+        """
+        function to show a hint once it has been found, by hovering the
+        current player's piece over the suggested column. A hint for a
+        position that has since changed is dropped.
+        """
+        if self.hinting() or self._hint is None:
+            return
+        key, column = self._hint
+        self._hint = None
+        player = self.turn.player_turn
+        if key != self.board.state.key(player):
+            return
+        if player == 1:
+            color = self.color.red
+        else:
+            color = self.color.yellow
+        size = self.screen.square_size
+        self.draw.hover(column * size + size // 2, color)
+        print(f"Hint: play column {column + 1}")
+
+    @property
+    def store(self) -> Optional[RecordStore]:
+        """
+        getter property for the game record store
+
+        Returns:
+            Optional[RecordStore]: where finished games are saved, or
+            None if they are not recorded.
+        """
+        return self._store
+
+    @property
+    def profiler(self) -> Optional[Profiler]:
+        """
+        getter property for the profiler
+
+        Returns:
+            Optional[Profiler]: what times the game loop, or None if
+            it is not timed.
+        """
+        return self._profiler
+
+    @property
+    def record(self) -> GameRecord:
+        """
+        getter property for the record of the current game
+
+        Returns:
+            GameRecord: the moves played so far.
+        """
+        return self._record
+
+    def _new_record(self) -> GameRecord:
+        """
+        function to start recording a new game.
+        """
+        players = ["human", "human"]
+        if self._ai is not None:
+            players[self._ai.player_number - 1] = "ai"
+        return GameRecord(self.board.width, self.board.height,
+                          self.board.connect, (players[0], players[1]))
+
+    def _save_record(self, winner: int) -> None:
+        """
+        function to queue the finished game for saving.
+        """
+        self._record.finish(winner)
+        if self._store is not None:
+            self._store.record(self._record.to_dict())
+
+    def _message_size(self) -> int:
+        """
+        function to get the font size of the result messages, which
+        fill three quarters of the strip above the board.
+        """
+        return max(8, self.screen.square_size * 3 // 4)
+
+    def _show_message(self, message: str,
+                      color: tuple[int, int, int]) -> None:
+        """
+        function to draw a result message centred in the strip above
+        the board. Whatever does not fit in the strip is cut off, so
+        nothing is drawn over the board.
+        """
+        strip = self.draw.hover_strip()
+        label = self.text.label(message, self._message_size(), color)
+        window = self.screen.window
+        pygame.draw.rect(window, self.color.black, strip)
+        window.set_clip(strip)
+        window.blit(label, ((self.screen.window_width -
+                             label.get_width()) // 2,
+                            (self.screen.square_size -
+                             label.get_height()) // 2))
+        window.set_clip(None)
+        pygame.display.update(strip)
+        print(message)
+
     def _print_winner_message(self, player: int) -> None:
         """
         function to print the message if a player wins.
         """
-        font = pygame.font.SysFont("monospace", 75)
         message: str = "Player " + str(player) + " wins!"
         if player == 1:
             color = self.color.red
-            label = font.render(message, 1, color)
-            self.screen.window.blit(label, (40, 10))
         else:
             color = self.color.yellow
-            label = font.render(message, 1, color)
-            self.screen.window.blit(label, (40, 10))
-        print(message)
+        self._show_message(message, color)
 
     def _print_tie_message(self) -> None:
         """
         funcion to print the message if the players tie
         """
-        font = pygame.font.SysFont("monospace", 75)
-        message: str = "Tie Game!"
-        color = self.color.blue
-        label = font.render(message, 1, color)
-        self.screen.window.blit(label, (160, 10))
-        print(message)
+        self._show_message("Tie Game!", self.color.blue)
 
     def _print_replay_message(self) -> None:
         """
@@ -123,35 +329,22 @@ class Game():
                          (0, 0, self.screen.window_width,
                           self.screen.square_size))
 
-        font = pygame.font.SysFont("monospace", 22)
         message: str = "Click anywhere to play again, or press Esc to quit."
         color = self.color.lightblue
-        label = font.render(message, 1, color)
+        label = self.text.label(message, 22, color)
         self.screen.window.blit(label, (20, 5))
 
-    def _replay(self, event: pygame.event.EventType) -> bool:
+    def _replay(self, event: pygame.event.EventType) -> Optional[bool]:
         """
-        function to determine if the player wishes to play
-        again or not. Returns true if so, false if not.
+        function to determine from an event if the player wishes
+        to play again. Returns true on a mouse click, false if Esc
+        was pressed, and None for any other event.
         """
-        self._print_replay_message()
-        pygame.display.update()
-
-        # Start an event loop to handle mouse click specifically for replay
-        while True:
-            for event in pygame.event.get():
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    return True  # Return True immediately on mouse click
-
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        return False
-
-                elif event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-
-            pygame.time.delay(100)
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            return True
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            return False
+        return None
 
     def handle_mouse_motion(self, screen: pygame.Surface,
                             event_pos: list[int]) -> None:
@@ -163,25 +356,18 @@ class Game():
         """
 
         # If the mouse is moving, update the location of
-        # the hovering piece
-        color = self.color.black
-        screen.fill(color)
-        self.draw.gameboard()
+        # the hovering piece. Only the strip above the board
+        # is redrawn.
         posx = event_pos[0]
         if self.turn._player_turn == 1:
             # If it's player 1's turn,
             # the circle will be red
             color = self.color.red
-            self.draw.draw_circle(color,
-                                  (posx,
-                                   int(self.draw.screen.square_size/2)))
         else:
             # If it's player 2's turn,
             # the circle will be yellow
             color = self.color.yellow
-            self.draw.draw_circle(color,
-                                  (posx,
-                                   int(self.draw.screen.square_size/2)))
+        self.draw.hover(posx, color)
 
     def handle_mouse_click(self, event_pos: list[float]) -> Optional[int]:
         """
@@ -193,31 +379,21 @@ class Game():
         # If a player has placed a piece...
 
         # Clear the top of the screen
-        color = self.color.black
-        pygame.draw.rect(self.screen.window,
-                         color,
-                         (0, 0, self.screen.window_width,
-                          self.screen.square_size))
+        self.draw.clear_hover()
+        posx = event_pos[0]
+        column = int(math.floor(posx/self.screen.square_size))
+        return self.play_column(column)
+
+    def play_column(self, column: int) -> Optional[int]:
+        """
+        function to drop the current player's piece in a column.
+        Returns the time the game ended, or None if it goes on.
+        """
         try:
-            posx = event_pos[0]
-            column = int(math.floor(posx/self.screen.square_size))
             # Drop a piece that matches the color of the player
             self.board.drop_piece(column, self.turn._player_turn)
-
-            # Update the state of the board
-            self.draw.gameboard()
-            pygame.display.update()
-            self.turn._increment_turn()
-            if (self.board.has_won(self.turn._player_turn)):
-                # Check for the winning condition
-                self._print_winner_message(self.turn._player_turn)
-                return pygame.time.get_ticks()
-            elif self.turn._turn_count == 42:
-                # Tie game
-                self._print_tie_message()
-                return pygame.time.get_ticks()
-            else:
-                self.turn._switch_player()
+            self._record.add_move(column)
+            return self._end_turn()
         except ValueError:
             print("Please enter a valid column on the game board.")
         except FullError:
@@ -228,54 +404,247 @@ class Game():
             return None
         return None
 
-    def game_loop(self) -> None:
+    def _end_turn(self) -> Optional[int]:
         """
-        function to run the game loop.
+        function to finish the turn of the player who just dropped a
+        piece. Returns the time the game ended, or None if it goes on.
         """
-        pygame.init()
-        screen = self.screen.window
+        # Update the state of the board
         self.draw.gameboard()
-        pygame.display.update()
-        clock = pygame.time.Clock()
-        game_over = False
-        wait_time = None
+        self.turn._increment_turn()
+        if (self.board.has_won(self.turn._player_turn)):
+            # Check for the winning condition
+            self._print_winner_message(self.turn._player_turn)
+            self._save_record(self.turn._player_turn)
+            return pygame.time.get_ticks()
+        elif self.turn.turns_left == 0:
+            # Tie game
+            self._print_tie_message()
+            self._save_record(0)
+            return pygame.time.get_ticks()
+        else:
+            self.turn._switch_player()
+        return None
 
-        while not game_over:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    sys.exit()
+    def _moves_per_take_back(self) -> int:
+        """
+        function to get how many moves undo and redo step over: two
+        against the computer, so the human is to play again.
+        """
+        return 1 if self._ai is None else 2
+
+    def undo(self) -> bool:
+        """
+        function to take back the last move, or the last move of each
+        side against the computer. Returns true if a move was taken
+        back.
+        """
+        if self._ai is not None and self._ai.thinking():
+            return False
+        undone = False
+        for unused in range(self._moves_per_take_back()):
+            if not self.board.can_undo:
+                break
+            column, row, player = self.board.undo_move()
+            self.turn.undo_turn(player)
+            self._record.undo_move()
+            undone = True
+        if undone:
+            self.draw.gameboard()
+        return undone
 
-                if event.type == pygame.MOUSEMOTION and not wait_time:
-                    self.handle_mouse_motion(screen, event.pos)
-                pygame.display.update()
+    def redo(self) -> Optional[int]:
+        """
+        function to play again the moves taken back by 'undo'.
+        Returns the time the game ended, or None if it goes on.
+        """
+        if self._ai is not None and self._ai.thinking():
+            return None
+        for unused in range(self._moves_per_take_back()):
+            if not self.board.can_redo:
+                break
+            column, row, player = self.board.redo_move()
+            self._record.add_move(column)
+            ended_at = self._end_turn()
+            if ended_at is not None:
+                return ended_at
+        return None
 
-                if event.type == pygame.MOUSEBUTTONDOWN and not wait_time:
-                    wait_time = self.handle_mouse_click(event.pos)
+    def _ai_turn(self) -> bool:
+        """
+        function to check if it is the computer's turn to move.
+        """
+        return (self._ai is not None and
+                self.turn._player_turn == self._ai.player_number)
 
-            if wait_time:
-                # If the game has been won, check how long it's been
-                if pygame.time.get_ticks() - wait_time > 3000:
-                    # If 3 seconds have passed, end the game
-                    # and ask if the player wants to replay
+    def _poll_ai(self) -> Optional[int]:
+        """
+        function to advance the computer player by one frame. Starts
+        a search when it is the computer's turn and plays the move once
+        the search has finished. Returns the time the game ended, or
+        None if it goes on.
+        """
+        if self._ai is None or not self._ai_turn() or self._ai.thinking():
+            return None
+        column = self._ai.result()
+        if column is None:
+            self._ai.start(self.board.state)
+            return None
+        stats = self._ai.stats
+        print(f"AI played column {column} (depth {stats.depth}, "
+              f"{stats.nodes} nodes, {stats.nodes_per_second:.0f} nodes/sec)")
+        return self.play_column(column)
 
-                    replay = self._replay(event)
+    def _start_game(self) -> None:
+        """
+        function to start a new game on a clean board.
+        """
+        self.board.reset()
+        self.turn._turn_count = 0
+        self.turn._player_turn = 1
+        self._state = self.PLAYING
+        self._ended_at = 0
+        self._record = self._new_record()
+        self.draw.invalidate()
+        self.draw.clear_hover()
+        self.draw.gameboard()
+
+    def _idle_timeout(self) -> int:
+        """
+        function to get how many milliseconds the game loop may
+        wait for the next event, 0 meaning until one arrives.
+        """
+        if self._state == self.GAME_OVER:
+            elapsed = pygame.time.get_ticks() - self._ended_at
+            return max(1, 3001 - elapsed)
+        if self._state == self.PLAYING and (self._ai_turn() or
+                                            self.hinting()):
+            # Check on the computer's search or the hint every frame
+            return 16
+        return 0
+
+    def _play_event(self, event: pygame.event.EventType) -> None:
+        """
+        function to handle an event while a game is being played.
+        """
+        ended_at: Optional[int] = None
+        if event.type == pygame.MOUSEMOTION:
+            self.handle_mouse_motion(self.screen.window, event.pos)
+        elif event.type == pygame.MOUSEBUTTONDOWN and not self._ai_turn():
+            ended_at = self.handle_mouse_click(event.pos)
+        elif event.type == pygame.KEYDOWN and not self._ai_turn():
+            ended_at = self._key_event(event.key, event.mod)
+        if ended_at is None:
+            ended_at = self._poll_ai()
+        self._poll_hint()
+        if ended_at is not None:
+            self._state = self.GAME_OVER
+            self._ended_at = ended_at
+
+    def _key_event(self, key: int, mod: int = 0) -> Optional[int]:
+        """
+        function to handle a key pressed on a player's turn: 'h' for a
+        hint, 'u' or Ctrl+Z to undo and 'r' or Ctrl+Y to redo. Returns
+        the time the game ended, or None if it goes on.
+        """
+        ctrl = bool(mod & pygame.KMOD_CTRL)
+        if key == pygame.K_h:
+            self._show_hint()
+        elif key == pygame.K_u or (ctrl and key == pygame.K_z):
+            self.undo()
+        elif key == pygame.K_r or (ctrl and key == pygame.K_y):
+            return self.redo()
+        return None
 
-                    # if response is false, close the game
-                    if replay is False:
-                        game_over = True
-                    else:
-                        self.board.reset()  # Reset the board
-                        self.draw.gameboard()  # Redraw the empty board
+    def handle_event(self, event: pygame.event.EventType) -> bool:
+        """
+        function to move the game along in response to one event.
+        Returns false once the player has chosen to quit.
+        """
+        if self._state == self.PLAYING:
+            self._play_event(event)
+        elif self._state == self.GAME_OVER:
+            # Show the result for 3 seconds, then ask
+            # if the player wants to replay
+            if pygame.time.get_ticks() - self._ended_at > 3000:
+                self._print_replay_message()
+                pygame.display.update(self.draw.hover_strip())
+                self._state = self.REPLAY
+        else:
+            replay = self._replay(event)
+            if replay is False:
+                return False
+            elif replay:
+                self._start_game()
+        return True
+
+    def _end_frame(self, event: pygame.event.EventType) -> None:
+        """
+        function to close a frame timed by the profiler, and draw the
+        overlay if it is shown.
+        """
+        profiler = self._profiler
+        if profiler is None:
+            return
+        profiler.end_frame(event.type != pygame.NOEVENT)
+        if profiler.overlay:
+            label = self.text.font(16).render(profiler.overlay_text(), 1,
+                                              self.color.lightblue)
+            width = self.screen.window_width
+            rect = pygame.Rect(width - 230, 0, 230, 20)
+            pygame.draw.rect(self.screen.window, self.color.black, rect)
+            self.screen.window.blit(label, (width - label.get_width() - 4,
+                                            2))
+            pygame.display.update(rect)
+
+    @staticmethod
+    def hot_paths() -> list[tuple[type, str, str]]:
+        """
+        function to get the methods timed by the profiler, with the
+        names they are reported under.
+        """
+        return [(Game, "handle_event", "Game.handle_event"),
+                (Game, "handle_mouse_motion", "Game.handle_mouse_motion"),
+                (Renderer, "gameboard", "Draw.gameboard"),
+                (Board, "has_won", "Board.has_won")]
 
-                        game_over = True  # Calling recursively, should end
+    def game_loop(self) -> None:
+        """
+        function to run the game loop.
 
-                        # reset turn variables
-                        self.turn._turn_count = 0
-                        self.turn._player_turn = 1
+        The loop sleeps in 'pygame.event.wait' until there is
+        something to do, and a replay starts a new game in
+        the same loop.
+        """
+        pygame.init()
+        # Load the message fonts while the first game is played
+        self.text.preload((self._message_size(), 22))
+        self._start_game()
+        pygame.display.update()
+        if self._profiler is not None:
+            self._profiler.install(self.hot_paths())
 
-                        # start a new game
-                        self.game_loop()
+        try:
+            while True:
+                timeout = self._idle_timeout()
+                if timeout:
+                    event = pygame.event.wait(timeout)
                 else:
-                    pygame.display.update()
-
-            clock.tick(60)  # Keep the game loop running smoothly
+                    event = pygame.event.wait()
+                if self._profiler is not None:
+                    self._profiler.begin_frame()
+                if event.type == pygame.QUIT:
+                    sys.exit()
+                playing = self.handle_event(event)
+                self._end_frame(event)
+                if not playing:
+                    return
+        finally:
+            # Stop the computer's worker processes, if it has any
+            if self._ai is not None:
+                self._ai.close()
+            # Write out the games still waiting to be saved
+            if self._store is not None:
+                self._store.close()
+            if self._profiler is not None:
+                self._profiler.uninstall()
@@ -1,10 +1,20 @@
 """
 Module to manage the graphics.
+
+'Renderer' draws a board onto a 'Screen'. The game uses 'Draw', the
+renderer of its window; 'OffscreenRenderer' draws into an in-memory
+surface instead, so board images can be made without a display.
 """
 
+import os
+import threading
+import time
+
 import pygame
-from board import Screen, Board, Spot
-from typing import Dict, Any
+from screen import OffscreenScreen, Screen
+from board import Board, Spot
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional
 
 
 class MultiError(Exception):
@@ -81,6 +91,76 @@ class Color():
         return self._black
 
 
+class TextCache():
+    """
+    Class that loads fonts once and remembers
+    rendered text labels.
+    """
+    def __init__(self, name: str = "monospace") -> None:
+        """
+        Constructor for 'TextCache'. No font is
+        loaded until one is needed.
+        """
+        self._name = name
+        self._fonts: Dict[int, pygame.font.Font] = {}
+        self._labels: Dict[tuple[str, int, tuple[int, int, int]],
+                           pygame.Surface] = {}
+        self._lock = threading.Lock()
+        self._loader: Optional[threading.Thread] = None
+
+    @property
+    def name(self) -> str:
+        """
+        getter property for the font name
+
+        Returns:
+            str: the name of the system font used for labels.
+        """
+        return self._name
+
+    def preload(self, sizes: Iterable[int]) -> None:
+        """
+        Start loading fonts in the background, so that the first
+        message does not wait on the system font lookup.
+        """
+        self._loader = threading.Thread(target=self._load_all,
+                                        args=(tuple(sizes),), daemon=True)
+        self._loader.start()
+
+    def _load_all(self, sizes: tuple[int, ...]) -> None:
+        """
+        Thread target loading each font size.
+        """
+        for size in sizes:
+            self.font(size)
+
+    def font(self, size: int) -> pygame.font.Font:
+        """
+        Get the font of a given size, loading it the first time.
+        """
+        with self._lock:
+            font = self._fonts.get(size)
+            if font is None:
+                if not pygame.font.get_init():
+                    pygame.font.init()
+                font = pygame.font.SysFont(self._name, size)
+                self._fonts[size] = font
+            return font
+
+    def label(self, text: str, size: int,
+              color: tuple[int, int, int]) -> pygame.Surface:
+        """
+        Get the rendered image of some text, rendering it the first
+        time it is asked for.
+        """
+        key = (text, size, color)
+        label = self._labels.get(key)
+        if label is None:
+            label = self.font(size).render(text, 1, color)
+            self._labels[key] = label
+        return label
+
+
 class DrawMeta(type):
     """
     Meta-class for 'Draw'. This class
@@ -104,28 +184,38 @@ class DrawMeta(type):
         return cls._instances[cls]
 
 
-class Draw(metaclass=DrawMeta):
+class Renderer():
     """
-    Class that draws the graphics of
-    the game.
+    Class that draws a board onto a screen, and pushes what changed
+    to it.
     """
-    __initialized: bool = False
+    # the board images kept for full redraws, each the size of the
+    # board; any other redraw only blits the cells that changed
+    BOARD_CACHE_SIZE: int = 2
 
-    def __init__(self, board: Board) -> None:
+    def __init__(self, board: Board, screen: Optional[Screen] = None) -> None:
         """
-        Constructor for 'Draw'.
+        Constructor for 'Renderer'.
+
+        Without a 'screen', a window the size of the board is opened.
         """
-        if self.__initialized:
-            return
-        self._screen = Screen(board.height, board.width)
+        if screen is None:
+            screen = Screen(board.height, board.width)
+        self._screen = screen
         self._board = board
         self._spot = Spot()
         self._color = Color()
-        self._radius = int(self.screen.square_size/2 - 5)
-
-        # set a variable, '__initialized' to True
-        # This prevents re-initialization:
-        self.__initialized = True
+        # the board's cells as last drawn, so that 'gameboard'
+        # only redraws the cells that changed
+        self._drawn: bytes = b""
+        self._render_time = 0.0
+
+        # pre-rendered surfaces, rebuilt when the board or square
+        # size changes
+        self._geometry: tuple[int, int, int] = (0, 0, 0)
+        self._sprites: Dict[tuple[int, int, int], pygame.Surface] = {}
+        self._frame: Optional[pygame.Surface] = None
+        self._boards: OrderedDict[bytes, pygame.Surface] = OrderedDict()
 
     @property
     def screen(self) -> Screen:
@@ -175,7 +265,138 @@ class Draw(metaclass=DrawMeta):
         Returns:
             int: the integer representing the radius.
         """
-        return self._radius
+        # leave a 5 pixel margin, or less on small thumbnails
+        size = self.screen.square_size
+        return int(size/2 - min(5, size // 10))
+
+    @property
+    def render_time(self) -> float:
+        """
+        getter property for the time taken by the last drawing call
+
+        Returns:
+            float: the seconds spent in the last 'gameboard' or
+            'hover' call.
+        """
+        return self._render_time
+
+    def invalidate(self) -> None:
+        """
+        Forget what has been drawn, so that the next call to
+        'gameboard' redraws every cell.
+        """
+        self._drawn = b""
+
+    def clear_cache(self) -> None:
+        """
+        Drop every pre-rendered surface and redraw from scratch.
+        """
+        self._sprites.clear()
+        self._boards.clear()
+        self._frame = None
+        self.invalidate()
+
+    def _check_geometry(self) -> None:
+        """
+        Clear the cache if the board or square size has changed
+        since the cached surfaces were rendered.
+        """
+        # the radius follows the square size
+        geometry = (self.board.width, self.board.height,
+                    self.screen.square_size)
+        if geometry != self._geometry:
+            self._geometry = geometry
+            self.clear_cache()
+
+    def piece_color(self, occupant: int) -> tuple[int, int, int]:
+        """
+        Get the color of a piece given the player occupying a cell,
+        black meaning an empty hole.
+        """
+        if occupant == 1:
+            return self.color.red
+        if occupant == 2:
+            return self.color.yellow
+        return self.color.black
+
+    def sprite(self, color: tuple[int, int, int]) -> pygame.Surface:
+        """
+        Get the pre-rendered image of one cell of the board holding
+        a piece of the given color.
+        """
+        sprite = self._sprites.get(color)
+        if sprite is None:
+            size = self.screen.square_size
+            sprite = pygame.Surface((size, size))
+            sprite.fill(self.color.blue)
+            pygame.draw.circle(sprite, color, (size // 2, size // 2),
+                               self.radius)
+            self._sprites[color] = sprite
+        return sprite
+
+    def frame(self) -> pygame.Surface:
+        """
+        Get the pre-rendered image of the empty board.
+        """
+        if self._frame is None:
+            size = self.screen.square_size
+            self._frame = pygame.Surface((self.board.width * size,
+                                          self.board.height * size))
+            hole = self.sprite(self.color.black)
+            for row in range(self.board.height):
+                for col in range(self.board.width):
+                    self._frame.blit(hole, (col * size, row * size))
+        return self._frame
+
+    def _board_surface(self, cells: bytes) -> pygame.Surface:
+        """
+        Get the image of the board with the given cells (as returned
+        by 'Board.cells'), rendering it if it is not one of the last
+        'BOARD_CACHE_SIZE' drawn.
+        """
+        surface = self._boards.get(cells)
+        if surface is not None:
+            self._boards.move_to_end(cells)
+            return surface
+        surface = self.frame().copy()
+        size = self.screen.square_size
+        top = self.board.height - 1
+        for r, c, occupant in self.board.occupied():
+            surface.blit(self.sprite(self.piece_color(occupant)),
+                         (c * size, (top - r) * size))
+        self._boards[cells] = surface
+        if len(self._boards) > self.BOARD_CACHE_SIZE:
+            self._boards.popitem(last=False)
+        return surface
+
+    def hover_strip(self) -> pygame.Rect:
+        """
+        Get the rectangle above the board where the hovering piece
+        and messages are drawn.
+        """
+        return pygame.Rect(0, 0, self.screen.window_width,
+                           self.screen.square_size)
+
+    def clear_hover(self) -> pygame.Rect:
+        """
+        Paint the hover strip black and return its rectangle.
+        """
+        strip = self.hover_strip()
+        pygame.draw.rect(self.screen.window, self.color.black, strip)
+        self.screen.update(strip)
+        return strip
+
+    def hover(self, posx: int, color: tuple[int, int, int]) -> None:
+        """
+        Draw the hovering piece at 'posx', updating only the
+        hover strip of the window.
+        """
+        start = time.perf_counter()
+        strip = self.hover_strip()
+        pygame.draw.rect(self.screen.window, self.color.black, strip)
+        self.draw_circle(color, (posx, int(self.screen.square_size/2)))
+        self.screen.update(strip)
+        self._render_time = time.perf_counter() - start
 
     def draw_rectangle(self,
                        draw_height: int,
@@ -202,36 +423,137 @@ class Draw(metaclass=DrawMeta):
         """
         Draw the current graphical representation
         of the board.
+
+        A full redraw is a single blit of a cached image of the board.
+        After that, only cells whose piece changed are redrawn, each as
+        a blit of a pre-rendered sprite, and only their rectangles are
+        pushed to the display.
         """
-        # Define the colors to be used for the board
-        # and pieces.
+        start = time.perf_counter()
+        self._check_geometry()
 
-        hue = self.color
+        gameboard = self.board
+        window = self.screen.window
+        size = self.screen.square_size
+        cells = gameboard.cells()
+
+        if not self._drawn:
+            window.blit(self._board_surface(cells), (0, size))
+            self._drawn = cells
+            self.screen.update(pygame.Rect(
+                0, size, gameboard.width * size, gameboard.height * size))
+            self._render_time = time.perf_counter() - start
+            return
 
-        red = hue.red
-        blue = hue.blue
-        yellow = hue.yellow
-        black = hue.black
+        dirty = []
+        if cells != self._drawn:
+            positions = gameboard.positions
+            drawn = self._drawn
+            for i in range(len(cells)):
+                if cells[i] == drawn[i]:
+                    continue
+                r, c = positions[i][0], positions[i][1]
+                draw_height = gameboard.height - r
+                dirty.append(window.blit(
+                    self.sprite(self.piece_color(cells[i])),
+                    (c * size, draw_height * size)))
+            self._drawn = cells
+
+        if dirty:
+            self.screen.update(dirty)
+        self._render_time = time.perf_counter() - start
+
+
+class Draw(Renderer, metaclass=DrawMeta):
+    """
+    Class that draws the graphics of
+    the game.
+    """
+    __initialized: bool = False
 
-        gameboard = self.board
+    def __init__(self, board: Board) -> None:
+        """
+        Constructor for 'Draw'.
+        """
+        if self.__initialized:
+            return
+        super().__init__(board)
+
+        # set a variable, '__initialized' to True
+        # This prevents re-initialization:
+        self.__initialized = True
+
+
+class OffscreenRenderer(Renderer):
+    """
+    Class that draws boards into an in-memory surface, without opening
+    a window or needing a display.
+    """
+    def __init__(self, board: Board,
+                 square_size: Optional[int] = None) -> None:
+        """
+        Constructor for 'OffscreenRenderer'.
 
-        for r, c, spot in gameboard:
-            draw_height = gameboard.height - r
+        'square_size' is the size of a cell in pixels, by default the
+        size the game window would use.
+        """
+        super().__init__(board, OffscreenScreen(board.height, board.width,
+                                                square_size))
 
-            self.draw_rectangle(draw_height, c, blue)
+    def render(self, board: Optional[Board] = None) -> pygame.Surface:
+        """
+        Draw a board of the same size, or the current one, and get the
+        image of the board without the strip above it. The image is a
+        view that changes with the next drawing.
+        """
+        if board is not None:
+            if (board.width, board.height) != (self.board.width,
+                                               self.board.height):
+                raise ValueError("Board size differs from the renderer's")
+            self._board = board
+        self.gameboard()
+        size = self.screen.square_size
+        return self.screen.window.subsurface(pygame.Rect(
+            0, size, self.board.width * size, self.board.height * size))
 
-            occupant = spot.player_number()
+    def to_bytes(self, board: Optional[Board] = None) -> bytes:
+        """
+        Draw a board like 'render' and get the image as raw RGB bytes,
+        row by row from the top.
+        """
+        return pygame.image.tobytes(self.render(board), "RGB")
+
+    def save(self, path: str, board: Optional[Board] = None) -> None:
+        """
+        Draw a board like 'render' and save the image to a file, whose
+        format (such as PNG) is given by its extension.
+        """
+        pygame.image.save(self.render(board), path)
 
-            center = (int(c * self.screen.square_size +
-                          self.screen.square_size / 2),
-                      int(draw_height *
-                          self.screen.square_size +
-                          self.screen.square_size / 2))
-            if occupant == 1:
-                self.draw_circle(red, center)
-            elif occupant == 2:
-                self.draw_circle(yellow, center)
-            else:
-                self.draw_circle(black, center)
 
-        pygame.display.update()
+def export_positions(boards: Iterable[Board], directory: str,
+                     image_format: str = "png",
+                     square_size: Optional[int] = None) -> list[str]:
+    """
+    Save an image of each board to 'directory', numbered in order, as
+    PNG files or as raw RGB frames ('.rgb'). Boards of the same size
+    share a renderer, which only redraws the cells that differ from the
+    previous board. Returns the paths written.
+    """
+    if image_format not in ("png", "raw"):
+        raise ValueError(f"Unknown image format: {image_format}")
+    renderer: Optional[OffscreenRenderer] = None
+    paths = []
+    for index, board in enumerate(boards):
+        if renderer is None or (renderer.board.width, renderer.board.height
+                                ) != (board.width, board.height):
+            renderer = OffscreenRenderer(board, square_size)
+        if image_format == "png":
+            path = os.path.join(directory, f"{index:06d}.png")
+            renderer.save(path, board)
+        else:
+            path = os.path.join(directory, f"{index:06d}.rgb")
+            with open(path, "wb") as frame:
+                frame.write(renderer.to_bytes(board))
+        paths.append(path)
+    return paths
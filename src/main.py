@@ -3,18 +3,84 @@
 Main module.
 """
 
+import argparse
+import sys
+from typing import Optional
+
+from ai import AIPlayer
+from client import Connection, NetworkGame
 from game import Game
+from profiler import Profiler
+from records import FileBackend, MongoBackend, RecordBackend, RecordStore
+
+
+def _make_game(args: argparse.Namespace, store: Optional[RecordStore],
+               profiler: Optional[Profiler]) -> Game:
+    """
+    Set up a local game, or a game on the server given by '--server'.
+    """
+    if args.server:
+        host, unused, port = args.server.rpartition(":")
+        connection = Connection.open(host or "127.0.0.1", int(port))
+        return NetworkGame(connection, store, profiler)
+    ai: Optional[AIPlayer] = None
+    if args.ai:
+        ai = AIPlayer(args.ai, args.ai_time, workers=args.ai_workers)
+    return Game(ai, args.cols, args.rows, args.connect, store, profiler)
 
 
-def main() -> None:
+def main(argv: Optional[list[str]] = None) -> None:
     """
     Main function. When called,
     this function runs the game
     application.
     """
-    game: Game = Game()
-    game.game_loop()
+    parser = argparse.ArgumentParser(description="Play Connect 4.")
+    parser.add_argument("--ai", type=int, choices=(1, 2),
+                        help="let the computer play as this player")
+    parser.add_argument("--ai-time", type=float, default=1.0,
+                        help="seconds the computer may think per move")
+    parser.add_argument("--ai-workers", type=int, default=1,
+                        help="processes the computer searches with")
+    parser.add_argument("--cols", type=int, default=7)
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--connect", type=int, default=4,
+                        help="pieces in a row needed to win")
+    parser.add_argument("--record", metavar="FILE",
+                        help="append every finished game to FILE")
+    parser.add_argument("--mongo-uri",
+                        help="save every finished game to this MongoDB "
+                             "server instead")
+    parser.add_argument("--profile", action="store_true",
+                        help="print where the time went when the game ends")
+    parser.add_argument("--overlay", action="store_true",
+                        help="show the frame rate on screen")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="save a trace of the timed calls, for "
+                             "chrome://tracing or Perfetto")
+    parser.add_argument("--server", metavar="HOST:PORT",
+                        help="play against someone on this game server")
+    args = parser.parse_args(argv or [])
+
+    backend: Optional[RecordBackend] = None
+    if args.mongo_uri:
+        backend = MongoBackend.connect(args.mongo_uri)
+    elif args.record:
+        backend = FileBackend(args.record)
+    store = RecordStore(backend) if backend is not None else None
+    profiler: Optional[Profiler] = None
+    if args.profile or args.overlay or args.trace:
+        profiler = Profiler(args.trace is not None, args.overlay)
+    game: Game = _make_game(args, store, profiler)
+    try:
+        game.game_loop()
+    finally:
+        if profiler is not None:
+            print(profiler.report())
+            if args.trace:
+                count = profiler.dump_trace(args.trace)
+                print(f"Saved {count} timed calls to {args.trace}")
 
 
 if __name__ == '__main__':
-    main()
+    main(sys.argv[1:])
@@ -0,0 +1,328 @@
+"""
+Module to measure where the game spends its time.
+
+A 'Profiler' times whole frames of the game loop and, once installed,
+individual hot functions such as 'Board.has_won'. Functions are timed by
+temporarily replacing them with timing wrappers, so nothing is measured,
+and nothing slows down, while no profiler is installed.
+"""
+
+import functools
+import json
+import time
+from collections import deque
+from typing import Any, Optional
+
+
+class Histogram():
+    """
+    Class counting durations in buckets whose bounds double, from
+    1 microsecond up.
+    """
+    BUCKETS: int = 32
+
+    def __init__(self) -> None:
+        """
+        Constructor for 'Histogram'.
+        """
+        self._buckets = [0] * self.BUCKETS
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    @property
+    def count(self) -> int:
+        """
+        getter property for the number of durations added
+
+        Returns:
+            int: the integer count of timed calls.
+        """
+        return self._count
+
+    @property
+    def total(self) -> float:
+        """
+        getter property for the sum of the durations
+
+        Returns:
+            float: the seconds spent in all timed calls.
+        """
+        return self._total
+
+    @property
+    def mean(self) -> float:
+        """
+        getter property for the average duration
+
+        Returns:
+            float: the mean seconds per call, 0 if there were none.
+        """
+        return self._total / self._count if self._count else 0.0
+
+    @property
+    def max(self) -> float:
+        """
+        getter property for the longest duration
+
+        Returns:
+            float: the seconds taken by the slowest call.
+        """
+        return self._max
+
+    @property
+    def buckets(self) -> list[int]:
+        """
+        getter property for the bucket counts
+
+        Returns:
+            list[int]: the number of durations under 1, 2, 4, 8, ...
+            microseconds, each bucket counting those not in the one
+            before.
+        """
+        return self._buckets
+
+    def add(self, seconds: float) -> None:
+        """
+        Count one duration.
+        """
+        index = min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1)
+        self._buckets[index] += 1
+        self._count += 1
+        self._total += seconds
+        if seconds > self._max:
+            self._max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Get an upper bound on the duration that 'fraction' of the calls
+        took at most, to within a factor of two.
+        """
+        wanted = fraction * self._count
+        seen = 0
+        for index, count in enumerate(self._buckets):
+            seen += count
+            if count and seen >= wanted:
+                return min((1 << index) / 1e6, self._max)
+        return self._max
+
+    def summary(self) -> dict[str, float]:
+        """
+        Get the count and main statistics, in seconds.
+        """
+        return {"count": self._count, "total": self._total,
+                "mean": self.mean, "p50": self.percentile(0.5),
+                "p95": self.percentile(0.95), "max": self._max}
+
+
+class Profiler():
+    """
+    Class collecting frame timings, per-function counters and
+    histograms, and optionally a trace of every timed call.
+    """
+    def __init__(self, trace: bool = False, overlay: bool = False,
+                 trace_limit: int = 1_000_000) -> None:
+        """
+        Constructor for 'Profiler'.
+
+        With 'trace', every timed call is kept, up to 'trace_limit'
+        of them, to be saved by 'dump_trace'. 'overlay' asks the game
+        to show the frame rate on screen.
+        """
+        self._overlay = overlay
+        self._trace: Optional[list[tuple[str, float, float]]] = (
+            [] if trace else None)
+        self._trace_limit = trace_limit
+        self._histograms: dict[str, Histogram] = {}
+        self._installed: list[tuple[type, str, Any]] = []
+        self._frames = Histogram()
+        # when the recent frames and input events ended
+        self._recent_frames: deque[float] = deque()
+        self._recent_events: deque[float] = deque()
+        self._frame_start = 0.0
+        self._last_frame = 0.0
+        self._origin = time.perf_counter()
+
+    @property
+    def overlay(self) -> bool:
+        """
+        getter property for whether to show the overlay
+
+        Returns:
+            bool: true if the frame rate should be drawn on screen.
+        """
+        return self._overlay
+
+    @property
+    def frames(self) -> Histogram:
+        """
+        getter property for the frame times
+
+        Returns:
+            Histogram: the time taken to handle each frame.
+        """
+        return self._frames
+
+    @property
+    def last_frame(self) -> float:
+        """
+        getter property for the time taken by the last frame
+
+        Returns:
+            float: the seconds between 'begin_frame' and 'end_frame'.
+        """
+        return self._last_frame
+
+    def histogram(self, name: str) -> Histogram:
+        """
+        Get the histogram of a timed function, creating it if needed.
+        """
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = Histogram()
+        return histogram
+
+    def record(self, name: str, start: float, elapsed: float) -> None:
+        """
+        Count a call to 'name' that started at 'start', a
+        'time.perf_counter' value, and took 'elapsed' seconds.
+        """
+        self.histogram(name).add(elapsed)
+        self._trace_call(name, start, elapsed)
+
+    def _trace_call(self, name: str, start: float, elapsed: float) -> None:
+        """
+        Keep a call for 'dump_trace', if tracing.
+        """
+        if self._trace is not None and len(self._trace) < self._trace_limit:
+            self._trace.append((name, start, elapsed))
+
+    def wrap(self, owner: type, attribute: str,
+             name: Optional[str] = None) -> None:
+        """
+        Time every call to the method 'attribute' of the class 'owner'
+        until 'uninstall' is called.
+        """
+        name = name or f"{owner.__name__}.{attribute}"
+        original = owner.__dict__[attribute]
+        histogram = self.histogram(name)
+        clock = time.perf_counter
+        trace_call = self._trace_call
+
+        @functools.wraps(original)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                histogram.add(elapsed)
+                trace_call(name, start, elapsed)
+        setattr(owner, attribute, timed)
+        self._installed.append((owner, attribute, original))
+
+    def install(self, targets: list[tuple[type, str, str]]) -> None:
+        """
+        Time each '(class, method, name)' target.
+        """
+        for owner, attribute, name in targets:
+            self.wrap(owner, attribute, name)
+
+    def uninstall(self) -> None:
+        """
+        Put back every method replaced by 'wrap'.
+        """
+        while self._installed:
+            owner, attribute, original = self._installed.pop()
+            setattr(owner, attribute, original)
+
+    def begin_frame(self) -> None:
+        """
+        Mark the start of a frame of the game loop.
+        """
+        self._frame_start = time.perf_counter()
+
+    def end_frame(self, input_event: bool = True) -> None:
+        """
+        Mark the end of the frame started by 'begin_frame'. Frames woken
+        up by a timer rather than by the player are not counted as
+        input events.
+        """
+        end = time.perf_counter()
+        self._last_frame = end - self._frame_start
+        self._frames.add(self._last_frame)
+        self._trace_call("frame", self._frame_start, self._last_frame)
+        self._recent_frames.append(end)
+        if input_event:
+            self._recent_events.append(end)
+        self._forget(end - 1.0)
+
+    def _forget(self, before: float) -> None:
+        """
+        Drop the frames and events that ended before 'before'.
+        """
+        for recent in (self._recent_frames, self._recent_events):
+            while recent and recent[0] < before:
+                recent.popleft()
+
+    @property
+    def fps(self) -> int:
+        """
+        getter property for the frame rate
+
+        Returns:
+            int: the number of frames in the last second.
+        """
+        return len(self._recent_frames)
+
+    @property
+    def events_per_second(self) -> int:
+        """
+        getter property for the input event rate
+
+        Returns:
+            int: the number of input events in the last second.
+        """
+        return len(self._recent_events)
+
+    def overlay_text(self) -> str:
+        """
+        Get the line shown by the overlay.
+        """
+        return (f"{self.fps} fps  {self._last_frame * 1000:.1f} ms  "
+                f"{self.events_per_second} ev/s")
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Get the statistics of the frames and of every timed function.
+        """
+        stats = {"frame": self._frames.summary()}
+        for name, histogram in sorted(self._histograms.items()):
+            stats[name] = histogram.summary()
+        return stats
+
+    def report(self) -> str:
+        """
+        Format 'summary' as a table, in milliseconds.
+        """
+        lines = [f"{'':<32}{'calls':>9}{'mean':>9}{'p50':>9}{'p95':>9}"
+                 f"{'max':>9}  (ms)"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<32}{stats['count']:>9}" + "".join(
+                f"{stats[key] * 1000:>9.3f}"
+                for key in ("mean", "p50", "p95", "max")))
+        return "\n".join(lines)
+
+    def dump_trace(self, path: str) -> int:
+        """
+        Save the traced calls in the Trace Event format read by
+        chrome://tracing and Perfetto. Returns the number of calls.
+        """
+        trace = self._trace or []
+        events = [{"name": name, "ph": "X", "pid": 0, "tid": 0,
+                   "ts": (start - self._origin) * 1e6, "dur": elapsed * 1e6}
+                  for name, start, elapsed in trace]
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"},
+                      trace_file)
+        return len(events)
@@ -0,0 +1,303 @@
+"""
+Module to record finished games.
+
+Records are queued by the game and written in batches by a background
+thread, so saving a game never holds up drawing a frame. Where they are
+written is up to a backend: an append-only file of JSON lines, or a
+MongoDB collection.
+"""
+
+import json
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+
+class GameRecord():
+    """
+    Class describing one game: the columns played, the time taken to
+    choose each move and the result.
+    """
+    def __init__(self, cols: int = 7, rows: int = 6, connect: int = 4,
+                 players: tuple[str, str] = ("human", "human")) -> None:
+        """
+        Constructor for 'GameRecord'.
+        """
+        self._cols = cols
+        self._rows = rows
+        self._connect = connect
+        self._players = players
+        self._moves: list[int] = []
+        self._move_times: list[float] = []
+        self._winner = 0
+        self._started = time.time()
+        self._last = time.perf_counter()
+
+    @property
+    def moves(self) -> list[int]:
+        """
+        getter property for the moves
+
+        Returns:
+            list[int]: the columns played, player 1 first.
+        """
+        return self._moves
+
+    @property
+    def move_times(self) -> list[float]:
+        """
+        getter property for the move times
+
+        Returns:
+            list[float]: the seconds taken to choose each move.
+        """
+        return self._move_times
+
+    @property
+    def winner(self) -> int:
+        """
+        getter property for the winner
+
+        Returns:
+            int: the number of the player who won, or 0 for a tie or a
+            game still going on.
+        """
+        return self._winner
+
+    def add_move(self, column: int,
+                 elapsed: Optional[float] = None) -> None:
+        """
+        Record a move. Without 'elapsed', the time taken is the time
+        since the previous move, or since the game started.
+        """
+        now = time.perf_counter()
+        if elapsed is None:
+            elapsed = now - self._last
+        self._last = now
+        self._moves.append(column)
+        self._move_times.append(elapsed)
+
+    def undo_move(self) -> None:
+        """
+        Forget the last move recorded, when it is taken back.
+        """
+        self._moves.pop()
+        self._move_times.pop()
+        self._last = time.perf_counter()
+
+    def finish(self, winner: int) -> None:
+        """
+        Record the result: the winning player, or 0 for a tie.
+        """
+        self._winner = winner
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Get the record as a dictionary of JSON values.
+        """
+        return {"moves": self._moves, "move_times": self._move_times,
+                "winner": self._winner, "turns": len(self._moves),
+                "cols": self._cols, "rows": self._rows,
+                "connect": self._connect, "players": list(self._players),
+                "started": self._started}
+
+
+class RecordBackend(ABC):
+    """
+    Class describing where records are written. Subclasses
+    implement 'write_batch'.
+    """
+    @abstractmethod
+    def write_batch(self, records: list[dict[str, Any]]) -> None:
+        """
+        Write a batch of records.
+        """
+
+    def close(self) -> None:
+        """
+        Release anything the backend holds open.
+        """
+        pass
+
+
+class FileBackend(RecordBackend):
+    """
+    Class describing an append-only file with one JSON record
+    per line.
+    """
+    def __init__(self, path: str) -> None:
+        """
+        Constructor for 'FileBackend'.
+        """
+        self._path = path
+        self._file = open(path, "a")
+
+    @property
+    def path(self) -> str:
+        """
+        getter property for the file path
+
+        Returns:
+            str: the path of the file records are appended to.
+        """
+        return self._path
+
+    def write_batch(self, records: list[dict[str, Any]]) -> None:
+        self._file.write("".join(json.dumps(record) + "\n"
+                                 for record in records))
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class MongoBackend(RecordBackend):
+    """
+    Class describing a MongoDB collection, or anything with the same
+    'insert_many' method.
+    """
+    def __init__(self, collection: Any) -> None:
+        """
+        Constructor for 'MongoBackend'.
+        """
+        self._collection = collection
+
+    @classmethod
+    def connect(cls, uri: str, database: str = "connect4",
+                collection: str = "games") -> 'MongoBackend':
+        """
+        Connect to a MongoDB server. Requires pymongo.
+        """
+        import pymongo
+        client: Any = pymongo.MongoClient(uri)
+        return cls(client[database][collection])
+
+    def write_batch(self, records: list[dict[str, Any]]) -> None:
+        # insert_many adds an '_id' to each document, so insert copies
+        self._collection.insert_many([dict(record) for record in records],
+                                     ordered=False)
+
+
+class RecordStore():
+    """
+    Class that queues records and writes them to a backend in batches
+    from a background thread.
+    """
+    def __init__(self, backend: RecordBackend, batch_size: int = 100,
+                 flush_interval: float = 1.0) -> None:
+        """
+        Constructor for 'RecordStore'.
+
+        A batch is written once 'batch_size' records are waiting, or
+        'flush_interval' seconds after the first of them was queued.
+        """
+        self._backend = backend
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue: queue.Queue[Optional[dict[str, Any]]] = queue.Queue()
+        self._written = 0
+        self._errors = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def backend(self) -> RecordBackend:
+        """
+        getter property for the backend
+
+        Returns:
+            RecordBackend: where the records are written.
+        """
+        return self._backend
+
+    @property
+    def written(self) -> int:
+        """
+        getter property for the number of records written
+
+        Returns:
+            int: the integer count of records the backend has accepted.
+        """
+        return self._written
+
+    @property
+    def errors(self) -> int:
+        """
+        getter property for the number of failed batches
+
+        Returns:
+            int: the integer count of batches the backend rejected.
+        """
+        return self._errors
+
+    def record(self, record: dict[str, Any]) -> None:
+        """
+        Queue a record to be written. This never blocks.
+        """
+        self._queue.put(record)
+
+    def _collect(self, first: dict[str, Any]) -> tuple[list[dict[str, Any]],
+                                                       bool]:
+        """
+        Gather the records queued after 'first' into a batch. Returns
+        the batch and whether the store was closed meanwhile.
+        """
+        batch = [first]
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._batch_size:
+            try:
+                item = self._queue.get(
+                    timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _write(self, batch: list[dict[str, Any]]) -> None:
+        """
+        Hand a batch to the backend, counting failures instead of
+        stopping the writer thread.
+        """
+        try:
+            self._backend.write_batch(batch)
+            self._written += len(batch)
+        except Exception as error:
+            self._errors += 1
+            print(f"Could not save {len(batch)} game records: {error}")
+        for item in batch:
+            self._queue.task_done()
+
+    def _run(self) -> None:
+        """
+        Thread target writing batches until the store is closed.
+        """
+        closed = False
+        while not closed:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                break
+            batch, closed = self._collect(first)
+            self._write(batch)
+            if closed:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """
+        Wait until every queued record has been written.
+        """
+        self._queue.join()
+
+    def close(self) -> None:
+        """
+        Write the remaining records, stop the writer thread and close
+        the backend.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._backend.close()
@@ -0,0 +1,109 @@
+"""Module containing the pygame window the game is drawn on."""
+
+from typing import Optional, Sequence, Union
+
+import pygame
+
+
+class Screen():
+    # the largest window side, in pixels, boards are scaled down to fit
+    MAX_SIZE: int = 900
+
+    def __init__(self, rows: int, cols: int,
+                 square_size: Optional[int] = None) -> None:
+        """
+        Constructor for 'Screen'.
+
+        'square_size' is the size of a cell in pixels, by default the
+        largest that fits the window in 'MAX_SIZE'.
+        """
+        if square_size is None:
+            square_size = max(1, min(100,
+                                     self.MAX_SIZE // max(cols, rows + 1)))
+        self._square_size = square_size
+        self._window_width = cols * self._square_size
+        self._window_height = (rows+1) * self._square_size
+        self._window_size = (self._window_width, self._window_height)
+        self._window = self._create_window()
+
+    def _create_window(self) -> pygame.Surface:
+        """
+        function to open the window, returning its surface.
+        """
+        return pygame.display.set_mode(self._window_size)
+
+    def update(self, rects: Union[pygame.Rect, Sequence[pygame.Rect],
+                                  None] = None) -> None:
+        """
+        function to push the given parts of the window, or all of it,
+        to the display.
+        """
+        if rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(rects)
+
+    @property
+    def window(self) -> pygame.Surface:
+        """
+        getter property for the screen window
+
+        Returns:
+            pygame.Surface: an instance of pygame's 'Surface' class.
+        """
+        return self._window
+
+    @property
+    def window_size(self) -> tuple[int, int]:
+        """
+        getter property for the screen window's size
+
+        Returns:
+            tuple[int, int]: 'x' and 'y' values representing the
+            and height of the screen window.
+        """
+        return self._window_size
+
+    @property
+    def square_size(self) -> int:
+        """
+        getter property for the square size
+
+        Returns:
+            int: an integer representing the square size.
+        """
+        return self._square_size
+
+    @property
+    def window_width(self) -> int:
+        """
+        getter property for the screen window width
+
+        Returns:
+            int: an integer representing the window width.
+        """
+        return self._window_width
+
+    @property
+    def window_height(self) -> int:
+        """
+        getter property for the screen window height
+
+        Returns:
+            int: an integer representing the window height.
+        """
+        return self._window_height
+
+
+class OffscreenScreen(Screen):
+    """
+    Class describing a screen that is an in-memory surface, so drawing
+    on it needs no window or display.
+    """
+    def _create_window(self) -> pygame.Surface:
+        return pygame.Surface(self._window_size)
+
+    def update(self, rects: Union[pygame.Rect, Sequence[pygame.Rect],
+                                  None] = None) -> None:
+        # There is no display to push to
+        pass
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Module to host games played over the network.
+
+The server speaks a line protocol, one ASCII command per line:
+
+- on connecting, the server sends 'HELLO <cols> <rows> <connect>',
+- 'PLAY' asks for an opponent. The server answers 'WAIT' until one
+  connects, then 'START <player>' to both players,
+- 'MOVE <col>' drops the sender's piece. Both players are sent
+  'MOVED <player> <col>', followed by 'WIN <player>' or 'TIE' if it ended
+  the game. A move that cannot be played is answered by 'ERROR <reason>',
+- 'QUIT' leaves. The opponent of a player who leaves is sent 'LEFT'.
+
+Every match is a headless 'Board' and 'Turns' pair. Finished matches are
+reset and reused, and the replies are built once per server, so a move
+allocates nothing but the line it came in.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import Optional
+
+from bitboard import BitBoard
+from board import Board, FullError
+from profiler import Histogram
+from turns import Turns
+
+
+class MoveError(Exception):
+    """
+    Custom exception to handle
+    the case that a move cannot be played.
+    """
+    pass
+
+
+class Session():
+    """
+    Class describing one connected player: where to send its lines, the
+    match it is in, if any, and the player it plays as there.
+    """
+    __slots__ = ('writer', 'match', 'player_number')
+
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        """
+        Constructor for 'Session'.
+        """
+        self.writer = writer
+        self.match: Optional[Match] = None
+        self.player_number = 0
+
+
+class Match():
+    """
+    Class describing a game between two sessions.
+    """
+    __slots__ = ('_board', '_turn', '_players')
+
+    def __init__(self, cols: int = 7, rows: int = 6,
+                 connect: int = 4) -> None:
+        """
+        Constructor for 'Match'.
+        """
+        self._board = Board(cols, rows, connect)
+        self._turn = Turns(cols * rows)
+        self._players: tuple[Session, ...] = ()
+
+    @property
+    def board(self) -> Board:
+        """
+        getter property for the board
+
+        Returns:
+            Board: the board the match is played on.
+        """
+        return self._board
+
+    @property
+    def players(self) -> tuple[Session, ...]:
+        """
+        getter property for the sessions playing
+
+        Returns:
+            tuple[Session, ...]: the sessions of players 1 and 2, or
+            nothing once the match is over.
+        """
+        return self._players
+
+    def begin(self, first: Session, second: Session) -> None:
+        """
+        Start a game on a clean board, 'first' playing first.
+        """
+        self._board.reset()
+        self._turn._turn_count = 0
+        self._turn._player_turn = 1
+        self._players = (first, second)
+        for player_number, session in enumerate(self._players, 1):
+            session.match = self
+            session.player_number = player_number
+
+    def finish(self) -> tuple[Session, ...]:
+        """
+        End the game, and return the sessions that played it.
+        """
+        players = self._players
+        for session in players:
+            session.match = None
+            session.player_number = 0
+        self._players = ()
+        return players
+
+    def play(self, player_number: int, col: int) -> Optional[int]:
+        """
+        Drop a piece for 'player_number'. Returns the winner, 0 for a
+        tie, or None if the game goes on.
+        """
+        if player_number != self._turn.player_turn:
+            raise MoveError("not your turn")
+        try:
+            self._board.drop_piece(col, player_number)
+        except ValueError:
+            raise MoveError("no such column")
+        except FullError:
+            raise MoveError("column full")
+        self._turn._increment_turn()
+        if self._board.has_won(player_number):
+            return player_number
+        if self._turn.turns_left == 0:
+            return 0
+        self._turn._switch_player()
+        return None
+
+    def memory_footprint(self) -> int:
+        """
+        Get the number of bytes used by this match and the objects it
+        owns, not counting the sessions.
+        """
+        return (sys.getsizeof(self) + sys.getsizeof(self._turn) +
+                sys.getsizeof(self._turn.__dict__) +
+                self._board.memory_footprint())
+
+
+class GameServer():
+    """
+    Class hosting any number of concurrent matches on one board size.
+    """
+    def __init__(self, cols: int = 7, rows: int = 6,
+                 connect: int = 4) -> None:
+        """
+        Constructor for 'GameServer'.
+        """
+        self._size = (cols, rows, connect)
+        self._hello = b"HELLO %d %d %d\n" % self._size
+        self._start = (b"START 1\n", b"START 2\n")
+        self._moved = tuple(
+            tuple(b"MOVED %d %d\n" % (player, col) for col in range(cols))
+            for player in (1, 2))
+        self._ended = (b"TIE\n", b"WIN 1\n", b"WIN 2\n")
+        self._waiting: Optional[Session] = None
+        self._pool: list[Match] = []
+        self._matches = 0
+        self._sessions = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def matches(self) -> int:
+        """
+        getter property for the number of matches being played
+
+        Returns:
+            int: the integer count of matches in progress.
+        """
+        return self._matches
+
+    @property
+    def sessions(self) -> int:
+        """
+        getter property for the number of connected players
+
+        Returns:
+            int: the integer count of open connections.
+        """
+        return self._sessions
+
+    @property
+    def pooled(self) -> int:
+        """
+        getter property for the number of matches kept for reuse
+
+        Returns:
+            int: the integer count of finished matches not yet reused.
+        """
+        return len(self._pool)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """
+        Start accepting players. Returns the port listened on, which is
+        chosen by the system if 'port' is 0.
+        """
+        # Thousands of players may connect at once
+        self._server = await asyncio.start_server(self._handle, host, port,
+                                                  backlog=4096)
+        return int(self._server.sockets[0].getsockname()[1])
+
+    async def close(self) -> None:
+        """
+        Stop accepting players.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        """
+        Serve one connection until it leaves or drops.
+        """
+        session = Session(writer)
+        self._sessions += 1
+        writer.write(self._hello)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line or not self._command(session, line):
+                    break
+                # Only wait if the player is not reading its replies
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._leave(session)
+            self._sessions -= 1
+            writer.close()
+
+    def _command(self, session: Session, line: bytes) -> bool:
+        """
+        Carry out one command. Returns false if the player quit.
+        """
+        if line.startswith(b"MOVE "):
+            self._move(session, line)
+        elif line.strip() == b"PLAY":
+            self._queue(session)
+        elif line.strip() == b"QUIT":
+            return False
+        else:
+            session.writer.write(b"ERROR unknown command\n")
+        return True
+
+    def _queue(self, session: Session) -> None:
+        """
+        Pair a player with the one waiting, or make it wait.
+        """
+        if session.match is not None:
+            session.writer.write(b"ERROR already playing\n")
+            return
+        waiting = self._waiting
+        if waiting is None or waiting is session:
+            self._waiting = session
+            session.writer.write(b"WAIT\n")
+            return
+        self._waiting = None
+        match = self._pool.pop() if self._pool else Match(*self._size)
+        match.begin(waiting, session)
+        self._matches += 1
+        waiting.writer.write(self._start[0])
+        session.writer.write(self._start[1])
+
+    def _move(self, session: Session, line: bytes) -> None:
+        """
+        Play the move of a 'MOVE <col>' line and tell both players.
+        """
+        match = session.match
+        if match is None:
+            session.writer.write(b"ERROR not in a game\n")
+            return
+        player_number = session.player_number
+        try:
+            col = int(line[5:])
+            winner = match.play(player_number, col)
+        except ValueError:
+            session.writer.write(b"ERROR no such column\n")
+            return
+        except MoveError as error:
+            session.writer.write(b"ERROR %s\n" % str(error).encode())
+            return
+        moved = self._moved[player_number - 1][col]
+        for player in match.players:
+            player.writer.write(moved)
+        if winner is not None:
+            for player in match.players:
+                player.writer.write(self._ended[winner])
+            self._end(match)
+
+    def _end(self, match: Match) -> tuple[Session, ...]:
+        """
+        Finish a match and keep it for the next pair of players.
+        """
+        self._matches -= 1
+        self._pool.append(match)
+        return match.finish()
+
+    def _leave(self, session: Session) -> None:
+        """
+        Take a player out of the queue or its match, telling its
+        opponent.
+        """
+        if self._waiting is session:
+            self._waiting = None
+        if session.match is not None:
+            for player in self._end(session.match):
+                if player is not session:
+                    player.writer.write(b"LEFT\n")
+
+
+async def _load_player(host: str, port: int, rng: random.Random,
+                       latencies: Histogram) -> None:
+    """
+    Connect and play one game of random moves, adding the time from
+    sending each move to it being played to 'latencies'.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    cols, rows, connect = map(int, (await reader.readline()).split()[1:])
+    state = BitBoard(cols, rows, connect)
+    writer.write(b"PLAY\n")
+    player_number = 0
+    sent = 0.0
+    while True:
+        words = (await reader.readline()).split()
+        if not words or words[0] in (b"WIN", b"TIE", b"LEFT", b"ERROR"):
+            break
+        if words[0] == b"START":
+            player_number = int(words[1])
+        elif words[0] == b"MOVED":
+            mover, col = int(words[1]), int(words[2])
+            row = state.drop(col, mover)
+            if mover == player_number:
+                latencies.add(time.perf_counter() - sent)
+                continue
+            if state.wins_at(col, row, mover) or state.is_full():
+                continue
+        else:
+            continue
+        if player_number == 1 or words[0] == b"MOVED":
+            col = rng.choice(state.legal_moves())
+            sent = time.perf_counter()
+            writer.write(b"MOVE %d\n" % col)
+    writer.close()
+    await writer.wait_closed()
+
+
+async def load(host: str, port: int, games: int,
+               seed: int = 0) -> Histogram:
+    """
+    Play 'games' games of random moves at once against a server.
+    Returns the histogram of the time each move took to be played.
+    """
+    latencies = Histogram()
+    rng = random.Random(seed)
+    await asyncio.gather(*(_load_player(host, port, rng, latencies)
+                           for player in range(2 * games)))
+    return latencies
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    """
+    Run a server until interrupted, or until a load test is done.
+    """
+    server = GameServer(args.cols, args.rows, args.connect)
+    port = await server.start(args.host, args.port)
+    print(f"Serving {args.cols}x{args.rows} connect {args.connect} "
+          f"games on {args.host}:{port}")
+    if not args.load:
+        await asyncio.Event().wait()
+    start = time.perf_counter()
+    latencies = await load(args.host, port, args.load)
+    elapsed = time.perf_counter() - start
+    stats = latencies.summary()
+    print(f"{args.load} games, {latencies.count} moves in {elapsed:.2f} s "
+          f"({latencies.count / elapsed:.0f} moves/s)")
+    print(f"move latency: mean {stats['mean'] * 1000:.3f} ms, "
+          f"p50 {stats['p50'] * 1000:.3f} ms, "
+          f"p95 {stats['p95'] * 1000:.3f} ms, "
+          f"max {stats['max'] * 1000:.3f} ms")
+    print(f"{Match(args.cols, args.rows, args.connect).memory_footprint()} "
+          f"bytes per match, {server.pooled} matches pooled")
+    await server.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Main function. When called, this function hosts games until it is
+    interrupted, or plays a load test against itself with '--load'.
+    """
+    parser = argparse.ArgumentParser(
+        description="Host Connect 4 games over the network.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4444)
+    parser.add_argument("--cols", type=int, default=7)
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--connect", type=int, default=4,
+                        help="pieces in a row needed to win")
+    parser.add_argument("--load", type=int, default=0, metavar="GAMES",
+                        help="play this many random games at once against "
+                             "the server, then report the move latency")
+    args = parser.parse_args(argv or [])
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
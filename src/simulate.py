@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Self-play simulation module.
+
+Plays many headless games between configurable policies, spread over a
+pool of worker processes, and streams one JSON record per game to disk.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Optional, TextIO
+
+from ai import Negamax
+from archive import ArchiveWriter
+from board import Board
+from records import GameRecord, MongoBackend, RecordStore
+from turns import Turns
+
+
+class Policy(ABC):
+    """
+    Class describing a way of choosing moves. Subclasses
+    implement 'choose'.
+    """
+    name: str = "policy"
+
+    @abstractmethod
+    def choose(self, board: Board, player_number: int) -> int:
+        """
+        Choose the column 'player_number' plays on 'board'.
+        """
+
+
+class RandomPolicy(Policy):
+    """
+    Class describing a policy that plays any legal column.
+    """
+    name = "random"
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        """
+        Constructor for 'RandomPolicy'.
+        """
+        self._rng = random.Random(seed)
+
+    def choose(self, board: Board, player_number: int) -> int:
+        return self._rng.choice(board.legal_moves())
+
+
+class GreedyPolicy(RandomPolicy):
+    """
+    Class describing a policy that takes a winning move if there is
+    one, blocks the opponent's winning move otherwise, and plays
+    randomly if neither exists.
+    """
+    name = "greedy"
+
+    def choose(self, board: Board, player_number: int) -> int:
+        state = board.state
+        playable = state.playable()
+        for player in (player_number, 3 - player_number):
+            wins = state.threats(player) & playable
+            if wins:
+                # Column of the lowest winning cell.
+                return ((wins & -wins).bit_length() - 1) // state.stride
+        return super().choose(board, player_number)
+
+
+class SearchPolicy(Policy):
+    """
+    Class describing a policy that plays the move found by a
+    negamax search.
+    """
+    name = "ai"
+
+    def __init__(self, time_budget: float = 0.1,
+                 max_depth: Optional[int] = None) -> None:
+        """
+        Constructor for 'SearchPolicy'.
+        """
+        self._search = Negamax(time_budget, max_depth)
+
+    def choose(self, board: Board, player_number: int) -> int:
+        return self._search.search(board.state, player_number)
+
+
+def make_policy(name: str, seed: Optional[int] = None,
+                time_budget: float = 0.1) -> Policy:
+    """
+    Build a policy from its name: 'random', 'greedy' or 'ai'.
+    """
+    if name == RandomPolicy.name:
+        return RandomPolicy(seed)
+    if name == GreedyPolicy.name:
+        return GreedyPolicy(seed)
+    if name == SearchPolicy.name:
+        return SearchPolicy(time_budget)
+    raise ValueError(f"Unknown policy: {name}")
+
+
+def play_game(players: tuple[Policy, Policy], cols: int = 7,
+              rows: int = 6, connect: int = 4) -> dict[str, Any]:
+    """
+    Play one game between two policies without a window.
+
+    Returns a record with the columns played, the winner (0 for a tie),
+    the number of turns and the time each move took to choose.
+    """
+    board = Board(cols, rows, connect)
+    turn = Turns(cols * rows)
+    record = GameRecord(cols, rows, connect, (players[0].name,
+                                              players[1].name))
+    while turn.turns_left:
+        player = turn.player_turn
+        start = time.perf_counter()
+        column = players[player - 1].choose(board, player)
+        elapsed = time.perf_counter() - start
+        board.drop_piece(column, player)
+        record.add_move(column, elapsed)
+        turn._increment_turn()
+        if board.has_won(player):
+            record.finish(player)
+            break
+        turn._switch_player()
+    return record.to_dict()
+
+
+def play_games(first: int, count: int, names: tuple[str, str], seed: int,
+               cols: int = 7, rows: int = 6, time_budget: float = 0.1,
+               connect: int = 4) -> list[dict[str, Any]]:
+    """
+    Play a batch of games numbered from 'first'. This is the unit of
+    work sent to each worker process.
+    """
+    records = []
+    for number in range(first, first + count):
+        players = (make_policy(names[0], seed + 2 * number, time_budget),
+                   make_policy(names[1], seed + 2 * number + 1, time_budget))
+        record = play_game(players, cols, rows, connect)
+        record["game"] = number
+        record["players"] = list(names)
+        records.append(record)
+    return records
+
+
+def simulate(games: int, names: tuple[str, str], output: TextIO,
+             workers: Optional[int] = None, batch_size: int = 100,
+             seed: int = 0, cols: int = 7, rows: int = 6,
+             time_budget: float = 0.1, connect: int = 4,
+             store: Optional[RecordStore] = None,
+             archive: Optional[ArchiveWriter] = None) -> dict[str, int]:
+    """
+    Play 'games' games over a process pool, writing one JSON line per
+    game to 'output' as batches finish. Each record is also queued in
+    'store' and its moves appended to 'archive' if they are given.
+    Returns the win counts.
+    """
+    totals = {"player1": 0, "player2": 0, "tie": 0}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_games, first,
+                               min(batch_size, games - first), names, seed,
+                               cols, rows, time_budget, connect)
+                   for first in range(0, games, batch_size)]
+        for future in as_completed(futures):
+            for record in future.result():
+                output.write(json.dumps(record) + "\n")
+                if store is not None:
+                    store.record(record)
+                if archive is not None:
+                    archive.write(record["moves"], record["winner"])
+                key = ("player" + str(record["winner"])
+                       if record["winner"] else "tie")
+                totals[key] += 1
+    return totals
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Main function. When called, this function plays the requested
+    games and prints the results.
+    """
+    policies = (RandomPolicy.name, GreedyPolicy.name, SearchPolicy.name)
+    parser = argparse.ArgumentParser(
+        description="Play Connect 4 games between computer policies.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--player1", choices=policies, default="random")
+    parser.add_argument("--player2", choices=policies, default="random")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ai-time", type=float, default=0.1,
+                        help="seconds the 'ai' policy may think per move")
+    parser.add_argument("--cols", type=int, default=7)
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--connect", type=int, default=4,
+                        help="pieces in a row needed to win")
+    parser.add_argument("--output", default="games.jsonl")
+    parser.add_argument("--mongo-uri",
+                        help="also save the games to this MongoDB server")
+    parser.add_argument("--archive", metavar="FILE",
+                        help="also pack the moves into a binary archive")
+    args = parser.parse_args(argv or [])
+
+    store = None
+    if args.mongo_uri:
+        store = RecordStore(MongoBackend.connect(args.mongo_uri))
+    archive = None
+    if args.archive:
+        archive = ArchiveWriter(args.archive, args.cols, args.rows,
+                                args.connect)
+    start = time.perf_counter()
+    with open(args.output, "w") as output:
+        totals = simulate(args.games, (args.player1, args.player2), output,
+                          args.workers, args.batch_size, args.seed,
+                          args.cols, args.rows, args.ai_time, args.connect,
+                          store, archive)
+    if store is not None:
+        store.close()
+    if archive is not None:
+        archive.close()
+    elapsed = time.perf_counter() - start
+    print(f"{args.games} games in {elapsed:.1f}s "
+          f"({args.games / elapsed * 60:.0f} games/min): {totals}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+"""
+Module containing the perfect-play solver.
+
+Scores follow the usual convention of Connect 4 solvers: 0 is a draw, a
+positive score a win for the player to move and a negative score a
+loss. A player who wins with the piece dropped as move 'n' of a board
+of 'cells' cells (moves counted from 0) scores '(cells + 1 - n) // 2',
+so faster wins score higher.
+
+Positions near the start of the game are looked up in an opening book,
+a sorted binary file of (position key, score) records which is
+memory-mapped rather than read into memory. This module does not
+import pygame.
+"""
+
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Iterable, Optional
+
+from ai import Negamax, SearchTimeout
+from bitboard import BitBoard
+from transposition import TranspositionTable
+
+# The opening book shipped next to this module, if it has been built.
+BOOK_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "book.bin")
+
+
+def position_key(state: BitBoard, player_number: int) -> int:
+    """
+    Get a key identifying a position with 'player_number' to move, the
+    same for the position and its mirror image since both have the same
+    score. See 'BitBoard.canonical_key'.
+    """
+    return state.canonical_key(player_number)
+
+
+class OpeningBook():
+    """
+    Class describing a memory-mapped file of solved positions.
+
+    The file holds a header, the position keys as sorted 64-bit
+    integers, then one signed byte per key for its score, all
+    little-endian so that a book can be read on any machine.
+    """
+    MAGIC: bytes = b"C4BK"
+    VERSION: int = 1
+    HEADER: struct.Struct = struct.Struct("<4sBBBBIi")
+
+    def __init__(self, path: str) -> None:
+        """
+        Constructor for 'OpeningBook'.
+        """
+        with open(path, "rb") as book:
+            self._map = mmap.mmap(book.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < self.HEADER.size:
+            self._map.close()
+            raise ValueError(f"Not an opening book: {path}")
+        (magic, version, cols, rows, depth, count,
+         unused) = self.HEADER.unpack_from(self._map)
+        self._cols: int = cols
+        self._rows: int = rows
+        self._depth: int = depth
+        self._count: int = count
+        size = self.HEADER.size + 9 * self._count
+        if magic != self.MAGIC or version != self.VERSION or \
+                len(self._map) != size:
+            self._map.close()
+            raise ValueError(f"Not an opening book: {path}")
+        view = memoryview(self._map)
+        start = self.HEADER.size
+        self._keys = view[start:start + 8 * self._count].cast("Q")
+        if sys.byteorder == "big":
+            # Only a swapped copy of the keys can be searched
+            keys = array("Q", self._keys)
+            keys.byteswap()
+            self._keys.release()
+            self._keys = memoryview(keys)
+        self._scores = view[start + 8 * self._count:size].cast("b")
+        view.release()
+
+    @property
+    def cols(self) -> int:
+        """
+        getter property for the column count of the book's board
+
+        Returns:
+            int: the integer count for columns.
+        """
+        return self._cols
+
+    @property
+    def rows(self) -> int:
+        """
+        getter property for the row count of the book's board
+
+        Returns:
+            int: the integer count for rows.
+        """
+        return self._rows
+
+    @property
+    def depth(self) -> int:
+        """
+        getter property for the depth of the book
+
+        Returns:
+            int: the number of pieces played in the deepest positions
+            the book holds.
+        """
+        return self._depth
+
+    def __len__(self) -> int:
+        return self._count
+
+    def lookup(self, key: int) -> Optional[int]:
+        """
+        Find the score of a position by its 'position_key', or None if
+        the book does not hold it.
+        """
+        index = bisect.bisect_left(self._keys, key)
+        if index < self._count and self._keys[index] == key:
+            return int(self._scores[index])
+        return None
+
+    def close(self) -> None:
+        """
+        Unmap the file.
+        """
+        self._keys.release()
+        self._scores.release()
+        self._map.close()
+
+    @classmethod
+    def write(cls, path: str, cols: int, rows: int, depth: int,
+              scores: dict[int, int]) -> None:
+        """
+        Save solved positions, given as a map of 'position_key' to
+        score, in the format read by 'OpeningBook'.
+        """
+        keys = sorted(scores)
+        with open(path, "wb") as book:
+            book.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, cols, rows,
+                                       depth, len(keys), 0))
+            key_array = array("Q", keys)
+            if sys.byteorder == "big":
+                key_array.byteswap()
+            book.write(key_array.tobytes())
+            book.write(array("b", [scores[key] for key in keys]).tobytes())
+
+
+def load_book(path: str = BOOK_PATH) -> Optional[OpeningBook]:
+    """
+    Open an opening book, or return None if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+class Solution():
+    """
+    Class describing the game-theoretic value of a position.
+    """
+    def __init__(self, score: int, distance: int, nodes: int,
+                 elapsed: float) -> None:
+        """
+        Constructor for 'Solution'.
+        """
+        self._score = score
+        self._distance = distance
+        self._nodes = nodes
+        self._elapsed = elapsed
+
+    @property
+    def score(self) -> int:
+        """
+        getter property for the score
+
+        Returns:
+            int: positive if the player to move wins with perfect play,
+            negative if they lose and 0 for a draw.
+        """
+        return self._score
+
+    @property
+    def outcome(self) -> str:
+        """
+        getter property for the outcome
+
+        Returns:
+            str: 'win', 'loss' or 'draw' for the player to move.
+        """
+        if self._score > 0:
+            return "win"
+        if self._score < 0:
+            return "loss"
+        return "draw"
+
+    @property
+    def distance(self) -> int:
+        """
+        getter property for the length of the game
+
+        Returns:
+            int: the number of moves left, counting both players, if
+            the winner wins as fast as possible and the loser holds on
+            as long as possible. For a draw, the moves left to fill
+            the board.
+        """
+        return self._distance
+
+    @property
+    def nodes(self) -> int:
+        """
+        getter property for the number of nodes searched
+
+        Returns:
+            int: the integer count of positions visited.
+        """
+        return self._nodes
+
+    @property
+    def elapsed(self) -> float:
+        """
+        getter property for the solving time
+
+        Returns:
+            float: the wall-clock time taken in seconds.
+        """
+        return self._elapsed
+
+
+class Solver():
+    """
+    Class implementing an exact negamax solver.
+
+    The score of a position is narrowed down by a series of null-window
+    searches, using a transposition table shared between searches and
+    the opening book when its board matches.
+    """
+    def __init__(self, book: Optional[OpeningBook] = None,
+                 table: Optional[TranspositionTable] = None,
+                 time_budget: Optional[float] = None) -> None:
+        """
+        Constructor for 'Solver'.
+
+        Without a 'time_budget' the solver runs until it is done,
+        otherwise it raises 'SearchTimeout' once the budget is spent.
+        """
+        self._book = book
+        self._table = table if table is not None else TranspositionTable()
+        self._time_budget = time_budget
+        self._deadline = 0.0
+        self._nodes = 0
+        self._cells = 0
+        self._book_depth = -1
+        # the cells of each column, from the center outwards
+        self._columns: list[int] = []
+
+    @property
+    def book(self) -> Optional[OpeningBook]:
+        """
+        getter property for the opening book
+
+        Returns:
+            Optional[OpeningBook]: the book consulted for early
+            positions, or None.
+        """
+        return self._book
+
+    @property
+    def table(self) -> TranspositionTable:
+        """
+        getter property for the transposition table
+
+        Returns:
+            TranspositionTable: the table shared by every search.
+        """
+        return self._table
+
+    @property
+    def nodes(self) -> int:
+        """
+        getter property for the number of nodes searched
+
+        Returns:
+            int: the integer count of positions visited by the last
+            call to 'solve' or 'best_move'.
+        """
+        return self._nodes
+
+    @staticmethod
+    def distance(score: int, played: int, cells: int) -> int:
+        """
+        Get the number of moves left in a game from its score, given
+        the number of pieces already played.
+        """
+        if score == 0:
+            return cells - played
+        # The winner's last move 'n' has the parity of the player to
+        # move if they win, and of their opponent otherwise.
+        last = cells + 1 - 2 * abs(score)
+        if (last - played) % 2 != (0 if score > 0 else 1):
+            last -= 1
+        return last - played + 1
+
+    def _start(self, state: BitBoard) -> None:
+        """
+        Reset the counters and deadline before solving a position.
+        """
+        self._nodes = 0
+        self._cells = state.cols * state.rows
+        column = (1 << state.rows) - 1
+        self._columns = [column << (col * state.stride)
+                         for col in Negamax.column_order(state.cols)]
+        if self._time_budget is not None:
+            self._deadline = time.perf_counter() + self._time_budget
+        book = self._book
+        if (book is not None and book.cols == state.cols and
+                book.rows == state.rows and state.connect == 4):
+            self._book_depth = book.depth
+        else:
+            self._book_depth = -1
+
+    def _candidates(self, state: BitBoard, player_number: int) -> int:
+        """
+        Get the bitboard of the moves that do not let the opponent win
+        on their next move: a forced block if there is one, and never
+        the cell right under an opponent's threat.
+        """
+        playable = state.playable()
+        danger = state.threats(3 - player_number)
+        forced = danger & playable
+        if forced:
+            if forced & (forced - 1):
+                # Two threats cannot both be blocked
+                return 0
+            playable = forced
+        return playable & ~(danger >> 1)
+
+    def _ordered(self, state: BitBoard, player_number: int,
+                 candidates: int) -> list[int]:
+        """
+        Get the candidate moves as single-bit masks, the ones creating
+        the most threats first and central ones first among equals.
+        """
+        moves: list[tuple[int, int, int]] = []
+        for column in self._columns:
+            move = candidates & column
+            if move:
+                moves.append((-state.threats_after(player_number,
+                                                   move).bit_count(),
+                              len(moves), move))
+        moves.sort()
+        return [move for unused, order, move in moves]
+
+    def _bounds(self, key: int, played: int, alpha: int,
+                beta: int) -> tuple[int, int]:
+        """
+        Narrow the search window using the score range of a position
+        where nobody wins on the next move, and any stored bound.
+        """
+        alpha = max(alpha, -((self._cells - 2 - played) // 2))
+        beta = min(beta, (self._cells - 1 - played) // 2)
+        entry = self._table.lookup(key)
+        if entry is not None:
+            unused, score, flag, move = entry
+            if flag != TranspositionTable.UPPER:
+                alpha = max(alpha, score)
+            if flag != TranspositionTable.LOWER:
+                beta = min(beta, score)
+        return alpha, beta
+
+    def _negamax(self, state: BitBoard, player_number: int, alpha: int,
+                 beta: int, played: int) -> int:
+        """
+        Search a position for 'player_number', who cannot win on this
+        move, and return its score if it lies within the window, or a
+        bound on it otherwise.
+        """
+        self._nodes += 1
+        if (self._time_budget is not None and self._nodes & 1023 == 0 and
+                time.perf_counter() > self._deadline):
+            raise SearchTimeout
+        candidates = self._candidates(state, player_number)
+        if not candidates:
+            return -((self._cells - played) // 2)
+        if played >= self._cells - 2:
+            return 0
+        key = position_key(state, player_number)
+        if played <= self._book_depth and self._book is not None:
+            known = self._book.lookup(key)
+            if known is not None:
+                return known
+        alpha, beta = self._bounds(key, played, alpha, beta)
+        if alpha >= beta:
+            return alpha
+
+        window = alpha
+        other = 3 - player_number
+        stride = state.stride
+        for move in self._ordered(state, player_number, candidates):
+            col = (move.bit_length() - 1) // stride
+            state.drop(col, player_number)
+            score = -self._negamax(state, other, -beta, -alpha, played + 1)
+            state.undo(col)
+            if score >= beta:
+                self._table.store(key, self._cells - played, score,
+                                  TranspositionTable.LOWER, col)
+                return score
+            alpha = max(alpha, score)
+        flag = (TranspositionTable.EXACT if alpha > window
+                else TranspositionTable.UPPER)
+        self._table.store(key, self._cells - played, alpha, flag, -1)
+        return alpha
+
+    def _value(self, state: BitBoard, player_number: int,
+               played: int) -> int:
+        """
+        Get the exact score of a position with a series of null-window
+        searches, each of which tells whether the score is above or
+        below a guess.
+        """
+        if state.threats(player_number) & state.playable():
+            return (self._cells + 1 - played) // 2
+        if not state.playable():
+            return 0
+        if played <= self._book_depth and self._book is not None:
+            known = self._book.lookup(position_key(state, player_number))
+            if known is not None:
+                return known
+        low = -((self._cells - played) // 2)
+        high = (self._cells + 1 - played) // 2
+        while low < high:
+            guess = low + (high - low) // 2
+            # Try small scores first, which are the cheapest to refute
+            if guess <= 0 and int(low / 2) < guess:
+                guess = int(low / 2)
+            elif guess >= 0 and int(high / 2) > guess:
+                guess = int(high / 2)
+            score = self._negamax(state, player_number, guess, guess + 1,
+                                  played)
+            if score <= guess:
+                high = score
+            else:
+                low = score
+        return low
+
+    def solve(self, state: BitBoard, player_number: int) -> Solution:
+        """
+        Solve a position with 'player_number' to move.
+        """
+        if state.has_won(1) or state.has_won(2):
+            raise ValueError("The game is already over")
+        start = time.perf_counter()
+        state = state.copy()
+        self._start(state)
+        played = state.mask.bit_count()
+        score = self._value(state, player_number, played)
+        return Solution(score, self.distance(score, played, self._cells),
+                        self._nodes, time.perf_counter() - start)
+
+    def best_move(self, state: BitBoard, player_number: int) -> int:
+        """
+        Get the column that gives 'player_number' the best result with
+        perfect play: the fastest win, or else a draw, or else the
+        slowest loss.
+        """
+        if state.has_won(1) or state.has_won(2):
+            raise ValueError("The game is already over")
+        wins = state.threats(player_number) & state.playable()
+        if wins:
+            return ((wins & -wins).bit_length() - 1) // state.stride
+        state = state.copy()
+        self._start(state)
+        played = state.mask.bit_count()
+        best_move = -1
+        best = -self._cells
+        legal = state.legal_mask
+        for col in Negamax.column_order(state.cols):
+            if not legal >> col & 1:
+                continue
+            state.drop(col, player_number)
+            score = -self._value(state, 3 - player_number, played + 1)
+            state.undo(col)
+            if score > best:
+                best = score
+                best_move = col
+        if best_move < 0:
+            raise ValueError("No legal moves left")
+        return best_move
+
+
+def book_positions(cols: int, rows: int,
+                   depth: int) -> dict[int, tuple[BitBoard, int]]:
+    """
+    Get every position reachable in at most 'depth' moves in which
+    nobody has won yet, keyed by 'position_key', so only one of each
+    pair of mirror images is kept. Player 1 is assumed to move first.
+    """
+    found: dict[int, tuple[BitBoard, int]] = {}
+    frontier = [BitBoard(cols, rows)]
+    for played in range(depth + 1):
+        player_number = 1 + played % 2
+        following = []
+        for state in frontier:
+            key = position_key(state, player_number)
+            if key in found:
+                continue
+            found[key] = (state, player_number)
+            if played == depth:
+                continue
+            for col in state.legal_moves():
+                child = state.copy()
+                row = child.drop(col, player_number)
+                if not child.wins_at(col, row, player_number):
+                    following.append(child)
+        frontier = following
+    return found
+
+
+def build_book(path: str, depth: int, cols: int = 7, rows: int = 6) -> int:
+    """
+    Solve every position up to 'depth' moves in and save them as an
+    opening book. Returns the number of positions written.
+    """
+    solver = Solver(table=TranspositionTable(1 << 22))
+    positions = book_positions(cols, rows, depth)
+    scores = {}
+    # Deepest first, so the table helps with the shallower positions
+    for key, (state, player_number) in sorted(
+            positions.items(), key=lambda item: -item[1][0].mask.bit_count()):
+        scores[key] = solver.solve(state, player_number).score
+    OpeningBook.write(path, cols, rows, depth, scores)
+    return len(scores)
+
+
+def import_book(lines: Iterable[str], path: str, cols: int = 7,
+                rows: int = 6) -> int:
+    """
+    Save positions solved elsewhere as an opening book. Each line holds
+    the columns played from the start (1 being the leftmost column)
+    and the score, such as '4453 -2', the format other Connect 4
+    solvers print. Returns the number of positions written.
+    """
+    scores = {}
+    depth = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        moves, score = line.split()
+        state = BitBoard(cols, rows)
+        for turn, move in enumerate(moves):
+            state.drop(int(move) - 1, 1 + turn % 2)
+        scores[position_key(state, 1 + len(moves) % 2)] = int(score)
+        depth = max(depth, len(moves))
+    OpeningBook.write(path, cols, rows, depth, scores)
+    return len(scores)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Main function. When called, this function either builds the
+    opening book or solves the position reached by a list of moves.
+    """
+    parser = argparse.ArgumentParser(
+        description="Solve Connect 4 positions exactly.")
+    parser.add_argument("moves", nargs="?", default="",
+                        help="columns played so far, e.g. 4453 "
+                             "(1 is the leftmost column)")
+    parser.add_argument("--build-book", type=int, metavar="DEPTH",
+                        help="solve every position up to DEPTH moves in "
+                             "and write them to the book")
+    parser.add_argument("--import-book", metavar="FILE",
+                        help="write the '<moves> <score>' lines of FILE "
+                             "to the book")
+    parser.add_argument("--book", default=BOOK_PATH)
+    args = parser.parse_args(argv or [])
+
+    start = time.perf_counter()
+    if args.build_book is not None:
+        count = build_book(args.book, args.build_book)
+        print(f"{count} positions in {time.perf_counter() - start:.1f}s")
+        return
+    if args.import_book is not None:
+        with open(args.import_book) as source:
+            count = import_book(source, args.book)
+        print(f"{count} positions in {time.perf_counter() - start:.1f}s")
+        return
+
+    state = BitBoard()
+    for turn, move in enumerate(args.moves):
+        state.drop(int(move) - 1, 1 + turn % 2)
+    solver = Solver(load_book(args.book))
+    solution = solver.solve(state, 1 + len(args.moves) % 2)
+    print(f"{solution.outcome} in {solution.distance} moves "
+          f"(score {solution.score}, {solution.nodes} nodes, "
+          f"{solution.elapsed:.3f}s)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
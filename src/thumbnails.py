@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Module to draw pictures of archived games without a window.
+
+Each game of an archive made by 'archive.py' is replayed and its board
+saved as a PNG file or a raw RGB frame, for instance to show thumbnails
+of past games.
+"""
+
+import argparse
+import os
+import sys
+from typing import Iterator, Optional
+
+from archive import ArchiveReader
+from board import Board
+from graphics import export_positions
+
+
+def archived_boards(reader: ArchiveReader, moves: Optional[int] = None,
+                    limit: Optional[int] = None) -> Iterator[Board]:
+    """
+    Replay the games of an archive, or the first 'limit' of them, up to
+    their end or their first 'moves' moves.
+    """
+    count = len(reader) if limit is None else min(limit, len(reader))
+    for index in range(count):
+        yield reader.replay(index, moves)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Main function. When called, this function saves a picture of every
+    game in an archive.
+    """
+    parser = argparse.ArgumentParser(
+        description="Draw the boards of archived games.")
+    parser.add_argument("archive")
+    parser.add_argument("directory", help="where to save the pictures")
+    parser.add_argument("--format", choices=("png", "raw"), default="png",
+                        help="PNG files, or raw RGB bytes row by row")
+    parser.add_argument("--square-size", type=int, default=20,
+                        help="size of a cell in pixels")
+    parser.add_argument("--moves", type=int, default=None,
+                        help="draw the board after this many moves "
+                             "instead of at the end")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="only draw the first games")
+    args = parser.parse_args(argv or [])
+
+    os.makedirs(args.directory, exist_ok=True)
+    with ArchiveReader(args.archive) as reader:
+        paths = export_positions(
+            archived_boards(reader, args.moves, args.limit), args.directory,
+            args.format, args.square_size)
+    print(f"Saved {len(paths)} pictures to {args.directory}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,163 @@
+"""
+Module containing the transposition table used by the search.
+
+The table has a fixed number of slots allocated up front, so its memory
+use is bounded no matter how long the search runs. Entries are tagged
+with the search that stored them, so that the deep results of positions
+long since played give way to the positions being searched now.
+"""
+
+from typing import Optional
+
+
+class TranspositionTable():
+    """
+    Class describing a fixed-size table of searched positions,
+    indexed by a position hash.
+    """
+    EXACT: int = 0
+    LOWER: int = 1
+    UPPER: int = 2
+
+    DEPTH_PREFERRED: str = "depth"
+    ALWAYS_REPLACE: str = "always"
+
+    def __init__(self, size: int = 1 << 18,
+                 policy: str = DEPTH_PREFERRED) -> None:
+        """
+        Constructor for 'TranspositionTable'.
+        """
+        if size <= 0:
+            raise ValueError("Table size must be positive")
+        if policy not in (self.DEPTH_PREFERRED, self.ALWAYS_REPLACE):
+            raise ValueError(f"Unknown replacement policy: {policy}")
+        self._size = size
+        self._policy = policy
+        self._keys: list[Optional[int]] = [None] * size
+        self._depths = [0] * size
+        self._scores = [0] * size
+        self._flags = [0] * size
+        self._moves = [0] * size
+        self._ages = [0] * size
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._collisions = 0
+
+    @property
+    def size(self) -> int:
+        """
+        getter property for the number of slots
+
+        Returns:
+            int: the maximum number of positions the table can hold.
+        """
+        return self._size
+
+    @property
+    def policy(self) -> str:
+        """
+        getter property for the replacement policy
+
+        Returns:
+            str: 'depth' to keep the deeper search result when two
+            positions share a slot, or 'always' to keep the newest.
+        """
+        return self._policy
+
+    @property
+    def generation(self) -> int:
+        """
+        getter property for the search the table is storing results of
+
+        Returns:
+            int: the integer count of searches started with
+            'new_search'.
+        """
+        return self._generation
+
+    @property
+    def hits(self) -> int:
+        """
+        getter property for the number of successful lookups
+
+        Returns:
+            int: the count of lookups that found their position.
+        """
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """
+        getter property for the number of failed lookups
+
+        Returns:
+            int: the count of lookups that did not find their position.
+        """
+        return self._misses
+
+    @property
+    def collisions(self) -> int:
+        """
+        getter property for the number of slot collisions
+
+        Returns:
+            int: the count of failed lookups whose slot held a
+            different position.
+        """
+        return self._collisions
+
+    def lookup(self, key: int) -> Optional[tuple[int, int, int, int]]:
+        """
+        Find a position in the table.
+
+        Returns the stored depth, score, bound flag and best move, or
+        None if the position is not in the table.
+        """
+        index = key % self._size
+        stored = self._keys[index]
+        if stored == key:
+            self._hits += 1
+            return (self._depths[index], self._scores[index],
+                    self._flags[index], self._moves[index])
+        self._misses += 1
+        if stored is not None:
+            self._collisions += 1
+        return None
+
+    def store(self, key: int, depth: int, score: int, flag: int,
+              move: int) -> None:
+        """
+        Record the result of searching a position, subject to the
+        replacement policy. A deeper result of another position is only
+        kept if it was stored by the current search.
+        """
+        index = key % self._size
+        stored = self._keys[index]
+        if (self._policy == self.DEPTH_PREFERRED and stored is not None and
+                stored != key and self._depths[index] > depth and
+                self._ages[index] == self._generation):
+            return
+        self._keys[index] = key
+        self._depths[index] = depth
+        self._scores[index] = score
+        self._flags[index] = flag
+        self._moves[index] = move
+        self._ages[index] = self._generation
+
+    def new_search(self) -> None:
+        """
+        Start storing the results of a new search. The entries already
+        stored can still be found, but no longer keep a shallower
+        result out of their slot.
+        """
+        self._generation += 1
+
+    def clear(self) -> None:
+        """
+        Remove every position and reset the counters.
+        """
+        self._keys = [None] * self._size
+        self._hits = 0
+        self._misses = 0
+        self._collisions = 0
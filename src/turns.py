@@ -7,12 +7,16 @@ class Turns():
     """
     turns class
     """
-    def __init__(self) -> None:
+    def __init__(self, max_turns: int = 42) -> None:
         """
         constructor.
+
+        'max_turns' is the number of turns after which the board is
+        full and the game is a tie.
         """
         self._player_turn: int = 1
         self._turn_count: int = 0
+        self._max_turns: int = max_turns
 
     def _switch_player(self) -> None:
         """
@@ -48,3 +52,31 @@ class Turns():
         function to increment the game turn
         """
         self._turn_count += 1
+
+    def undo_turn(self, player_number: int) -> None:
+        """
+        function to take back a turn played by 'player_number', who is
+        to play again.
+        """
+        self._turn_count -= 1
+        self._player_turn = player_number
+
+    @property
+    def max_turns(self) -> int:
+        """
+        getter property for the maximum number of turns
+
+        Returns:
+            int: the integer count of turns that fill the board.
+        """
+        return self._max_turns
+
+    @property
+    def turns_left(self) -> int:
+        """
+        getter property for the number of turns left
+
+        Returns:
+            int: the integer count of turns until the board is full.
+        """
+        return self._max_turns - self._turn_count
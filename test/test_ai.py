@@ -0,0 +1,259 @@
+import math
+import time
+import unittest
+from unittest.mock import patch
+from hypothesis import given, strategies
+
+from ai import (AIPlayer, Negamax, ParallelNegamax, SearchStats,
+                default_workers, main, speedup)
+from bitboard import BitBoard
+from transposition import TranspositionTable
+
+
+class TestSearchStats(unittest.TestCase):
+    def test_properties(self) -> None:
+        """
+        function to test the search statistics getters
+        """
+        stats = SearchStats(500, 0.5, 3)
+        self.assertEqual(stats.nodes, 500)
+        self.assertEqual(stats.elapsed, 0.5)
+        self.assertEqual(stats.depth, 3)
+        self.assertEqual(stats.nodes_per_second, 1000)
+        self.assertEqual(SearchStats(5, 0.0, 1).nodes_per_second, 0.0)
+
+
+class TestNegamax(unittest.TestCase):
+    def setUp(self) -> None:
+        self.search: Negamax = Negamax(time_budget=5.0, max_depth=4)
+        self.state: BitBoard = BitBoard()
+
+    def test_column_order(self) -> None:
+        """
+        function to test that central columns are tried first
+        """
+        self.assertEqual(Negamax.column_order(7), [3, 2, 4, 1, 5, 0, 6])
+        self.assertEqual(Negamax.column_order(4)[:2], [1, 2])
+
+    def test_takes_win(self) -> None:
+        """
+        function to test that an immediate win is played
+        """
+        for col in (0, 1, 2):
+            self.state.drop(col, 2)
+            self.state.drop(col, 1)
+        self.state.drop(6, 1)
+        self.assertEqual(self.search.search(self.state, 2), 3)
+
+    def test_blocks_loss(self) -> None:
+        """
+        function to test that the opponent's immediate win is blocked
+        """
+        for row in range(3):
+            self.state.drop(6, 1)
+        self.state.drop(0, 2)
+        self.state.drop(1, 2)
+        self.assertEqual(self.search.search(self.state, 2), 6)
+
+    @given(strategies.lists(strategies.integers(0, 6), max_size=20))
+    def test_search_leaves_state_untouched(self, moves: list[int]) -> None:
+        """
+        function to test that searching does not modify the position
+        """
+        state = BitBoard()
+        player = 1
+        for col in moves:
+            if state.can_play(col):
+                state.drop(col, player)
+                player = 3 - player
+        if state.has_won(1) or state.has_won(2) or state.is_full():
+            return
+        before = (state.bitboard(1), state.bitboard(2))
+        move = Negamax(max_depth=2).search(state, player)
+        self.assertTrue(state.can_play(move))
+        self.assertEqual((state.bitboard(1), state.bitboard(2)), before)
+
+    def test_time_budget(self) -> None:
+        """
+        function to test that iterative deepening stops on time
+        """
+        search = Negamax(time_budget=0.05)
+        start = time.perf_counter()
+        move = search.search(self.state, 1)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertIn(move, range(7))
+        self.assertGreater(search.stats.nodes, 0)
+        self.assertGreaterEqual(search.stats.depth, 1)
+
+    def test_table_agrees(self) -> None:
+        """
+        function to test that a transposition table does not change
+        the move chosen at a fixed depth
+        """
+        for col in (3, 3, 2, 4):
+            self.state.drop(col, 1 + self.state.mask.bit_count() % 2)
+        table = TranspositionTable(1 << 12)
+        with_table = Negamax(time_budget=30.0, max_depth=5, table=table)
+        without = Negamax(time_budget=30.0, max_depth=5)
+        self.assertIs(with_table.table, table)
+        self.assertEqual(with_table.search(self.state, 1),
+                         without.search(self.state, 1))
+        self.assertGreater(table.hits, 0)
+        self.assertLess(with_table.stats.nodes, without.stats.nodes)
+
+    def test_table_node_count(self) -> None:
+        """
+        function to test that the table cuts the nodes of a search at a
+        fixed depth, and of the searches of a game sharing one table
+        """
+        with_table = Negamax(math.inf, 8, TranspositionTable())
+        without = Negamax(math.inf, 8)
+        self.assertEqual(with_table.search(self.state, 1),
+                         without.search(self.state, 1))
+        self.assertLess(3 * with_table.stats.nodes, without.stats.nodes)
+
+        # One small table kept over the searches of a game
+        nodes = []
+        for table in (TranspositionTable(1 << 12), None):
+            state = BitBoard()
+            nodes.append(0)
+            for turn, col in enumerate((3, 3, 2, 4, 4, 2, 1, 5)):
+                search = Negamax(math.inf, 8, table)
+                search.search(state, 1 + turn % 2)
+                nodes[-1] += search.stats.nodes
+                state.drop(col, 1 + turn % 2)
+        self.assertLess(2 * nodes[0], nodes[1])
+
+    def test_table_mirrored(self) -> None:
+        """
+        function to test that a position and its mirror image share
+        table entries, with the stored moves mirrored
+        """
+        for col in (1, 2):
+            self.state.drop(col, 1 + self.state.mask.bit_count() % 2)
+        mirror = BitBoard()
+        for col in (5, 4):
+            mirror.drop(col, 1 + mirror.mask.bit_count() % 2)
+        table = TranspositionTable(1 << 12)
+        search = Negamax(time_budget=30.0, max_depth=4, table=table)
+        move = search.search(self.state, 1)
+        hits = table.hits
+        self.assertEqual(search.search(mirror, 1), 6 - move)
+        self.assertGreater(table.hits, hits)
+
+    def test_no_moves(self) -> None:
+        """
+        function to test that a full board cannot be searched
+        """
+        for col in range(7):
+            for row in range(6):
+                self.state.drop(col, 1 + (col + row // 2) % 2)
+        self.assertRaises(ValueError, self.search.search, self.state, 1)
+
+
+class TestParallelNegamax(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.search: ParallelNegamax = ParallelNegamax(5.0, 5, workers=2)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.search.close()
+
+    def test_agrees(self) -> None:
+        """
+        function to test that the chosen move scores as well as the
+        single-core choice
+        """
+        serial = Negamax(math.inf, 5)
+        serial._deadline = math.inf
+        for moves in ("", "44", "4453", "112233", "3344556"):
+            state = BitBoard()
+            for turn, move in enumerate(moves):
+                state.drop(int(move) - 1, 1 + turn % 2)
+            player = 1 + len(moves) % 2
+            chosen = self.search.search(state, player)
+            self.assertEqual(
+                serial.score_move(state, chosen, 5, -Negamax.WIN_SCORE,
+                                  player),
+                serial.score_move(state, serial.search(state, player), 5,
+                                  -Negamax.WIN_SCORE, player))
+            self.assertEqual(state.mask.bit_count(), len(moves))
+        self.assertEqual(self.search.workers, 2)
+        self.assertGreater(self.search.stats.nodes, 0)
+
+    def test_affinity(self) -> None:
+        """
+        function to test that a root move goes to the same worker at
+        every depth
+        """
+        self.search.start()
+        self.assertIs(self.search._worker(3), self.search._worker(5))
+        self.assertIsNot(self.search._worker(3), self.search._worker(4))
+        # Only the cores the process may run on are counted
+        with patch('ai.os.sched_getaffinity', create=True,
+                   return_value={0, 2}):
+            self.assertEqual(default_workers(), 2)
+        with (patch('ai.os.sched_getaffinity', create=True,
+                    return_value={0}),
+              patch('ai.multiprocessing.cpu_count', return_value=8)):
+            workers = default_workers()
+            self.assertEqual(workers, 1)
+            # and one of them is searched on without a pool
+            self.assertNotIsInstance(AIPlayer(workers=workers)._search,
+                                     ParallelNegamax)
+
+    def test_takes_win(self) -> None:
+        """
+        function to test that a win is found without searching deeper
+        """
+        state = BitBoard()
+        for turn, col in enumerate((0, 1, 0, 1, 0, 1)):
+            state.drop(col, 1 + turn % 2)
+        self.assertEqual(self.search.search(state, 1), 0)
+        self.assertEqual(self.search.stats.depth, 1)
+
+    def test_time_budget(self) -> None:
+        """
+        function to test that a deep search stops in time
+        """
+        with ParallelNegamax(0.3, workers=2) as search:
+            search.start()
+            start = time.perf_counter()
+            self.assertEqual(search.search(BitBoard(), 1), 3)
+            self.assertLess(time.perf_counter() - start, 2.0)
+            self.assertLess(search.stats.depth, 42)
+
+    def test_speedup(self) -> None:
+        """
+        function to test comparing the parallel search with one core
+        """
+        result = speedup(BitBoard(), 1, 4, workers=2)
+        self.assertEqual(result["workers"], 2)
+        self.assertAlmostEqual(result["speedup"],
+                               result["serial"] / result["parallel"])
+        with patch('builtins.print') as mock_print:
+            main(["44", "--depth", "3", "--workers", "2"])
+        self.assertIn("speedup", mock_print.call_args[0][0])
+
+
+class TestAIPlayer(unittest.TestCase):
+    def test_background_search(self) -> None:
+        """
+        function to test searching in a background thread
+        """
+        player = AIPlayer(1, time_budget=0.05, max_depth=3)
+        self.assertEqual(player.player_number, 1)
+        self.assertIsNone(player.result())
+        player.start(BitBoard())
+        while player.thinking():
+            time.sleep(0.01)
+        self.assertEqual(player.result(), 3)
+        self.assertIsNone(player.result())
+        self.assertEqual(player.stats.depth, 3)
+        player = AIPlayer(workers=2)
+        self.assertIsInstance(player._search, ParallelNegamax)
+        # The workers are started with the player and stopped by 'close'
+        self.assertEqual(len(player._search._pool), 2)
+        player.close()
+        self.assertEqual(player._search._pool, [])
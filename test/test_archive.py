@@ -0,0 +1,181 @@
+import json
+import os
+import struct
+import tempfile
+import unittest
+from unittest.mock import patch
+from hypothesis import given, settings, strategies
+
+from archive import (ArchiveReader, ArchiveWriter, bits_per_move,
+                     canonical_moves, dedupe, main, mirror_moves,
+                     pack_moves, unpack_moves)
+from simulate import GreedyPolicy, RandomPolicy, play_game
+
+
+class TestPacking(unittest.TestCase):
+    def test_bits_per_move(self) -> None:
+        """
+        function to test the size of a packed move
+        """
+        self.assertEqual(bits_per_move(7), 3)
+        self.assertEqual(bits_per_move(8), 3)
+        self.assertEqual(bits_per_move(9), 4)
+        self.assertEqual(bits_per_move(16), 4)
+        self.assertEqual(bits_per_move(1), 1)
+
+    @given(strategies.lists(strategies.integers(0, 6), max_size=42))
+    def test_round_trip(self, moves: list[int]) -> None:
+        """
+        function to test packing and unpacking 3-bit moves
+        """
+        data = pack_moves(moves, 3)
+        self.assertEqual(len(data), (3 * len(moves) + 7) // 8)
+        self.assertEqual(unpack_moves(data, len(moves), 3), moves)
+
+    @given(strategies.lists(strategies.integers(0, 6), max_size=42))
+    def test_canonical_moves(self, moves: list[int]) -> None:
+        """
+        function to test that a game and its mirror image share their
+        canonical moves
+        """
+        mirror = mirror_moves(moves, 7)
+        self.assertEqual(mirror_moves(mirror, 7), moves)
+        self.assertEqual(canonical_moves(moves, 7),
+                         canonical_moves(mirror, 7))
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path: str = os.path.join(self.directory.name, "games.c4a")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    @settings(deadline=None, max_examples=20)
+    @given(strategies.lists(strategies.integers(0, 1000), max_size=30))
+    def test_replay(self, seeds: list[int]) -> None:
+        """
+        function to test that archived games replay to their result
+        """
+        records = [play_game((RandomPolicy(seed), GreedyPolicy(seed + 1)))
+                   for seed in seeds]
+        with ArchiveWriter(self.path) as archive:
+            for record in records:
+                archive.write(record["moves"], record["winner"])
+            self.assertEqual(archive.count, len(records))
+        with ArchiveReader(self.path) as reader:
+            self.assertEqual(len(reader), len(records))
+            self.assertEqual((reader.cols, reader.rows, reader.connect),
+                             (7, 6, 4))
+            self.assertEqual(list(reader),
+                             [(r["moves"], r["winner"]) for r in records])
+            for index in reversed(range(len(records))):
+                winner = records[index]["winner"]
+                board = reader.replay(index)
+                if winner:
+                    self.assertTrue(board.has_won(winner))
+                self.assertEqual(reader[index][0], records[index]["moves"])
+
+    def test_large_board(self) -> None:
+        """
+        function to test games longer than 127 moves on a wide board
+        """
+        moves = [col for row in range(10) for col in range(20)]
+        with ArchiveWriter(self.path, 20, 10, 6) as archive:
+            archive.write(moves, 0)
+            archive.write(moves[:3], 2)
+        with ArchiveReader(self.path) as reader:
+            self.assertEqual(reader.game(0), (moves, 0))
+            self.assertEqual(reader.game(1), (moves[:3], 2))
+            board = reader.replay(0, 25)
+            self.assertEqual(board.width, 20)
+            self.assertEqual(board.connect, 6)
+            self.assertEqual(board.get_player_at_spot(4, 1), 1)
+            self.assertEqual(board.get_player_at_spot(5, 1), 0)
+
+    def test_size(self) -> None:
+        """
+        function to test that a full game takes a few bytes
+        """
+        with ArchiveWriter(self.path) as archive:
+            archive.write([col for row in range(6) for col in range(7)], 0)
+        # header, 2 record header bytes, 16 bytes of moves, index, footer
+        self.assertEqual(os.path.getsize(self.path), 12 + 2 + 16 + 8 + 20)
+
+    def test_index_byte_order(self) -> None:
+        """
+        function to test that the index is little-endian on any machine
+        """
+        with ArchiveWriter(self.path) as archive:
+            archive.write([3, 3, 4], 0)
+            archive.write([1], 2)
+        with open(self.path, "rb") as archive_file:
+            data = archive_file.read()
+        self.assertEqual(data[-36:-20], struct.pack("<2Q", 12, 16))
+        with ArchiveReader(self.path) as reader:
+            self.assertEqual(list(reader), [([3, 3, 4], 0), ([1], 2)])
+
+    def test_unclosed(self) -> None:
+        """
+        function to test reading an archive without its index
+        """
+        archive = ArchiveWriter(self.path)
+        archive.write([3, 3, 4], 0)
+        archive.write([1], 0)
+        archive._file.write(b"\x05\x01")  # a record cut short
+        archive._file.close()
+        with ArchiveReader(self.path) as reader:
+            self.assertEqual(list(reader), [([3, 3, 4], 0), ([1], 0)])
+
+    def test_invalid(self) -> None:
+        """
+        function to test rejecting bad moves and files
+        """
+        with ArchiveWriter(self.path) as archive:
+            self.assertRaises(ValueError, archive.write, [7], 0)
+        self.assertRaises(ValueError, ArchiveWriter, self.path, 300)
+        with open(self.path, "wb") as archive_file:
+            archive_file.write(b"not an archive")
+        self.assertRaises(ValueError, ArchiveReader, self.path)
+
+    def test_unique(self) -> None:
+        """
+        function to test leaving out repeated and mirrored games
+        """
+        with ArchiveWriter(self.path, unique=True) as archive:
+            self.assertTrue(archive.write([3, 2], 0))
+            self.assertFalse(archive.write([3, 4], 0))
+            self.assertFalse(archive.write([3, 2], 0))
+            self.assertTrue(archive.write([3, 2, 0], 0))
+            self.assertEqual((archive.count, archive.skipped), (2, 2))
+        target = os.path.join(self.directory.name, "unique.c4a")
+        with ArchiveWriter(self.path) as archive:
+            for seed in range(30):
+                record = play_game((GreedyPolicy(seed), GreedyPolicy(seed)))
+                archive.write(record["moves"], record["winner"])
+                archive.write(mirror_moves(record["moves"], 7),
+                              record["winner"])
+        kept, skipped = dedupe(self.path, target)
+        self.assertEqual(kept + skipped, 60)
+        self.assertGreaterEqual(skipped, 30)
+        with ArchiveReader(target) as reader:
+            self.assertEqual(len(reader), kept)
+            self.assertEqual(len({tuple(canonical_moves(moves, 7))
+                                  for moves, winner in reader}), kept)
+
+    def test_main(self) -> None:
+        """
+        function to test converting JSON lines to an archive
+        """
+        source = os.path.join(self.directory.name, "games.jsonl")
+        with open(source, "w") as games:
+            for seed in range(20):
+                record = play_game((RandomPolicy(seed), RandomPolicy(seed)))
+                games.write(json.dumps(record) + "\n")
+        with patch('builtins.print'):
+            main([source, self.path])
+        with ArchiveReader(self.path) as reader:
+            self.assertEqual(len(reader), 20)
+        self.assertLess(os.path.getsize(self.path) * 10,
+                        os.path.getsize(source))
@@ -0,0 +1,82 @@
+import unittest
+from hypothesis import given, settings, strategies
+from hypothesis.extra import numpy as arrays
+import numpy as np
+
+import batch
+from board import Board, FullError
+from simulate import play_games
+
+
+class TestBatch(unittest.TestCase):
+    @settings(deadline=None)
+    @given(strategies.lists(strategies.lists(strategies.integers(0, 6),
+                                             max_size=42),
+                            min_size=1, max_size=10))
+    def test_played_games_match_board(self, games: list[list[int]]) -> None:
+        """
+        function to test the batch results against 'Board' for
+        positions reached by dropping pieces
+        """
+        boards = []
+        for moves in games:
+            board = Board()
+            player = 1
+            for col in moves:
+                try:
+                    board.drop_piece(col, player)
+                except FullError:
+                    continue
+                player = 3 - player
+            boards.append(board)
+        array = batch.to_array(boards)
+        self.assertEqual(array.shape, (len(games), 6, 7))
+        for player in (1, 2):
+            self.assertEqual(batch.has_won(array, player).tolist(),
+                             [b.has_won(player) for b in boards])
+        self.assertEqual(batch.heights(array).tolist(),
+                         [[b.state.height(c) for c in range(7)]
+                          for b in boards])
+        self.assertEqual(batch.legal_moves(array).tolist(),
+                         [[b.state.can_play(c) for c in range(7)]
+                          for b in boards])
+
+    @given(arrays.arrays(np.int8, (5, 6, 7), elements=strategies.integers(0, 2)))
+    def test_arbitrary_positions_match_board(self, array) -> None:
+        """
+        function to test the batch results against 'Board' for
+        positions loaded cell by cell
+        """
+        expected = []
+        for grid in array:
+            board = Board()
+            for y in range(6):
+                for x in range(7):
+                    board.set_player_at_spot(x, y, int(grid[y, x]))
+            expected.append(int(board.has_won(1)) + 2 * int(board.has_won(2)))
+        self.assertEqual(batch.winners(array).tolist(), expected)
+
+    def test_from_moves(self) -> None:
+        """
+        function to test rebuilding simulated games
+        """
+        records = play_games(0, 20, ("greedy", "random"), seed=1)
+        array = batch.from_moves([r["moves"] for r in records])
+        self.assertEqual(batch.winners(array).tolist(),
+                         [r["winner"] for r in records])
+        self.assertEqual(batch.is_draw(array).tolist(),
+                         [r["winner"] == 0 and r["turns"] == 42
+                          for r in records])
+
+    def test_empty_and_connect(self) -> None:
+        """
+        function to test empty boards and other line lengths
+        """
+        array = np.zeros((2, 6, 7), dtype=np.int8)
+        array[1, 0, 0:3] = 2
+        self.assertEqual(batch.winners(array).tolist(), [0, 0])
+        self.assertEqual(batch.winners(array, connect=3).tolist(), [0, 2])
+        self.assertEqual(batch.has_won(array, 2, connect=8).tolist(),
+                         [False, False])
+        self.assertEqual(batch.heights(array)[1].tolist(),
+                         [1, 1, 1, 0, 0, 0, 0])
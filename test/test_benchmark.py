@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from benchmark import (BENCHMARKS, bench_has_won, compare, dropped_board,
+                       loaded_board, main, measure, report, run)
+from graphics import DrawMeta
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_boards(self) -> None:
+        """
+        function to test that loaded boards match dropped boards
+        """
+        for count in (0, 21, 42):
+            self.assertEqual(loaded_board(count).cells(),
+                             dropped_board(count).cells())
+        self.assertEqual(len(dropped_board(42).moves), 42)
+
+    def test_lazy_boards(self) -> None:
+        """
+        function to test that boards are only made when a benchmark runs
+        """
+        make_board = MagicMock(return_value=dropped_board(21))
+        benchmark = bench_has_won(make_board, 21)
+        make_board.assert_not_called()
+        check, ops = benchmark()
+        make_board.assert_called_once_with(21)
+        self.assertEqual(ops, 2)
+
+    def test_measure(self) -> None:
+        """
+        function to test timing every benchmark
+        """
+        with patch.dict(DrawMeta._instances, clear=True):
+            for name, benchmark in BENCHMARKS.items():
+                result = measure(benchmark, 0.001, 1)
+                self.assertGreater(result["seconds"], 0, name)
+                self.assertGreaterEqual(result["median"], result["seconds"])
+                self.assertGreaterEqual(result["calls"], 1)
+
+    def test_compare(self) -> None:
+        """
+        function to test finding benchmarks slower than the baseline
+        """
+        results = {"benchmarks": {"fast": {"seconds": 1.0},
+                                  "slow": {"seconds": 2.0},
+                                  "new": {"seconds": 1.0}}}
+        baseline = {"benchmarks": {"fast": {"seconds": 1.1},
+                                   "slow": {"seconds": 1.0}}}
+        comparison = compare(results, baseline, 0.25)
+        self.assertEqual(set(comparison), {"fast", "slow"})
+        self.assertFalse(comparison["fast"]["regression"])
+        self.assertTrue(comparison["slow"]["regression"])
+        self.assertEqual(comparison["slow"]["ratio"], 2.0)
+        self.assertFalse(compare(results, baseline, 1.5)["slow"]["regression"])
+        table = report(results, comparison).splitlines()
+        self.assertEqual(len(table), 3)
+        self.assertIn("SLOWER", table[1])
+        self.assertNotIn("baseline", table[2])
+
+    def test_main(self) -> None:
+        """
+        function to test saving results and comparing them with a
+        baseline
+        """
+        self.assertRaises(ValueError, run, ["unknown"])
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "benchmark.json")
+            baseline = os.path.join(directory, "baseline.json")
+            arguments = ["has_won_mid", "--min-time", "0.001", "--repeat",
+                         "1", "--output", output, "--baseline", baseline]
+            with patch('builtins.print'):
+                main(arguments)
+            with open(output) as results:
+                saved = json.load(results)
+            self.assertEqual(list(saved["benchmarks"]), ["has_won_mid"])
+            self.assertNotIn("baseline", saved)
+
+            # Far slower than a made-up baseline
+            saved["benchmarks"]["has_won_mid"]["seconds"] = 1e-12
+            with open(baseline, "w") as results:
+                json.dump(saved, results)
+            with patch('builtins.print'):
+                self.assertRaises(SystemExit, main, arguments)
+            with open(output) as results:
+                self.assertTrue(json.load(results)["baseline"]["has_won_mid"]
+                                ["regression"])
@@ -0,0 +1,285 @@
+import pickle
+import unittest
+from hypothesis import given, strategies
+
+from bitboard import BitBoard
+
+
+class TestBitBoard(unittest.TestCase):
+    def setUp(self) -> None:
+        self.state: BitBoard = BitBoard()
+
+    def test_init(self) -> None:
+        """
+        function to test the constructor
+        """
+        self.assertEqual(self.state.cols, 7)
+        self.assertEqual(self.state.rows, 6)
+        self.assertEqual(self.state.stride, 7)
+        self.assertEqual(self.state.mask, 0)
+
+    def test_drop(self) -> None:
+        """
+        function to test that pieces stack up in a column
+        """
+        self.assertEqual(self.state.drop(2, 1), 0)
+        self.assertEqual(self.state.drop(2, 2), 1)
+        self.assertEqual(self.state.height(2), 2)
+        self.assertEqual(self.state.player_at(2, 0), 1)
+        self.assertEqual(self.state.player_at(2, 1), 2)
+        self.assertEqual(self.state.player_at(2, 2), 0)
+        self.assertEqual(self.state.bitboard(1), self.state.bit(2, 0))
+
+    def test_can_play(self) -> None:
+        """
+        function to test that full columns cannot be played
+        """
+        for i in range(6):
+            self.assertTrue(self.state.can_play(0))
+            self.state.drop(0, 1 + i % 2)
+        self.assertFalse(self.state.can_play(0))
+
+    @given(strategies.lists(strategies.integers(0, 6), max_size=60),
+           strategies.integers(0, 10))
+    def test_legal_mask(self, moves: list[int], undos: int) -> None:
+        """
+        function to test that the legal moves follow drops, undos and
+        cells set directly
+        """
+        self.state.reset()
+        played = []
+        for turn, col in enumerate(moves):
+            if self.state.can_play(col):
+                self.state.drop(col, 1 + turn % 2)
+                played.append(col)
+        for col in reversed(played[len(played) - undos:]):
+            self.state.undo(col)
+        if played:
+            self.state.set_cell(played[0], 5, 1)
+        legal = [col for col in range(7) if self.state.height(col) < 6]
+        self.assertEqual(self.state.legal_moves(), legal)
+        self.assertEqual(self.state.legal_mask,
+                         sum(1 << col for col in legal))
+        self.assertEqual(self.state.copy().legal_moves(), legal)
+        self.assertEqual(self.state.is_full(), not legal)
+        self.assertFalse(self.state.can_play(7))
+
+    def test_set_cell(self) -> None:
+        """
+        function to test placing and clearing pieces directly
+        """
+        self.state.set_cell(4, 3, 2)
+        self.assertEqual(self.state.player_at(4, 3), 2)
+        self.assertEqual(self.state.height(4), 4)
+        self.state.set_cell(4, 3, 0)
+        self.assertEqual(self.state.height(4), 0)
+
+    def test_no_wrap_between_columns(self) -> None:
+        """
+        function to test that a vertical run split across two
+        columns is not counted as a win
+        """
+        for row in (4, 5):
+            self.state.set_cell(0, row, 1)
+        for row in (0, 1):
+            self.state.set_cell(1, row, 1)
+        self.assertFalse(self.state.has_won(1))
+
+    @given(strategies.integers(0, 3), strategies.integers(0, 2))
+    def test_diagonal_win(self, col: int, row: int) -> None:
+        """
+        function to test both diagonal directions
+        """
+        state = BitBoard()
+        for i in range(4):
+            state.set_cell(col + i, row + i, 2)
+        self.assertTrue(state.diagonal_win(2))
+        self.assertTrue(state.has_won(2))
+        self.assertFalse(state.has_won(1))
+        state.reset()
+        for i in range(4):
+            state.set_cell(col + i, row + 3 - i, 1)
+        self.assertTrue(state.diagonal_win(1))
+
+    def test_wins_at(self) -> None:
+        """
+        function to test the last-move win check
+        """
+        for col in (0, 1, 3):
+            self.state.drop(col, 1)
+        self.assertFalse(self.state.wins_at(3, 0, 1))
+        row = self.state.drop(2, 1)
+        self.assertTrue(self.state.wins_at(2, row, 1))
+        self.assertFalse(self.state.wins_at(2, row, 2))
+
+    def test_undo(self) -> None:
+        """
+        function to test that undo removes the top piece
+        """
+        self.state.drop(5, 1)
+        self.state.drop(5, 2)
+        self.state.undo(5)
+        self.assertEqual(self.state.height(5), 1)
+        self.assertEqual(self.state.player_at(5, 1), 0)
+        self.assertEqual(self.state.player_at(5, 0), 1)
+
+    @given(strategies.permutations([0, 1, 2, 3]))
+    def test_zobrist_transpositions(self, order: list[int]) -> None:
+        """
+        function to test that the hash depends only on the position
+        and is restored by undo
+        """
+        expected = BitBoard()
+        for col in range(4):
+            expected.drop(col, 1 + col % 2)
+        state = BitBoard()
+        for col in order:
+            state.drop(col, 1 + col % 2)
+        self.assertEqual(state.zobrist, expected.zobrist)
+        for col in order:
+            state.undo(col)
+        self.assertEqual(state.zobrist, 0)
+
+    def test_zobrist_set_cell(self) -> None:
+        """
+        function to test that loading a position gives the same hash
+        as playing it
+        """
+        self.state.drop(3, 1)
+        self.state.drop(3, 2)
+        loaded = BitBoard()
+        loaded.set_cell(3, 1, 1)
+        loaded.set_cell(3, 1, 2)
+        loaded.set_cell(3, 0, 1)
+        self.assertEqual(loaded.zobrist, self.state.zobrist)
+        self.assertNotEqual(self.state.zobrist, 0)
+
+    def test_pickle(self) -> None:
+        """
+        function to test that pickled positions keep working
+        """
+        self.state.drop(0, 1)
+        clone = pickle.loads(pickle.dumps(self.state))
+        clone.drop(0, 2)
+        self.state.drop(0, 2)
+        self.assertEqual(clone.zobrist, self.state.zobrist)
+
+    def test_threats(self) -> None:
+        """
+        function to test finding the cells that complete a line
+        """
+        for col in (1, 2, 3):
+            self.state.drop(col, 1)
+        threats = self.state.threats(1)
+        self.assertEqual(threats, self.state.bit(0, 0) | self.state.bit(4, 0))
+        self.assertEqual(threats & self.state.playable(), threats)
+        self.assertEqual(self.state.threats(2), 0)
+
+    def test_copy(self) -> None:
+        """
+        function to test that copies are independent
+        """
+        self.state.drop(1, 1)
+        clone = self.state.copy()
+        clone.drop(1, 2)
+        self.assertEqual(self.state.height(1), 1)
+        self.assertEqual(clone.height(1), 2)
+
+    def test_is_full(self) -> None:
+        """
+        function to test the full board check
+        """
+        for col in range(7):
+            for row in range(6):
+                self.state.drop(col, 1)
+        self.assertTrue(self.state.is_full())
+
+    @given(strategies.integers(2, 8), strategies.integers(0, 3),
+           strategies.sampled_from([(1, 0), (0, 1), (1, 1), (1, -1)]))
+    def test_connect_n(self, connect: int, start: int,
+                       direction: tuple[int, int]) -> None:
+        """
+        function to test that a win takes exactly 'connect' pieces
+        in a row on a large board
+        """
+        state = BitBoard(20, 20, connect)
+        dx, dy = direction
+        cells = [(4 + start + i * dx, 10 + i * dy) for i in range(connect)]
+        for col, row in cells[:-1]:
+            state.set_cell(col, row, 1)
+        self.assertFalse(state.has_won(1))
+        col, row = cells[-1]
+        self.assertTrue(state.threats(1) & state.bit(col, row))
+        state.set_cell(col, row, 1)
+        self.assertTrue(state.has_won(1))
+        for col, row in cells:
+            self.assertTrue(state.wins_at(col, row, 1))
+
+    @given(strategies.lists(strategies.integers(0, 8), max_size=60))
+    def test_threats_connect_n(self, moves: list[int]) -> None:
+        """
+        function to test that playing any threat wins, and playing
+        anywhere else does not, with five in a row
+        """
+        state = BitBoard(9, 7, 5)
+        for turn, col in enumerate(moves):
+            if state.can_play(col) and not state.has_won(1 + turn % 2):
+                state.drop(col, 1 + turn % 2)
+        threats = state.threats(1)
+        for col in range(9):
+            if not state.can_play(col) or state.has_won(1):
+                continue
+            row = state.drop(col, 1)
+            self.assertEqual(state.has_won(1),
+                             bool(state.bit(col, row) & threats))
+            state.undo(col)
+
+    def test_connect(self) -> None:
+        """
+        function to test the run length and its validation
+        """
+        self.assertEqual(self.state.connect, 4)
+        self.assertEqual(BitBoard(9, 7, 5).copy().connect, 5)
+        self.assertRaises(ValueError, BitBoard, 7, 6, 0)
+        self.assertRaises(ValueError, BitBoard, 7, 300)
+
+    @given(strategies.lists(strategies.integers(0, 6), max_size=42))
+    def test_mirror(self, moves: list[int]) -> None:
+        """
+        function to test that the mirror image kept up to date matches
+        the position played in mirrored columns
+        """
+        self.state.reset()
+        mirror = BitBoard()
+        for turn, col in enumerate(moves):
+            if self.state.can_play(col):
+                self.state.drop(col, 1 + turn % 2)
+                mirror.drop(6 - col, 1 + turn % 2)
+        self.assertEqual(self.state.mirror_zobrist, mirror.zobrist)
+        self.assertEqual(self.state.mirrored_bitboard(1), mirror.bitboard(1))
+        self.assertEqual(self.state.mirror_key(2), mirror.key(2))
+        self.assertEqual(self.state.canonical_key(1), mirror.canonical_key(1))
+        self.assertEqual(self.state.canonical_zobrist,
+                         mirror.canonical_zobrist)
+        if self.state.zobrist != mirror.zobrist:
+            self.assertNotEqual(self.state.is_canonical(),
+                                mirror.is_canonical())
+        clone = self.state.copy()
+        for col in range(7):
+            while clone.height(col):
+                clone.undo(col)
+        self.assertEqual((clone.zobrist, clone.mirror_zobrist), (0, 0))
+        self.assertEqual(clone.mirror_key(1), 0)
+
+    def test_mirror_set_cell(self) -> None:
+        """
+        function to test the mirror image of a position loaded cell by
+        cell
+        """
+        self.state.set_cell(0, 2, 1)
+        self.state.set_cell(0, 2, 2)
+        self.assertEqual(self.state.mirrored_bitboard(2), self.state.bit(6, 2))
+        self.assertEqual(self.state.mirrored_bitboard(1), 0)
+        self.state.set_cell(0, 2, 0)
+        self.assertEqual(self.state.mirror_zobrist, 0)
+        self.assertEqual(self.state.mirror_col(0), 6)
@@ -1,9 +1,15 @@
+import os
+import pickle
+import subprocess
+import sys
 import unittest
 from hypothesis import given, settings, strategies, assume
 from unittest.mock import Mock, patch
 import hypothesis.strategies as some
 
-from board import Board, Piece, Spot, FullError, BoardIterator
+import board
+from board import (Board, Piece, Spot, FullError, BoardIterator,
+                   HistoryError)
 
 
 class TestPiece(unittest.TestCase):
@@ -14,6 +20,16 @@ class TestPiece(unittest.TestCase):
         self.assertEqual(piece.player_number, player_number)
 
 
+    def test_flyweight(self) -> None:
+        """
+        function to test that players 1 and 2 share their pieces
+        """
+        self.assertIs(Piece.of(1), Piece.of(1))
+        self.assertIs(Piece.of(2), Piece.of(2))
+        self.assertEqual(Piece.of(7).player_number, 7)
+        self.assertFalse(hasattr(Piece(1), '__dict__'))
+
+
 class TestSpot(unittest.TestCase):
 
     def setUp(self) -> None:
@@ -70,6 +86,14 @@ class TestSpot(unittest.TestCase):
             self.assertEqual(self.spot.player_number(), test_int)
         self.spot._piece = None
 
+    def test_add_piece_shares_piece(self) -> None:
+        """
+        function to test that adding a piece does not allocate one
+        """
+        self.spot.add_piece(2)
+        self.assertIs(self.spot.piece, Piece.of(2))
+        self.assertFalse(hasattr(self.spot, '__dict__'))
+
     def test_player_number_when_None(self) -> None:
         """
         function to test the player_number function when piece is None
@@ -85,33 +109,9 @@ class TestBoard(unittest.TestCase):
     @given(x=strategies.integers(0, 6), y=strategies.integers(0, 5))
     def test_init_empty(self, x, y) -> None:
         self.board: Board = Board()
-        self.assertEqual(len(self.board._board), 6)
-        self.assertEqual(len(self.board._board[y]), 7)
-        self.assertIsInstance(self.board._board[y][x], Spot)
-
-    @given(some.tuples(some.integers(), some.integers()))
-    def test_window_size_getter(self, test_tuple: tuple[int, int]) -> None:
-        """
-        function to test the window_size getter property
-        """
-        self.board._window_size = test_tuple
-        self.assertEqual(self.board.window_size, test_tuple)
-
-    @given(some.integers())
-    def test_window_width_getter(self, test_int: int) -> None:
-        """
-        function to test the window_width getter
-        """
-        self.board._window_width = test_int
-        self.assertEqual(self.board.window_width, test_int)
-
-    @given(some.integers())
-    def test_window_height_getter(self, test_int: int) -> None:
-        """
-        function to test the window_height getter
-        """
-        self.board._window_height = test_int
-        self.assertEqual(self.board.window_height, test_int)
+        self.assertEqual(self.board.height, 6)
+        self.assertEqual(self.board.width, 7)
+        self.assertEqual(self.board.get_player_at_spot(x, y), 0)
 
     def test_spot(self) -> None:
         """
@@ -139,16 +139,16 @@ class TestBoard(unittest.TestCase):
         """
         function to test the reset method
         """
+        self.board.drop_piece(0, 1)
         self.board.reset()
-        for row in self.board._board:
-            for spot in row:
-                self.assertIs(spot._piece, None)
+        for r, c, spot in self.board:
+            self.assertIs(spot._piece, None)
 
     def test_get_player_at_spot(self) -> None:
         """
         function to test the get_player_at_spot method
         """
-        self.board._board[0][0].add_piece(1)
+        self.board.set_player_at_spot(0, 0, 1)
         self.assertEqual(self.board.get_player_at_spot(0,0), 1)
         self.board.reset()
         self.assertEqual(self.board.get_player_at_spot(0,0), 0)
@@ -171,6 +171,23 @@ class TestBoard(unittest.TestCase):
         except(FullError):
             pass
 
+    def test_legal_moves(self) -> None:
+        """
+        function to test asking which columns can be played
+        """
+        self.board.reset()
+        self.assertEqual(self.board.legal_moves(), list(range(7)))
+        for i in range(6):
+            self.board.drop_piece(3, 1 + i % 2)
+        self.assertEqual(self.board.legal_moves(), [0, 1, 2, 4, 5, 6])
+        self.assertEqual(self.board.legal_mask, 0b1110111)
+        self.assertRaises(FullError, self.board.drop_piece, 3, 1)
+        self.assertRaises(ValueError, self.board.drop_piece, 7, 1)
+        self.assertRaises(ValueError, self.board.drop_piece, -1, 1)
+        self.board.undo_move()
+        self.assertEqual(self.board.legal_mask, 0b1111111)
+        self.assertFalse(self.board.is_full())
+
     def test_iter(self) -> None:
         """
         function to test the __iter__ method
@@ -182,7 +199,7 @@ class TestBoard(unittest.TestCase):
         """
         function to test the is_player method
         """
-        self.board._board[0][0].add_piece(1)
+        self.board.set_player_at_spot(0, 0, 1)
         self.assertEqual(self.board.is_player(0, 0, 1), True)
 
     def test_diagonal_win(self) -> None:
@@ -191,16 +208,16 @@ class TestBoard(unittest.TestCase):
         """
         self.board.reset()
         self.assertEqual(self.board._diagonal_win(1), False)
-        self.board._board[0][0].add_piece(1)
-        self.board._board[1][1].add_piece(1)
-        self.board._board[2][2].add_piece(1)
-        self.board._board[3][3].add_piece(1)
+        self.board.set_player_at_spot(0, 0, 1)
+        self.board.set_player_at_spot(1, 1, 1)
+        self.board.set_player_at_spot(2, 2, 1)
+        self.board.set_player_at_spot(3, 3, 1)
         self.assertEqual(self.board._diagonal_win(1), True)
         self.board.reset()
-        self.board._board[0][3].add_piece(1)
-        self.board._board[1][2].add_piece(1)
-        self.board._board[2][1].add_piece(1)
-        self.board._board[3][0].add_piece(1)
+        self.board.set_player_at_spot(3, 0, 1)
+        self.board.set_player_at_spot(2, 1, 1)
+        self.board.set_player_at_spot(1, 2, 1)
+        self.board.set_player_at_spot(0, 3, 1)
         self.assertEqual(self.board._diagonal_win(1), True)
 
     def test_has_won(self) -> None:
@@ -209,37 +226,286 @@ class TestBoard(unittest.TestCase):
         """
         self.board.reset()
         self.assertEqual(self.board.has_won(1), False)
-        self.board._board[0][0].add_piece(1)
-        self.board._board[1][0].add_piece(1)
-        self.board._board[2][0].add_piece(1)
-        self.board._board[3][0].add_piece(1)
+        self.board.set_player_at_spot(0, 0, 1)
+        self.board.set_player_at_spot(0, 1, 1)
+        self.board.set_player_at_spot(0, 2, 1)
+        self.board.set_player_at_spot(0, 3, 1)
         self.assertEqual(self.board.has_won(1), True)
         self.board.reset()
-        self.board._board[0][0].add_piece(1)
-        self.board._board[0][1].add_piece(1)
-        self.board._board[0][2].add_piece(1)
-        self.board._board[0][3].add_piece(1)
+        self.board.set_player_at_spot(0, 0, 1)
+        self.board.set_player_at_spot(1, 0, 1)
+        self.board.set_player_at_spot(2, 0, 1)
+        self.board.set_player_at_spot(3, 0, 1)
         self.assertEqual(self.board.has_won(1), True)
         self.board.reset()
-        self.board._board[0][0].add_piece(1)
-        self.board._board[0][1].add_piece(2)
-        self.board._board[0][2].add_piece(1)
-        self.board._board[0][3].add_piece(1)
+        self.board.set_player_at_spot(0, 0, 1)
+        self.board.set_player_at_spot(1, 0, 2)
+        self.board.set_player_at_spot(2, 0, 1)
+        self.board.set_player_at_spot(3, 0, 1)
         self.assertEqual(self.board.has_won(1), False)
         self.board.reset()
-        self.board._board[0][0].add_piece(1)
-        self.board._board[1][0].add_piece(2)
-        self.board._board[2][0].add_piece(1)
-        self.board._board[3][0].add_piece(1)
+        self.board.set_player_at_spot(0, 0, 1)
+        self.board.set_player_at_spot(0, 1, 2)
+        self.board.set_player_at_spot(0, 2, 1)
+        self.board.set_player_at_spot(0, 3, 1)
         self.assertEqual(self.board.has_won(1), False)
         self.board.reset()
-        self.board._board[0][3].add_piece(1)
-        self.board._board[1][2].add_piece(1)
-        self.board._board[2][1].add_piece(1)
-        self.board._board[3][0].add_piece(1)
+        self.board.set_player_at_spot(3, 0, 1)
+        self.board.set_player_at_spot(2, 1, 1)
+        self.board.set_player_at_spot(1, 2, 1)
+        self.board.set_player_at_spot(0, 3, 1)
         self.assertEqual(self.board.has_won(1), True)
-        
-        
+
+    def test_set_player_at_spot(self) -> None:
+        """
+        function to test the set_player_at_spot method
+        """
+        self.board.set_player_at_spot(2, 3, 2)
+        self.assertEqual(self.board.get_player_at_spot(2, 3), 2)
+        self.board.set_player_at_spot(2, 3, 0)
+        self.assertEqual(self.board.get_player_at_spot(2, 3), 0)
+        self.assertRaises(ValueError, self.board.set_player_at_spot, 7, 0, 1)
+
+    def test_copy(self) -> None:
+        """
+        function to test that copies do not share game state
+        """
+        self.board.drop_piece(3, 1)
+        clone = self.board.copy()
+        clone.drop_piece(3, 2)
+        self.assertEqual(clone.get_player_at_spot(3, 1), 2)
+        self.assertEqual(self.board.get_player_at_spot(3, 1), 0)
+        self.assertEqual(self.board.get_player_at_spot(3, 0), 1)
+
+    @given(some.lists(some.integers(0, 6), max_size=42))
+    def test_has_won_incremental_matches_scan(self, moves: list[int]) -> None:
+        """
+        function to test that the last-move win check agrees with a
+        full scan of the board
+        """
+        self.board.reset()
+        player = 1
+        for column in moves:
+            try:
+                self.board.drop_piece(column, player)
+            except FullError:
+                continue
+            self.assertEqual(self.board.last_move[0], column)
+            for number in (1, 2):
+                self.assertEqual(self.board.has_won(number),
+                                 self.board.state.has_won(number))
+            player = 3 - player
+
+    @given(some.lists(some.integers(0, 6), max_size=42),
+           some.integers(0, 42))
+    def test_undo_redo(self, moves: list[int], undos: int) -> None:
+        """
+        function to test that undoing moves restores the earlier
+        position and redoing them plays them again
+        """
+        self.board.reset()
+        positions = [(self.board.cells(), self.board.last_move,
+                      self.board.has_won(1), self.board.has_won(2))]
+        player = 1
+        for column in moves:
+            try:
+                self.board.drop_piece(column, player)
+            except FullError:
+                continue
+            positions.append((self.board.cells(), self.board.last_move,
+                              self.board.has_won(1), self.board.has_won(2)))
+            player = 3 - player
+        played = self.board.moves
+        undos = min(undos, len(played))
+        for count in range(undos):
+            column, row, number = self.board.undo_move()
+            self.assertEqual(column, played[-1 - count])
+            self.assertEqual(self.board.get_player_at_spot(column, row), 0)
+            position = positions[-2 - count]
+            self.assertEqual((self.board.cells(), self.board.last_move,
+                              self.board.has_won(1), self.board.has_won(2)),
+                             position)
+        self.assertEqual(self.board.can_redo, undos > 0)
+        for count in range(undos):
+            self.board.redo_move()
+        self.assertEqual(self.board.moves, played)
+        self.assertEqual((self.board.cells(), self.board.last_move,
+                          self.board.has_won(1), self.board.has_won(2)),
+                         positions[-1])
+        self.assertRaises(HistoryError, self.board.redo_move)
+
+    def test_history(self) -> None:
+        """
+        function to test when moves can be undone and redone
+        """
+        self.assertFalse(self.board.can_undo)
+        self.assertRaises(HistoryError, self.board.undo_move)
+        self.board.drop_piece(3, 1)
+        self.board.drop_piece(4, 2)
+        self.assertEqual(self.board.undo_move(), (4, 0, 2))
+        clone = self.board.copy()
+        # A new move forgets the moves taken back
+        self.board.drop_piece(2, 2)
+        self.assertFalse(self.board.can_redo)
+        self.assertEqual(self.board.moves, [3, 2])
+        self.assertEqual(clone.redo_move(), (4, 0, 2))
+        # Placing pieces by hand forgets the history
+        self.board.set_player_at_spot(0, 0, 1)
+        self.assertFalse(self.board.can_undo)
+        self.board.drop_piece(5, 1)
+        self.board.reset()
+        self.assertEqual(self.board.moves, [])
+
+    @given(some.lists(some.integers(0, 6), max_size=42))
+    def test_mirrored(self, moves: list[int]) -> None:
+        """
+        function to test that a board and its mirror image share a
+        canonical key
+        """
+        self.board.reset()
+        for turn, column in enumerate(moves):
+            if self.board.state.can_play(column):
+                self.board.drop_piece(column, 1 + turn % 2)
+        mirror = self.board.mirrored()
+        self.assertEqual(mirror.moves, [6 - col for col in self.board.moves])
+        self.assertEqual(mirror.canonical_key, self.board.canonical_key)
+        self.assertEqual(mirror.has_won(1), self.board.has_won(1))
+        self.assertEqual(mirror.mirrored().key, self.board.key)
+        for row, col, player_number in self.board.occupied():
+            self.assertEqual(mirror.get_player_at_spot(6 - col, row),
+                             player_number)
+        self.board.set_player_at_spot(0, 5, 2)
+        mirror = self.board.mirrored()
+        self.assertEqual(mirror.get_player_at_spot(6, 5), 2)
+        self.assertEqual(mirror.canonical_key, self.board.canonical_key)
+
+    def test_last_move(self) -> None:
+        """
+        function to test the last_move property
+        """
+        self.board.reset()
+        self.assertIsNone(self.board.last_move)
+        self.board.drop_piece(4, 1)
+        self.board.drop_piece(4, 2)
+        self.assertEqual(self.board.last_move, (4, 1, 2))
+        self.board.set_player_at_spot(0, 0, 1)
+        self.assertIsNone(self.board.last_move)
+
+    def test_headless(self) -> None:
+        """
+        function to test that the board module works without pygame
+        """
+        code = ("import sys, board; board.Board().drop_piece(0, 1); "
+                "assert 'pygame' not in sys.modules")
+        result = subprocess.run([sys.executable, "-c", code],
+                                env=dict(os.environ,
+                                         PYTHONPATH=os.path.dirname(
+                                             board.__file__)))
+        self.assertEqual(result.returncode, 0)
+
+    def test_pickle(self) -> None:
+        """
+        function to test that boards can be sent to worker processes
+        """
+        self.board.drop_piece(2, 1)
+        clone = pickle.loads(pickle.dumps(self.board))
+        self.assertEqual(clone.get_player_at_spot(2, 0), 1)
+        self.assertEqual(clone.last_move, (2, 0, 1))
+
+    def test_spot_at(self) -> None:
+        """
+        function to test spot views
+        """
+        self.board.drop_piece(1, 2)
+        self.assertEqual(self.board.spot_at(1, 0).player_number(), 2)
+        self.assertIs(self.board.spot_at(1, 0).piece, Piece.of(2))
+        self.assertTrue(self.board.spot_at(1, 1).is_empty())
+
+    def test_memory_footprint(self) -> None:
+        """
+        function to test that a board stays small
+        """
+        self.assertFalse(hasattr(self.board, '__dict__'))
+        self.assertFalse(hasattr(self.board.state, '__dict__'))
+        for col in range(7):
+            for row in range(3):
+                self.board.drop_piece(col, 1 + row % 2)
+        self.assertLess(self.board.memory_footprint(), 1024)
+        self.assertGreater(self.board.memory_footprint(),
+                           self.board.state.memory_footprint())
+
+    @given(some.lists(some.integers(0, 6), max_size=30))
+    def test_cells_match_iteration(self, moves: list[int]) -> None:
+        """
+        function to test that the fast views agree with iteration
+        """
+        self.board.reset()
+        for turn, column in enumerate(moves):
+            try:
+                self.board.drop_piece(column, 1 + turn % 2)
+            except FullError:
+                pass
+        expected = [(r, c, spot.player_number()) for r, c, spot in self.board]
+        self.assertEqual(
+            [(r, c, n) for (r, c, bit), n in zip(self.board.positions,
+                                                 self.board.cells())],
+            expected)
+        self.assertEqual(sorted(self.board.occupied()),
+                         sorted(cell for cell in expected if cell[2]))
+        for x in range(7):
+            self.assertEqual(list(self.board.column(x)),
+                             [self.board.get_player_at_spot(x, y)
+                              for y in range(6)])
+        for y in range(6):
+            self.assertEqual(list(self.board.row(y)),
+                             [self.board.get_player_at_spot(x, y)
+                              for x in range(7)])
+
+    @given(some.lists(some.integers(0, 19), max_size=200))
+    def test_large_board_connect_n(self, moves: list[int]) -> None:
+        """
+        function to test that the win tracked move by move on a large
+        board agrees with a full scan
+        """
+        board = Board(20, 20, 6)
+        self.assertEqual(board.connect, 6)
+        for turn, col in enumerate(moves):
+            board.drop_piece(col, 1 + turn % 2)
+        for player in (1, 2):
+            self.assertEqual(board.has_won(player),
+                             board.state.has_won(player))
+
+    def test_positions_shared(self) -> None:
+        """
+        function to test that the position table is built once
+        """
+        self.assertIs(self.board.positions, Board().positions)
+        self.assertEqual(len(self.board.positions), 42)
+        self.assertEqual(self.board.positions[8], (1, 1, 8))
+
+    def test_shared_views(self) -> None:
+        """
+        function to test that iterating allocates no spot per cell
+        """
+        self.board.drop_piece(3, 2)
+        cells = list(self.board)
+        self.assertEqual(cells, list(self.board))
+        self.assertEqual(len({id(spot) for r, c, spot in cells}), 2)
+        self.assertEqual(cells[3][2].player_number(), 2)
+        self.assertIs(cells[0], next(iter(self.board)))
+        self.assertRaises(TypeError, cells[0][2].add_piece, 1)
+        self.assertTrue(cells[0][2].is_empty())
+
+    def test_legacy_iterator(self) -> None:
+        """
+        function to test that 'BoardIterator' matches iteration
+        """
+        self.board.drop_piece(3, 2)
+        legacy = [(r, c, s.player_number())
+                  for r, c, s in BoardIterator(self.board.state)]
+        current = [(r, c, s.player_number()) for r, c, s in self.board]
+        self.assertEqual(legacy, current)
+
     class TestBoardIter(unittest.TestCase):
         def setUp(self):
             self.boarditer: BoardIterator = BoardIterator
@@ -0,0 +1,204 @@
+import asyncio
+import socket
+import threading
+import time
+import unittest
+from typing import Callable, Optional
+from unittest.mock import patch
+
+from client import Connection, NetworkGame, ProtocolError
+from server import GameServer
+
+
+def until(game: NetworkGame, done: Callable[[], bool]) -> Optional[int]:
+    """
+    Handle the lines from the server until 'done' is true or the game
+    ends. Returns the time the game ended, if it did.
+    """
+    deadline = time.monotonic() + 5
+    ended_at = None
+    while (ended_at is None and not done() and
+           time.monotonic() < deadline):
+        ended_at = game._poll_ai()
+        time.sleep(0.001)
+    return ended_at
+
+
+def waiting(server: GameServer) -> Callable[[], bool]:
+    """
+    Get a check that a player is waiting for an opponent.
+    """
+    return lambda: server._waiting is not None
+
+
+class TestConnection(unittest.TestCase):
+    def test_not_a_server(self) -> None:
+        """
+        function to test connecting to something else
+        """
+        ours, theirs = socket.socketpair()
+        theirs.sendall(b"SSH-2.0\n")
+        self.assertRaises(ProtocolError, Connection, ours)
+        theirs.close()
+
+    def test_closed(self) -> None:
+        """
+        function to test a server hanging up
+        """
+        ours, theirs = socket.socketpair()
+        theirs.sendall(b"HELLO 5 4 3\n")
+        connection = Connection(ours)
+        self.assertEqual((connection.cols, connection.rows,
+                          connection.connect), (5, 4, 3))
+        theirs.close()
+        deadline = time.monotonic() + 5
+        words = None
+        while words is None and time.monotonic() < deadline:
+            words = connection.poll()
+        self.assertEqual(words, ["CLOSED"])
+        connection.close()
+
+
+class TestNetworkGame(unittest.TestCase):
+    def test_connection_lost(self) -> None:
+        """
+        function to test the server hanging up during a game
+        """
+        with (patch('game.Screen') as Screen, patch('game.Draw'),
+              patch('game.TextCache'), patch('game.pygame') as game_pygame,
+              patch('client.pygame') as pygame,
+              patch('builtins.print') as print_):
+            Screen().square_size = 100
+            game_pygame.time.get_ticks.return_value = 3000
+            pygame.time.get_ticks.return_value = 3000
+            ours, theirs = socket.socketpair()
+            theirs.sendall(b"HELLO 7 6 4\nSTART 1\n")
+            game = NetworkGame(Connection(ours))
+            game._start_game()
+            until(game, lambda: game.player_number != 0)
+            theirs.close()
+            # The game ends with a message instead of an error
+            self.assertEqual(until(game, lambda: False), 3000)
+            self.assertTrue(game.lost)
+            print_.assert_called_with("Connection lost")
+            game._state = game.GAME_OVER
+            game._ended_at = 3000
+            self.assertTrue(game.handle_event(pygame.event.Event()))
+            self.assertEqual(game._state, game.GAME_OVER)
+            # Once the message has been shown, the game is left
+            pygame.time.get_ticks.return_value = 6001
+            self.assertFalse(game.handle_event(pygame.event.Event()))
+            game.connection.close()
+
+    def test_move_not_sent(self) -> None:
+        """
+        function to test the server hanging up before a move is sent
+        """
+        with (patch('game.Screen') as Screen, patch('game.Draw'),
+              patch('game.TextCache'), patch('game.pygame'),
+              patch('client.pygame') as pygame,
+              patch('builtins.print') as print_):
+            Screen().square_size = 100
+            pygame.time.get_ticks.return_value = 3000
+            ours, theirs = socket.socketpair()
+            theirs.sendall(b"HELLO 7 6 4\nSTART 1\n")
+            game = NetworkGame(Connection(ours))
+            game._start_game()
+            until(game, lambda: game.player_number != 0)
+            with patch.object(game.connection, 'send',
+                              side_effect=BrokenPipeError):
+                self.assertEqual(game.play_column(3), 3000)
+            # The move is not played when it could not be sent
+            self.assertEqual(game.board.moves, [])
+            self.assertTrue(game.lost)
+            print_.assert_called_with("Connection lost")
+            theirs.close()
+            game.connection.close()
+
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever,
+                                       daemon=True)
+        self.thread.start()
+        self.server = GameServer()
+        self.port = asyncio.run_coroutine_threadsafe(
+            self.server.start(), self.loop).result()
+
+    def tearDown(self) -> None:
+        asyncio.run_coroutine_threadsafe(self.server.close(),
+                                         self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def test_game(self) -> None:
+        """
+        function to test two clients playing a game on a local server
+        """
+        with (patch('game.Screen') as Screen, patch('game.Draw'),
+              patch('game.pygame') as pygame, patch('client.pygame'),
+              patch('builtins.print')):
+            Screen().square_size = 100
+            pygame.time.get_ticks.return_value = 1000
+            first = NetworkGame(Connection.open("127.0.0.1", self.port))
+            second = NetworkGame(Connection.open("127.0.0.1", self.port))
+            first._start_game()
+            until(first, waiting(self.server))
+            second._start_game()
+            until(second, lambda: second.player_number != 0)
+            until(first, lambda: first.player_number != 0)
+            self.assertEqual((first.player_number, second.player_number),
+                             (1, 2))
+            self.assertFalse(first.undo())
+            self.assertIsNone(first.redo())
+            # The second player waits for the first move
+            self.assertTrue(second._ai_turn())
+            for turn, col in enumerate((0, 1, 0, 1, 0, 1)):
+                player, opponent = (first, second)[turn % 2], \
+                    (second, first)[turn % 2]
+                self.assertIsNone(player.play_column(col))
+                until(opponent, lambda: len(opponent.board.moves) > turn)
+                self.assertEqual(opponent.board.moves, player.board.moves)
+            self.assertEqual(first.play_column(0), 1000)
+            self.assertEqual(until(second, lambda: False), 1000)
+            self.assertTrue(second.board.has_won(1))
+
+            # The moves and result still queued from the last game are
+            # not played on the board of the rematch
+            first._start_game()
+            until(first, waiting(self.server))
+            second._start_game()
+            until(second, lambda: second.player_number != 0)
+            until(first, lambda: first.player_number != 0)
+            self.assertEqual((first.player_number, second.player_number),
+                             (1, 2))
+            self.assertEqual(first.board.moves, [])
+            self.assertEqual(second.board.moves, [])
+            self.assertIsNone(first.play_column(3))
+            until(second, lambda: len(second.board.moves) > 0)
+            self.assertEqual(second.board.moves, [3])
+            second.connection.close()
+            first.connection.close()
+
+    def test_left(self) -> None:
+        """
+        function to test an opponent leaving the game
+        """
+        with (patch('game.Screen') as Screen, patch('game.Draw'),
+              patch('game.TextCache'), patch('game.pygame'),
+              patch('client.pygame') as pygame,
+              patch('builtins.print') as print_):
+            Screen().square_size = 100
+            pygame.time.get_ticks.return_value = 2000
+            first = NetworkGame(Connection.open("127.0.0.1", self.port))
+            second = NetworkGame(Connection.open("127.0.0.1", self.port))
+            first._start_game()
+            until(first, waiting(self.server))
+            second._start_game()
+            until(first, lambda: first.player_number != 0)
+            second.connection.close()
+            self.assertEqual(until(first, lambda: False), 2000)
+            print_.assert_called_with("Your opponent left")
+            # The server is still there for a rematch
+            self.assertFalse(first.lost)
+            first.connection.close()
@@ -1,7 +1,9 @@
+import threading
 import unittest
 from unittest.mock import patch, MagicMock
 from hypothesis import given, strategies
 
+from ai import SearchTimeout
 from game import Game
 from graphics import MultiError
 
@@ -34,39 +36,58 @@ class TestGame(unittest.TestCase):
             Draw.side_effect = [MagicMock(), MagicMock()]
             self.assertRaises(MultiError, Game)
 
-    @given(strategies.integers(min_value=1, max_value=2))
-    def test_print_winner_message(self, player_number: int) -> None:
+    @given(strategies.integers(min_value=1, max_value=2),
+           strategies.integers(10, 200))
+    def test_print_winner_message(self, player_number: int,
+                                  square_size: int) -> None:
         with (patch('game.Turns'), patch('game.Board'),
               patch('game.Screen') as Screen,
-              patch('game.Color') as Color, patch('game.Draw'),
+              patch('game.Color') as Color, patch('game.Draw') as Draw,
+              patch('game.TextCache') as TextCache,
               patch('game.pygame') as pygame):
-            font = pygame.font.SysFont()
             expected_message: str = f"Player {player_number} wins!"
             expected_color: MagicMock
             if player_number == 1:
                 expected_color = Color().red
-            elif player_number == 2:
-                expected_color = Color().yellow
             else:
-                expected_color = MagicMock()
+                expected_color = Color().yellow
+            Screen().square_size = square_size
+            Screen().window_width = 7 * square_size
+            TextCache().label().get_width.return_value = 5 * square_size
+            TextCache().label().get_height.return_value = square_size // 2
             game = Game()
+            self.assertEqual(game.text, TextCache())
             game._print_winner_message(player_number)
-            font.render.assert_called_with(
-                expected_message, 1, expected_color)
-            Screen().window.blit.assert_called()
+            TextCache().label.assert_called_with(
+                expected_message, max(8, square_size * 3 // 4),
+                expected_color)
+            # Centred in the strip above the board, and clipped to it
+            Screen().window.blit.assert_called_with(
+                TextCache().label(),
+                (square_size, (square_size - square_size // 2) // 2))
+            Screen().window.set_clip.assert_any_call(Draw().hover_strip())
+            Screen().window.set_clip.assert_called_with(None)
+            pygame.display.update.assert_called_with(Draw().hover_strip())
 
     def test_print_tie_message(self) -> None:
         with (patch('game.Turns'), patch('game.Board'),
               patch('game.Screen') as Screen,
               patch('game.Color') as Color, patch('game.Draw'),
-              patch('game.pygame') as pygame):
-            font = pygame.font.SysFont()
+              patch('game.TextCache') as TextCache,
+              patch('game.pygame')):
             expected_message: str = "Tie Game!"
             expected_color = Color().blue
+            Screen().square_size = 40
+            Screen().window_width = 280
+            TextCache().label().get_width.return_value = 300
+            TextCache().label().get_height.return_value = 30
             game = Game()
             game._print_tie_message()
-            font.render.assert_called_with(expected_message, 1, expected_color)
-            Screen().window.blit.assert_called()
+            TextCache().label.assert_called_with(expected_message, 30,
+                                                 expected_color)
+            # A label wider than the window is centred and cut off
+            Screen().window.blit.assert_called_with(TextCache().label(),
+                                                    (-10, 5))
 
     @given(screen_width=strategies.integers(10, 1000),
            square_size=strategies.integers(5, 200))
@@ -75,10 +96,11 @@ class TestGame(unittest.TestCase):
         with (patch('game.Turns'), patch('game.Board'),
               patch('game.Screen') as Screen,
               patch('game.Color') as Color, patch('game.Draw'),
+              patch('game.TextCache') as TextCache,
               patch('game.pygame') as pygame):
             Screen().window_width = screen_width
             Screen().square_size = square_size
-            font = pygame.font.SysFont()
+            TextCache().label.reset_mock()
             expected_background_color = Color().black
             expected_text_color = Color().lightblue
             game = Game()
@@ -86,45 +108,34 @@ class TestGame(unittest.TestCase):
             pygame.draw.rect.assert_called_with(
                 Screen().window, expected_background_color,
                 (0, 0, screen_width, square_size))
-            font.render.assert_called_once()
-            positional, keyword = font.render.call_args
+            TextCache().label.assert_called_once()
+            positional, keyword = TextCache().label.call_args
             self.assertEqual(len(positional), 3)
             self.assertIsInstance(positional[0], str)
-            self.assertEqual(positional[1], 1)
+            self.assertEqual(positional[1], 22)
             self.assertEqual(positional[2], expected_text_color)
             self.assertEqual(keyword, {})
-            label = font.render()
+            label = TextCache().label()
             Screen().window.blit.assert_called_with(label, (20, 5))
 
     def test_replay(self) -> None:
         with (patch('game.Turns'), patch('game.Board'),
               patch('game.Screen'),
               patch('game.Color'), patch('game.Draw'),
-              patch('game.pygame') as pygame, patch('game.sys') as sys):
-            print_replay_message = MagicMock()
-            event = MagicMock()
+              patch('game.pygame') as pygame):
             game = Game()
-            game._print_replay_message = print_replay_message
-            event_return_vals = [[MagicMock()] for i in range(20)]
-            event_return_vals[0][0].type = pygame.MOUSEBUTTONDOWN
-            event_return_vals[2][0].type = pygame.KEYDOWN
-            event_return_vals[3][0].type = pygame.KEYDOWN
-            event_return_vals[3][0].key = pygame.K_ESCAPE
-            event_return_vals[4][0].type = pygame.QUIT
-            event_return_vals[5][0].type = pygame.MOUSEBUTTONDOWN
-            pygame.event.get.side_effect = event_return_vals
-            self.assertTrue(game._replay(event))
-            print_replay_message.assert_called_once_with()
-            pygame.display.update.assert_called_once_with()
+            events = [MagicMock() for i in range(4)]
+            events[0].type = pygame.MOUSEBUTTONDOWN
+            events[1].type = pygame.KEYDOWN
+            events[2].type = pygame.KEYDOWN
+            events[2].key = pygame.K_ESCAPE
+            events[3].type = pygame.MOUSEMOTION
+            self.assertTrue(game._replay(events[0]))
+            self.assertIsNone(game._replay(events[1]))
+            self.assertFalse(game._replay(events[2]))
+            self.assertIsNone(game._replay(events[3]))
+            pygame.event.get.assert_not_called()
             pygame.time.delay.assert_not_called()
-            event.assert_not_called()
-            self.assertFalse(game._replay(event))
-            pygame.quit.assert_not_called()
-            sys.exit.assert_not_called()
-            pygame.time.delay.assert_called
-            self.assertTrue(game._replay(event))
-            pygame.quit.assert_called_once_with()
-            sys.exit.assert_called_once_with()
 
     @given(xpos=strategies.integers(min_value=0, max_value=1000),
            square_size=strategies.integers(min_value=1, max_value=100),
@@ -137,18 +148,17 @@ class TestGame(unittest.TestCase):
               patch('game.pygame')):
             Turns()._player_turn = player_turn
             Draw().screen.square_size = square_size
-            expected_color: MagicMock() = Color().black
             screen: MagicMock = MagicMock()
             event_pos = [xpos]
             game = Game()
             game.handle_mouse_motion(screen, event_pos)
-            screen.fill.assert_called_with(expected_color)
+            screen.fill.assert_not_called()
+            Draw().gameboard.assert_not_called()
             if player_turn == 1:
                 expected_color = Color().red
             elif player_turn == 2:
                 expected_color = Color().yellow
-            Draw().draw_circle.assert_called_once_with(
-                expected_color, (xpos, int(square_size / 2)))
+            Draw().hover.assert_called_once_with(xpos, expected_color)
 
     @given(xpos=strategies.floats(min_value=0, max_value=1000, allow_nan=False,
                                   allow_infinity=False),
@@ -165,18 +175,29 @@ class TestGame(unittest.TestCase):
             game: Game = Game()
             event_pos = [xpos, 2.6]
             self.assertIsNone(game.handle_mouse_click(event_pos))
-            expected_top_color: MagicMock() = Color().black
-            pygame.draw.rect.assert_called_once_with(
-                Screen().window, expected_top_color,
-                (0, 0, Screen().window_width, square_size))
+            Draw().clear_hover.assert_called_once_with()
             correct_column: int = int(xpos / square_size)
             Board().drop_piece.assert_called_once_with(correct_column,
                                                        Turns()._player_turn)
             Draw().gameboard.assert_called_once_with()
-            pygame.display.update.assert_called_once_with()
+            pygame.display.update.assert_not_called()
             Turns()._increment_turn.assert_called_once_with()
             Turns()._switch_player.assert_called_once_with()
 
+    def test_board_size(self) -> None:
+        with (patch('game.Turns') as Turns, patch('game.Board') as Board,
+              patch('game.Screen'), patch('game.Color'), patch('game.Draw'),
+              patch('game.pygame') as pygame):
+            game = Game(None, 20, 20, 6)
+            Board.assert_called_with(20, 20, 6)
+            Turns.assert_called_with(400)
+            # The board is full once no turns are left
+            Board().has_won.return_value = False
+            Turns().turns_left = 0
+            game._print_tie_message = MagicMock()
+            self.assertEqual(game.play_column(3), pygame.time.get_ticks())
+            game._print_tie_message.assert_called_once_with()
+
     @given(xpos=strategies.floats(min_value=0, max_value=1000, allow_nan=False,
                                   allow_infinity=False))
     def test_handle_mouse_click_winner(self, xpos: float) -> None:
@@ -193,33 +214,291 @@ class TestGame(unittest.TestCase):
                 Turns()._player_turn)
 
     def test_game_loop(self) -> None:
-        with (patch('game.Turns'), patch('game.Board') as Board,
-              patch('game.Screen'),
+        with (patch('game.Turns') as Turns, patch('game.Board') as Board,
+              patch('game.Screen') as Screen,
               patch('game.Color'), patch('game.Draw') as Draw,
+              patch('game.TextCache') as TextCache,
               patch('game.pygame') as pygame):
             handle_mouse_click = MagicMock()
-            replay = MagicMock()
-            replay.side_effect = [True, False]
-            handle_mouse_click.side_effect = [7, None, 2, None, 6, None, 6, 6]
-            pygame.time.get_ticks.side_effect = [2000, 4000, 4000, 4000, 4000]
-            event_side_effect = [[MagicMock()] for i in range(200)]
-            event_side_effect[0][0].type = pygame.MOUSEBUTTONDOWN
-            event_side_effect[1][0].type = pygame.MOUSEMOTION
-            event_side_effect[2][0].type = pygame.MOUSEBUTTONDOWN
-            event_side_effect[3][0].type = pygame.MOUSEBUTTONDOWN
-            event_side_effect[4][0].type = pygame.MOSUEBUTTONDOWN
-            event_side_effect[5][0].type = pygame.MOUSEBUTTONDOWN
-            pygame.event.get.side_effect = event_side_effect
+            handle_mouse_click.side_effect = [7, None, 6]
+            pygame.time.get_ticks.return_value = 4000
+            events = [MagicMock() for i in range(8)]
+            events[0].type = pygame.MOUSEBUTTONDOWN  # player wins
+            events[1].type = pygame.NOEVENT  # result shown, ask to replay
+            events[2].type = pygame.MOUSEBUTTONDOWN  # play again
+            events[3].type = pygame.MOUSEMOTION
+            events[4].type = pygame.MOUSEBUTTONDOWN  # game goes on
+            events[5].type = pygame.MOUSEBUTTONDOWN  # player wins
+            events[6].type = pygame.NOEVENT
+            events[7].type = pygame.KEYDOWN  # quit
+            events[7].key = pygame.K_ESCAPE
+            pygame.event.wait.side_effect = events
+            Screen().square_size = 100
             game = Game()
             game.handle_mouse_click = handle_mouse_click
-            game._replay = replay
+            game.handle_mouse_motion = MagicMock()
+            game._print_replay_message = MagicMock()
             game.game_loop()
-            pygame.init.assert_called()
+            pygame.init.assert_called_once_with()
+            TextCache().preload.assert_called_with((75, 22))
+            self.assertEqual(handle_mouse_click.call_count, 3)
+            game.handle_mouse_motion.assert_called_once_with(
+                game.screen.window,
+                events[3].pos)
+            self.assertEqual(game._print_replay_message.call_count, 2)
+            self.assertEqual(Board().reset.call_count, 2)
+            self.assertEqual(Turns()._turn_count, 0)
+            self.assertEqual(Turns()._player_turn, 1)
             Draw().gameboard.assert_called()
-            pygame.display.update.assert_called()
-            handle_mouse_click.assert_called()
-            replay.assert_called()
-            Board().reset.assert_called()
-            Draw().gameboard.assert_called()
-            pygame.time.Clock().tick.assert_called()
-            pygame.display.update.assert_called()
+            self.assertEqual(game.state, Game.REPLAY)
+            # Idle waits block until an event arrives, except while
+            # the result of a game is on screen
+            waits = pygame.event.wait.call_args_list
+            self.assertEqual(waits[0], ((),))
+            self.assertEqual(waits[1][0][0], 1)
+            pygame.event.get.assert_not_called()
+
+    def test_game_loop_quit(self) -> None:
+        with (patch('game.Turns'), patch('game.Board'),
+              patch('game.Screen') as Screen,
+              patch('game.Color'), patch('game.Draw'),
+              patch('game.TextCache'),
+              patch('game.pygame') as pygame, patch('game.sys') as sys):
+            event = MagicMock()
+            event.type = pygame.QUIT
+            sys.exit.side_effect = SystemExit
+            pygame.event.wait.return_value = event
+            Screen().square_size = 100
+            ai = MagicMock()
+            ai.player_number = 2
+            game = Game(ai)
+            self.assertRaises(SystemExit, game.game_loop)
+            # The computer's worker processes are stopped on the way out
+            ai.close.assert_called_once_with()
+
+    def test_game_loop_profiler(self) -> None:
+        with (patch('game.Turns'), patch('game.Board'),
+              patch('game.Screen') as Screen,
+              patch('game.Color'), patch('game.Draw'),
+              patch('game.TextCache') as TextCache,
+              patch('game.pygame') as pygame):
+            profiler = MagicMock()
+            profiler.overlay = True
+            profiler.overlay_text.return_value = "60 fps  1.0 ms  3 ev/s"
+            events = [MagicMock() for i in range(2)]
+            events[0].type = pygame.NOEVENT
+            events[1].type = pygame.KEYDOWN  # quit
+            events[1].key = pygame.K_ESCAPE
+            pygame.event.wait.side_effect = events
+            Screen().square_size = 100
+            game = Game(profiler=profiler)
+            self.assertIs(game.profiler, profiler)
+            game._start_game = MagicMock()
+            game._state = Game.REPLAY
+            game.game_loop()
+            profiler.install.assert_called_once_with(Game.hot_paths())
+            self.assertEqual(profiler.begin_frame.call_count, 2)
+            self.assertEqual(profiler.end_frame.call_args_list,
+                             [((False,),), ((True,),)])
+            TextCache().font(16).render.assert_called_with(
+                "60 fps  1.0 ms  3 ev/s", 1, game.color.lightblue)
+            profiler.uninstall.assert_called_once_with()
+
+    def test_idle_timeout(self) -> None:
+        with (patch('game.Turns') as Turns, patch('game.Board'),
+              patch('game.Screen'),
+              patch('game.Color'), patch('game.Draw'),
+              patch('game.pygame') as pygame):
+            ai = MagicMock()
+            ai.player_number = 2
+            game = Game(ai)
+            Turns()._player_turn = 1
+            self.assertEqual(game._idle_timeout(), 0)
+            Turns()._player_turn = 2
+            self.assertEqual(game._idle_timeout(), 16)
+            game._state = Game.GAME_OVER
+            game._ended_at = 1000
+            pygame.time.get_ticks.return_value = 2000
+            self.assertEqual(game._idle_timeout(), 2001)
+            game._state = Game.REPLAY
+            self.assertEqual(game._idle_timeout(), 0)
+
+    def test_poll_ai(self) -> None:
+        with (patch('game.Turns') as Turns, patch('game.Board') as Board,
+              patch('game.Screen'),
+              patch('game.Color'), patch('game.Draw'),
+              patch('game.pygame')):
+            ai = MagicMock()
+            ai.player_number = 2
+            ai.thinking.return_value = False
+            ai.stats.nodes_per_second = 1000.0
+            game = Game(ai)
+            self.assertIs(game.ai, ai)
+            game.play_column = MagicMock(return_value=None)
+
+            # not the computer's turn
+            Turns()._player_turn = 1
+            self.assertIsNone(game._poll_ai())
+            ai.start.assert_not_called()
+
+            # computer's turn, no search yet
+            Turns()._player_turn = 2
+            ai.result.return_value = None
+            self.assertIsNone(game._poll_ai())
+            ai.start.assert_called_once_with(Board().state)
+
+            # still thinking
+            ai.thinking.return_value = True
+            self.assertIsNone(game._poll_ai())
+            game.play_column.assert_not_called()
+
+            # search finished
+            ai.thinking.return_value = False
+            ai.result.return_value = 4
+            game._poll_ai()
+            game.play_column.assert_called_once_with(4)
+
+    def test_hint(self) -> None:
+        with (patch('game.Turns') as Turns, patch('game.Board') as Board,
+              patch('game.Screen') as Screen,
+              patch('game.Color') as Color, patch('game.Draw') as Draw,
+              patch('game.Solver') as Solver,
+              patch('game.Negamax') as Negamax,
+              patch('game.pygame') as pygame,
+              patch('builtins.print')):
+            game = Game()
+            # The solver is only made once a hint is asked for
+            Solver.assert_not_called()
+            self.assertIs(game.solver, Solver())
+            Turns().player_turn = 1
+            Solver().best_move.return_value = 2
+            self.assertEqual(game.hint(), 2)
+            Solver().best_move.assert_called_with(Board().state, 1)
+
+            # Fall back on a short search when solving takes too long
+            Solver().best_move.side_effect = SearchTimeout
+            Negamax().search.return_value = 5
+            self.assertEqual(game.hint(), 5)
+
+            # Pressing 'h' looks for the hint in the background, then
+            # hovers the piece over it
+            Screen().square_size = 100
+            Solver().best_move.side_effect = None
+            Board().state.copy.return_value = Board().state
+            event = MagicMock()
+            event.type = pygame.KEYDOWN
+            event.key = pygame.K_h
+            game.handle_event(event)
+            game._hint_thread.join()
+            self.assertFalse(game.hinting())
+            game._poll_hint()
+            Draw().hover.assert_called_with(250, Color().red)
+
+            # A hint for a position that has changed is dropped
+            Draw().hover.reset_mock()
+            found = threading.Event()
+            Solver().best_move.side_effect = lambda *args: found.wait() and 3
+            game.handle_event(event)
+            self.assertTrue(game.hinting())
+            Board().state.key.return_value = 1
+            found.set()
+            game._hint_thread.join()
+            game._poll_hint()
+            Draw().hover.assert_not_called()
+
+    def test_record(self) -> None:
+        with (patch('game.Turns') as Turns, patch('game.Board') as Board,
+              patch('game.Screen') as Screen, patch('game.Color'), patch('game.Draw'),
+              patch('game.pygame')):
+            ai = MagicMock()
+            ai.player_number = 2
+            store = MagicMock()
+            Screen().square_size = 100
+            game = Game(ai, store=store)
+            self.assertIs(game.store, store)
+            Board().has_won.return_value = False
+            game._print_winner_message = MagicMock()
+            game.play_column(3)
+            game.play_column(4)
+            self.assertEqual(game.record.moves, [3, 4])
+            store.record.assert_not_called()
+
+            # The finished game is queued with its winner
+            Board().has_won.return_value = True
+            Turns()._player_turn = 1
+            game.play_column(3)
+            record = store.record.call_args[0][0]
+            self.assertEqual(record["moves"], [3, 4, 3])
+            self.assertEqual(record["winner"], 1)
+            self.assertEqual(record["players"], ["human", "ai"])
+
+            # A new game starts a new record, and quitting saves the
+            # games still queued
+            game._start_game()
+            self.assertEqual(game.record.moves, [])
+            pygame_events = [MagicMock()]
+            with patch('game.pygame') as pygame:
+                pygame_events[0].type = pygame.QUIT
+                pygame.event.wait.side_effect = pygame_events
+                self.assertRaises(SystemExit, game.game_loop)
+            store.close.assert_called_once_with()
+
+    def test_undo_redo(self) -> None:
+        with (patch('game.Screen'), patch('game.Color'), patch('game.Draw'),
+              patch('game.pygame') as pygame, patch('builtins.print')):
+            ai = MagicMock()
+            ai.player_number = 2
+            ai.thinking.return_value = False
+            game = Game(ai)
+            for column in (3, 4, 3, 4):
+                game.play_column(column)
+            # Against the computer, a move of each side is taken back
+            self.assertTrue(game.undo())
+            self.assertEqual(game.board.moves, [3, 4])
+            self.assertEqual(game.record.moves, [3, 4])
+            self.assertEqual(game.turn.turn_count, 2)
+            self.assertEqual(game.turn.player_turn, 1)
+            event = MagicMock()
+            event.type = pygame.KEYDOWN
+            event.key = pygame.K_r
+            game.handle_event(event)
+            self.assertEqual(game.board.moves, [3, 4, 3, 4])
+            self.assertEqual(game.record.moves, [3, 4, 3, 4])
+            self.assertEqual(game.turn.player_turn, 1)
+            event.key = pygame.K_u
+            game.handle_event(event)
+            self.assertEqual(game.board.moves, [3, 4])
+
+            # Ctrl+Y and Ctrl+Z redo and undo too, but not without Ctrl
+            pygame.KMOD_CTRL = 0x40
+            event.mod = 0
+            event.key = pygame.K_y
+            game.handle_event(event)
+            self.assertEqual(game.board.moves, [3, 4])
+            event.mod = pygame.KMOD_CTRL
+            game.handle_event(event)
+            self.assertEqual(game.board.moves, [3, 4, 3, 4])
+            event.key = pygame.K_z
+            game.handle_event(event)
+            self.assertEqual(game.board.moves, [3, 4])
+
+            # Nothing is taken back while the computer is thinking
+            ai.thinking.return_value = True
+            self.assertFalse(game.undo())
+            self.assertIsNone(game.redo())
+
+    def test_redo_win(self) -> None:
+        with (patch('game.Screen'), patch('game.Color'), patch('game.Draw'),
+              patch('game.pygame') as pygame, patch('builtins.print')):
+            game = Game()
+            game._print_winner_message = MagicMock()
+            for column in (0, 1, 0, 1, 0, 1):
+                game.play_column(column)
+            self.assertIsNotNone(game.play_column(0))
+            self.assertTrue(game.undo())
+            self.assertFalse(game.board.has_won(1))
+            self.assertEqual(game.turn.player_turn, 1)
+            self.assertEqual(game.redo(), pygame.time.get_ticks())
+            game._print_winner_message.assert_called_with(1)
+            game._start_game()
+            self.assertFalse(game.undo())
@@ -1,8 +1,15 @@
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
 from unittest.mock import MagicMock, Mock, patch
+import pygame
 from hypothesis import given, settings, strategies, assume
 
-from graphics import Color, Draw
+import graphics
+from graphics import (Color, Draw, OffscreenRenderer, Renderer, TextCache,
+                      export_positions)
 from board import Spot, Board
 
 
@@ -75,6 +82,8 @@ class TestDraw(unittest.TestCase):
                                          self.mock_board.width)]
         self.mock_board.get_player_at_spot = Mock(
             side_effect=lambda x, y: None)
+        self.mock_board.cells.return_value = bytes(100)
+        self.mock_board.occupied.return_value = []
         self.mock_radius = Mock()
 
         # Initialize Draw with the mock board
@@ -157,34 +166,263 @@ class TestDraw(unittest.TestCase):
         """
         Test the gameboard drawing function.
         """
-        # Mock the 'draw_rectangle' function
-        with (patch.object(self.draw, 'draw_rectangle') as mock_draw_rectangle,
-              # Mock the 'draw_circle' function
-              patch.object(self.draw, 'draw_circle') as mock_draw_circle,
-              # Mock the 'pygame.display.update' function
-              patch('pygame.display.update') as mock_update):
-            # Mock the occupant status of the spots on the board
-            self.mock_board.get_player_at_spot = Mock(return_value=None)
-
+        self.draw._board = self.mock_board
+        self.draw.clear_cache()
+        with patch('pygame.display.update') as mock_update:
             # call the 'draw.gameboard' function to use for the
             # following tests
             self.draw.gameboard()
 
-            # Check that 'draw_rectangle' was called the appropriate
-            # number of times given the mocked board (10x10)
-            self.assertEqual(mock_draw_rectangle.call_count, 100)
+            # Check that one rectangle covering the mocked board
+            # (10x10) was pushed to the display
+            size = self.draw.screen.square_size
+            mock_update.assert_called_once_with(
+                pygame.Rect(0, size, 10 * size, 10 * size))
+
+        # Check that the holes are empty (black) and the
+        # frame around them is blue
+        window = self.draw.screen.window
+        self.assertEqual(window.get_at((size // 2, size + size // 2))[:3],
+                         self.draw.color.black)
+        self.assertEqual(window.get_at((1, size + 1))[:3],
+                         self.draw.color.blue)
+
+    def test_sprite_cache(self) -> None:
+        """
+        Test that sprites and board images are
+        rendered once and reused.
+        """
+        board = Board()
+        self.draw._board = board
+        self.draw.clear_cache()
+        red = self.draw.sprite(self.draw.color.red)
+        self.assertIs(self.draw.sprite(self.draw.color.red), red)
+        self.assertEqual(red.get_size(), (self.draw.screen.square_size,) * 2)
+        size = self.draw.screen.square_size
+        frame = self.draw.frame()
+        self.assertIs(self.draw.frame(), frame)
+        self.assertEqual(frame.get_size(), (7 * size, 6 * size))
+
+        with patch('pygame.display.update'):
+            self.draw.gameboard()
+            self.draw.invalidate()
+            self.draw.gameboard()
+        self.assertEqual(len(self.draw._boards), 1)
+
+        # A board size change throws the cache away
+        self.draw._board = Board(cols=5, rows=4)
+        with patch('pygame.display.update'):
+            self.draw.gameboard()
+        self.assertIsNot(self.draw.sprite(self.draw.color.red), red)
+        self.assertEqual(self.draw.frame().get_size(), (5 * size, 4 * size))
+
+        # and so does a square size change, which also changes the radius
+        radius = self.draw.radius
+        self.draw.screen._square_size = size // 2
+        try:
+            red = self.draw.sprite(self.draw.color.red)
+            with patch('pygame.display.update'):
+                self.draw.gameboard()
+            self.assertLess(self.draw.radius, radius)
+            self.assertIsNot(self.draw.sprite(self.draw.color.red), red)
+            self.assertEqual(self.draw.sprite(self.draw.color.red).get_size(),
+                             (size // 2,) * 2)
+        finally:
+            self.draw.screen._square_size = size
+        self.draw._board = self.mock_board
+
+    def test_gameboard_cache_size(self) -> None:
+        """
+        Test that only the last board images drawn are kept.
+        """
+        board = Board()
+        self.draw._board = board
+        self.draw.clear_cache()
+        with patch('pygame.display.update'):
+            for col in range(5):
+                board.drop_piece(col, 1)
+                self.draw.invalidate()
+                self.draw.gameboard()
+        self.assertEqual(len(self.draw._boards), Renderer.BOARD_CACHE_SIZE)
+        self.assertIn(board.cells(), self.draw._boards)
+        self.draw._board = self.mock_board
+
+    def test_gameboard_dirty_cells(self) -> None:
+        """
+        Test that only changed cells are redrawn
+        and pushed to the display.
+        """
+        board = Board()
+        self.draw._board = board
+        self.draw.invalidate()
+        size = self.draw.screen.square_size
+        with patch('pygame.display.update') as mock_update:
+            # The first call draws the whole board at once
+            self.draw.gameboard()
+            mock_update.assert_called_once_with(
+                pygame.Rect(0, size, 7 * size, 6 * size))
+
+            # Nothing changed, so nothing is drawn
+            mock_update.reset_mock()
+            self.draw.gameboard()
+            mock_update.assert_not_called()
+
+            # One new piece redraws one cell
+            board.drop_piece(2, 1)
+            self.draw.gameboard()
+            mock_update.assert_called_once_with(
+                [pygame.Rect(2 * size, 6 * size, size, size)])
+            self.assertGreaterEqual(self.draw.render_time, 0.0)
+        self.assertEqual(self.draw.screen.window.get_at(
+            (2 * size + size // 2, 6 * size + size // 2))[:3],
+            self.draw.color.red)
+        self.draw._board = self.mock_board
+
+    def test_hover(self) -> None:
+        """
+        Test that the hovering piece only
+        updates the strip above the board.
+        """
+        strip = self.draw.hover_strip()
+        self.assertEqual(strip, pygame.Rect(
+            0, 0, self.draw.screen.window_width,
+            self.draw.screen.square_size))
+        with (patch.object(self.draw, 'draw_circle') as mock_draw_circle,
+              patch('pygame.display.update') as mock_update):
+            self.draw.hover(120, self.draw.color.yellow)
+            mock_draw_circle.assert_called_once_with(
+                self.draw.color.yellow,
+                (120, int(self.draw.screen.square_size / 2)))
+            mock_update.assert_called_once_with(strip)
+            mock_update.reset_mock()
+            self.assertEqual(self.draw.clear_hover(), strip)
+            mock_update.assert_called_once_with(strip)
+
+
+class TestOffscreenRenderer(unittest.TestCase):
+    def setUp(self):
+        """
+        Setup function for 'TestOffscreenRenderer'.
+        """
+        self.board = Board()
+        self.renderer = OffscreenRenderer(self.board, 20)
 
-            # Check that 'draw_circle' was called the appropriate
-            # number of times given the mocked board (10x10)
-            self.assertEqual(mock_draw_circle.call_count, 100)
+    def test_render(self) -> None:
+        """
+        Test drawing a board into memory.
+        """
+        self.assertIsInstance(self.renderer, Renderer)
+        self.assertNotIsInstance(self.renderer, Draw)
+        self.board.drop_piece(2, 1)
+        with patch('pygame.display.update') as mock_update:
+            image = self.renderer.render()
+            mock_update.assert_not_called()
+        self.assertEqual(image.get_size(), (140, 120))
+        color = self.renderer.color
+        self.assertEqual(image.get_at((50, 110))[:3], color.red)
+        self.assertEqual(image.get_at((70, 110))[:3], color.black)
 
-            # Check if any of the 'draw_circle' calls resulted in
-            # an empty (black) circle
-            empty_calls = [call for call in mock_draw_circle.call_args_list 
-                           if call[0][0] == self.draw.color.black]
+        # Another board of the same size is drawn on the same surface
+        other = Board()
+        other.drop_piece(3, 2)
+        image = self.renderer.render(other)
+        self.assertEqual(image.get_at((50, 110))[:3], color.black)
+        self.assertEqual(image.get_at((70, 110))[:3], color.yellow)
+        self.assertRaises(ValueError, self.renderer.render, Board(5, 4))
 
-            # Assert that the number of empty circles was greater than 0
-            self.assertGreater(len(empty_calls), 0)
+    def test_to_bytes(self) -> None:
+        """
+        Test getting a board image as raw RGB bytes.
+        """
+        self.board.drop_piece(0, 2)
+        data = self.renderer.to_bytes()
+        self.assertEqual(len(data), 140 * 120 * 3)
+        # The piece is in the bottom left cell, drawn last from the top
+        pixel = (110 * 140 + 10) * 3
+        self.assertEqual(tuple(data[pixel:pixel + 3]),
+                         self.renderer.color.yellow)
 
-            # Check that the pygame display was updated
-            mock_update.assert_called_once()
+    def test_export_positions(self) -> None:
+        """
+        Test saving many boards as pictures.
+        """
+        boards = [Board(), Board(), Board(5, 4)]
+        boards[1].drop_piece(3, 1)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = export_positions(boards, directory, "png", 20)
+            self.assertEqual([os.path.basename(path) for path in paths],
+                             ["000000.png", "000001.png", "000002.png"])
+            self.assertEqual(pygame.image.load(paths[2]).get_size(),
+                             (100, 80))
+            self.assertEqual(pygame.image.load(paths[1]).get_at(
+                (70, 110))[:3], self.renderer.color.red)
+            paths = export_positions(boards, directory, "raw", 20)
+            self.assertEqual(os.path.getsize(paths[0]), 140 * 120 * 3)
+            self.assertEqual(os.path.getsize(paths[2]), 100 * 80 * 3)
+            self.assertRaises(ValueError, export_positions, boards,
+                              directory, "gif")
+
+    def test_no_display(self) -> None:
+        """
+        Test that rendering offscreen never opens a window.
+        """
+        code = ("import pygame, board, graphics; "
+                "graphics.OffscreenRenderer(board.Board()).to_bytes(); "
+                "assert not pygame.display.get_init()")
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(graphics.__file__))
+        env.pop('SDL_VIDEODRIVER', None)
+        result = subprocess.run([sys.executable, "-c", code], env=env,
+                                capture_output=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class TestTextCache(unittest.TestCase):
+    def setUp(self):
+        """
+        Setup function for 'TestTextCache'.
+        """
+        self.text = TextCache()
+
+    def test_lazy(self) -> None:
+        """
+        Test that no font is loaded before
+        one is asked for.
+        """
+        with patch('pygame.font.SysFont') as mock_sysfont:
+            TextCache()
+            mock_sysfont.assert_not_called()
+        self.assertEqual(self.text.name, "monospace")
+
+    def test_font_loaded_once(self) -> None:
+        """
+        Test that each font size is looked
+        up only once.
+        """
+        with patch('pygame.font.SysFont') as mock_sysfont:
+            first = self.text.font(30)
+            self.assertIs(self.text.font(30), first)
+            mock_sysfont.assert_called_once_with("monospace", 30)
+
+    def test_label_memoized(self) -> None:
+        """
+        Test that labels are rendered once per
+        text, size and color.
+        """
+        with patch('pygame.font.SysFont') as mock_sysfont:
+            font = mock_sysfont()
+            label = self.text.label("Tie Game!", 75, (0, 0, 255))
+            self.assertIs(self.text.label("Tie Game!", 75, (0, 0, 255)),
+                          label)
+            font.render.assert_called_once_with("Tie Game!", 1, (0, 0, 255))
+            self.text.label("Tie Game!", 75, (255, 0, 0))
+            self.assertEqual(font.render.call_count, 2)
+
+    def test_preload(self) -> None:
+        """
+        Test loading fonts in the background.
+        """
+        self.text.preload((12, 14))
+        self.text._loader.join()
+        self.assertEqual(sorted(self.text._fonts), [12, 14])
+        label = self.text.label("Hi", 12, (255, 255, 0))
+        self.assertIsInstance(label, pygame.Surface)
@@ -17,3 +17,74 @@ class TestMain(unittest.TestCase):
         # Check that the 'game_loop function
         # was called once main was called.
         mock_loop.assert_called_once()
+
+    @patch('game.Game.game_loop')
+    def test_main_ai(self, mock_loop):
+        """
+        Test that the computer player is set up
+        from the command line.
+        """
+        with patch('main.Game') as Game:
+            main(["--ai", "1", "--ai-time", "0.5"])
+            ai = Game.call_args[0][0]
+            self.assertEqual(ai.player_number, 1)
+            self.assertEqual(ai._search.time_budget, 0.5)
+            Game().game_loop.assert_called_once()
+            main(["--ai", "2", "--ai-workers", "4"])
+            ai = Game.call_args[0][0]
+            self.assertEqual(ai._search.workers, 4)
+            ai.close()
+
+    @patch('game.Game.game_loop')
+    def test_main_board_size(self, mock_loop):
+        """
+        Test that the board size and run length are set up
+        from the command line.
+        """
+        with patch('main.Game') as Game:
+            main(["--cols", "9", "--rows", "7", "--connect", "5"])
+            self.assertEqual(Game.call_args[0][1:4], (9, 7, 5))
+
+    @patch('game.Game.game_loop')
+    def test_main_record(self, mock_loop):
+        """
+        Test that games are recorded to a file from the command line.
+        """
+        with (patch('main.Game') as Game,
+              patch('main.FileBackend') as FileBackend,
+              patch('main.RecordStore') as RecordStore):
+            main(["--record", "games.jsonl"])
+            FileBackend.assert_called_once_with("games.jsonl")
+            RecordStore.assert_called_once_with(FileBackend())
+            self.assertIs(Game.call_args[0][4], RecordStore())
+
+    @patch('game.Game.game_loop')
+    def test_main_profile(self, mock_loop):
+        """
+        Test that the game is profiled from the command line, and the
+        report and trace are saved when it ends.
+        """
+        with (patch('main.Game') as Game,
+              patch('main.Profiler') as Profiler,
+              patch('builtins.print') as mock_print):
+            main(["--overlay", "--trace", "trace.json"])
+            Profiler.assert_called_once_with(True, True)
+            self.assertIs(Game.call_args[0][5], Profiler())
+            Profiler().dump_trace.assert_called_once_with("trace.json")
+            mock_print.assert_any_call(Profiler().report())
+        with patch('main.Game') as Game:
+            main()
+            self.assertIsNone(Game.call_args[0][5])
+
+    def test_main_server(self):
+        """
+        Test that a game on a server is set up from the command line,
+        and the server is left when it ends.
+        """
+        with (patch('main.Connection') as Connection,
+              patch('main.NetworkGame') as NetworkGame):
+            main(["--server", "example.org:4444"])
+            Connection.open.assert_called_once_with("example.org", 4444)
+            NetworkGame.assert_called_once_with(Connection.open(), None,
+                                                None)
+            NetworkGame().game_loop.assert_called_once()
@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from hypothesis import given, strategies
+
+from profiler import Histogram, Profiler
+
+
+class Slow():
+    def work(self, value: int) -> int:
+        return value * 2
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets(self) -> None:
+        """
+        function to test counting durations in doubling buckets
+        """
+        histogram = Histogram()
+        for seconds in (0.0000005, 0.000001, 0.000003, 0.003):
+            histogram.add(seconds)
+        self.assertEqual(histogram.buckets[:3], [1, 1, 1])
+        self.assertEqual(histogram.buckets[12], 1)
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.total, 0.0030045)
+        self.assertAlmostEqual(histogram.mean, 0.0030045 / 4)
+        self.assertEqual(histogram.max, 0.003)
+        self.assertEqual(histogram.percentile(0.5), 0.000002)
+        self.assertEqual(histogram.percentile(1.0), 0.003)
+        self.assertEqual(Histogram().summary()["mean"], 0.0)
+
+    @given(strategies.lists(strategies.floats(0, 10), min_size=1))
+    def test_percentile(self, durations: list[float]) -> None:
+        """
+        function to test that percentiles are within a factor of two
+        """
+        histogram = Histogram()
+        for seconds in durations:
+            histogram.add(seconds)
+        median = sorted(durations)[(len(durations) - 1) // 2]
+        self.assertLessEqual(histogram.percentile(0.5), histogram.max)
+        self.assertGreaterEqual(histogram.percentile(0.5) * 2, median)
+
+
+class TestProfiler(unittest.TestCase):
+    def test_wrap(self) -> None:
+        """
+        function to test timing a method only while installed
+        """
+        original = Slow.__dict__["work"]
+        profiler = Profiler(trace=True)
+        profiler.install([(Slow, "work", "Slow.work")])
+        self.assertIsNot(Slow.__dict__["work"], original)
+        self.assertEqual(Slow().work(2), 4)
+        self.assertEqual(Slow.work.__name__, "work")
+        profiler.uninstall()
+        self.assertIs(Slow.__dict__["work"], original)
+        Slow().work(3)
+        self.assertEqual(profiler.histogram("Slow.work").count, 1)
+        profiler.wrap(Slow, "work")
+        Slow().work(3)
+        profiler.uninstall()
+        self.assertEqual(profiler.histogram("Slow.work").count, 2)
+
+    def test_frames(self) -> None:
+        """
+        function to test the frame and event rates
+        """
+        profiler = Profiler(overlay=True)
+        self.assertTrue(profiler.overlay)
+        with patch('profiler.time.perf_counter') as clock:
+            for now in (10.0, 10.5, 10.8, 11.4):
+                clock.return_value = now
+                profiler.begin_frame()
+                clock.return_value = now + 0.01
+                profiler.end_frame(now != 10.5)
+        # the frame ending at 10.01 is over a second old
+        self.assertEqual(profiler.fps, 3)
+        self.assertEqual(profiler.events_per_second, 2)
+        self.assertAlmostEqual(profiler.last_frame, 0.01)
+        self.assertEqual(profiler.frames.count, 4)
+        self.assertEqual(profiler.overlay_text(), "3 fps  10.0 ms  2 ev/s")
+
+    def test_report(self) -> None:
+        """
+        function to test the summary table
+        """
+        profiler = Profiler()
+        profiler.record("Board.has_won", time.perf_counter(), 0.002)
+        profiler.begin_frame()
+        profiler.end_frame()
+        self.assertEqual(list(profiler.summary()), ["frame", "Board.has_won"])
+        lines = profiler.report().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[2].startswith("Board.has_won"))
+        self.assertIn("2.000", lines[2])
+
+    def test_dump_trace(self) -> None:
+        """
+        function to test saving calls in the Trace Event format
+        """
+        profiler = Profiler(trace=True, trace_limit=3)
+        for index in range(5):
+            profiler.record("Draw.gameboard", time.perf_counter(), 0.001)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            self.assertEqual(profiler.dump_trace(path), 3)
+            with open(path) as trace:
+                events = json.load(trace)["traceEvents"]
+        self.assertEqual(len(events), 3)
+        self.assertEqual(events[0]["ph"], "X")
+        self.assertEqual(events[0]["name"], "Draw.gameboard")
+        self.assertAlmostEqual(events[0]["dur"], 1000)
+        self.assertEqual(profiler.histogram("Draw.gameboard").count, 5)
@@ -0,0 +1,176 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from typing import Any
+from unittest.mock import MagicMock, patch
+from hypothesis import given, strategies
+
+from records import (FileBackend, GameRecord, MongoBackend, RecordBackend,
+                     RecordStore)
+
+
+class FakeCollection():
+    """
+    Stand-in for a MongoDB collection, recording the batches inserted
+    and the thread that inserted them.
+    """
+    def __init__(self) -> None:
+        self.batches: list[list[dict[str, Any]]] = []
+        self.threads: set[str] = set()
+
+    def insert_many(self, documents: list[dict[str, Any]],
+                    ordered: bool = True) -> None:
+        for document in documents:
+            document["_id"] = id(document)
+        self.batches.append(documents)
+        self.threads.add(threading.current_thread().name)
+
+
+class FailingBackend(RecordBackend):
+    def write_batch(self, records: list[dict[str, Any]]) -> None:
+        raise OSError("disk full")
+
+
+class TestGameRecord(unittest.TestCase):
+    @given(strategies.lists(strategies.integers(0, 6), max_size=42),
+           strategies.integers(0, 2))
+    def test_to_dict(self, moves: list[int], winner: int) -> None:
+        """
+        function to test the recorded moves and result
+        """
+        record = GameRecord(7, 6, 4, ("human", "ai"))
+        for move in moves:
+            record.add_move(move)
+        record.finish(winner)
+        data = record.to_dict()
+        self.assertEqual(data["moves"], moves)
+        self.assertEqual(record.moves, moves)
+        self.assertEqual(len(record.move_times), len(moves))
+        self.assertTrue(all(t >= 0 for t in data["move_times"]))
+        self.assertEqual(data["winner"], winner)
+        self.assertEqual(record.winner, winner)
+        self.assertEqual(data["turns"], len(moves))
+        self.assertEqual((data["cols"], data["rows"], data["connect"]),
+                         (7, 6, 4))
+        self.assertEqual(data["players"], ["human", "ai"])
+        json.dumps(data)
+
+    def test_given_time(self) -> None:
+        """
+        function to test recording how long a move took
+        """
+        record = GameRecord()
+        record.add_move(3, 0.25)
+        self.assertEqual(record.move_times, [0.25])
+
+    def test_undo_move(self) -> None:
+        """
+        function to test forgetting a move taken back
+        """
+        record = GameRecord()
+        record.add_move(3, 0.5)
+        record.add_move(4, 0.25)
+        record.undo_move()
+        self.assertEqual(record.moves, [3])
+        self.assertEqual(record.move_times, [0.5])
+
+
+class TestBackends(unittest.TestCase):
+    def test_abstract(self) -> None:
+        """
+        function to test that a backend must say how it writes batches
+        """
+        self.assertRaises(TypeError, RecordBackend)
+        FailingBackend().close()
+
+    def test_file_backend(self) -> None:
+        """
+        function to test that batches are appended as JSON lines
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.jsonl")
+            backend = FileBackend(path)
+            self.assertEqual(backend.path, path)
+            backend.write_batch([{"game": 1}, {"game": 2}])
+            backend.close()
+            backend = FileBackend(path)
+            backend.write_batch([{"game": 3}])
+            backend.close()
+            with open(path) as games:
+                self.assertEqual([json.loads(line)["game"]
+                                  for line in games], [1, 2, 3])
+
+    def test_mongo_backend(self) -> None:
+        """
+        function to test inserting into a collection without changing
+        the records
+        """
+        collection = FakeCollection()
+        backend = MongoBackend(collection)
+        records = [{"game": 1}]
+        backend.write_batch(records)
+        self.assertEqual(records, [{"game": 1}])
+        self.assertEqual(collection.batches[0][0]["game"], 1)
+
+    def test_mongo_connect(self) -> None:
+        """
+        function to test connecting to a server
+        """
+        with patch.dict('sys.modules', {'pymongo': MagicMock()}):
+            import pymongo
+            backend = MongoBackend.connect("mongodb://localhost")
+            pymongo.MongoClient.assert_called_once_with("mongodb://localhost")
+            self.assertIs(backend._collection,
+                          pymongo.MongoClient()["connect4"]["games"])
+
+
+class TestRecordStore(unittest.TestCase):
+    def test_batches(self) -> None:
+        """
+        function to test that records are written in batches by the
+        writer thread
+        """
+        collection = FakeCollection()
+        store = RecordStore(MongoBackend(collection), batch_size=10,
+                            flush_interval=5.0)
+        self.assertIsInstance(store.backend, MongoBackend)
+        for game in range(25):
+            store.record({"game": game})
+        store.close()
+        self.assertEqual(store.written, 25)
+        self.assertEqual([len(batch) for batch in collection.batches],
+                         [10, 10, 5])
+        self.assertEqual([record["game"] for batch in collection.batches
+                          for record in batch], list(range(25)))
+        self.assertNotIn(threading.current_thread().name, collection.threads)
+
+    def test_flush(self) -> None:
+        """
+        function to test waiting for a partial batch
+        """
+        collection = FakeCollection()
+        store = RecordStore(MongoBackend(collection), batch_size=10,
+                            flush_interval=0.01)
+        store.record({"game": 1})
+        store.flush()
+        self.assertEqual(store.written, 1)
+        store.record({"game": 2})
+        store.flush()
+        self.assertEqual(len(collection.batches), 2)
+        store.close()
+        store.close()
+
+    def test_errors(self) -> None:
+        """
+        function to test that a failing backend does not stop the store
+        """
+        store = RecordStore(FailingBackend(), flush_interval=0.01)
+        with patch('builtins.print') as mock_print:
+            store.record({"game": 1})
+            store.flush()
+            store.close()
+        self.assertEqual(store.errors, 1)
+        self.assertEqual(store.written, 0)
+        mock_print.assert_called_once()
@@ -0,0 +1,76 @@
+import unittest
+from hypothesis import given
+import hypothesis.strategies as some
+
+from unittest.mock import patch
+
+from screen import OffscreenScreen, Screen
+
+
+class TestScreen(unittest.TestCase):
+    def setUp(self):
+        self.screen: Screen = Screen(6, 7)
+
+    def test_init(self) -> None:
+        """
+        function to test the window dimensions
+        """
+        self.assertEqual(self.screen.square_size, 100)
+        self.assertEqual(self.screen.window_size, (700, 700))
+        self.assertEqual(self.screen.window.get_size(), (700, 700))
+
+    def test_scaled_to_fit(self) -> None:
+        """
+        function to test that large boards get smaller squares
+        """
+        screen: Screen = Screen(20, 20)
+        self.assertEqual(screen.square_size, Screen.MAX_SIZE // 21)
+        self.assertEqual(screen.window_size, (20 * screen.square_size,
+                                              21 * screen.square_size))
+
+    def test_update(self) -> None:
+        """
+        function to test pushing the window to the display
+        """
+        with patch('pygame.display.update') as mock_update:
+            self.screen.update()
+            mock_update.assert_called_once_with()
+            self.screen.update([self.screen.window.get_rect()])
+            mock_update.assert_called_with([self.screen.window.get_rect()])
+
+    def test_offscreen(self) -> None:
+        """
+        function to test a screen drawn in memory
+        """
+        with (patch('pygame.display.set_mode') as mock_set_mode,
+              patch('pygame.display.update') as mock_update):
+            screen: Screen = OffscreenScreen(6, 7, 20)
+            screen.update()
+            mock_set_mode.assert_not_called()
+            mock_update.assert_not_called()
+        self.assertEqual(screen.square_size, 20)
+        self.assertEqual(screen.window.get_size(), (140, 140))
+
+    @given(some.tuples(some.integers(), some.integers()))
+    def test_window_size_getter(self, test_tuple: tuple[int, int]) -> None:
+        """
+        function to test the window_size getter property
+        """
+        self.screen._window_size = test_tuple
+        self.assertEqual(self.screen.window_size, test_tuple)
+
+    @given(some.integers())
+    def test_window_width_getter(self, test_int: int) -> None:
+        """
+        function to test the window_width getter
+        """
+        self.screen._window_width = test_int
+        self.assertEqual(self.screen.window_width, test_int)
+
+    @given(some.integers())
+    def test_window_height_getter(self, test_int: int) -> None:
+        """
+        function to test the window_height getter
+        """
+        self.screen._window_height = test_int
+        self.assertEqual(self.screen.window_height, test_int)
@@ -0,0 +1,144 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from server import GameServer, Match, MoveError, Session, load, main
+
+
+async def connect(port: int) -> tuple[asyncio.StreamReader,
+                                      asyncio.StreamWriter]:
+    """
+    Connect to a local server and read its greeting.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    await reader.readline()
+    return reader, writer
+
+
+async def send(player: tuple[asyncio.StreamReader, asyncio.StreamWriter],
+               line: bytes, replies: int = 1) -> list[bytes]:
+    """
+    Send a line and read the replies to it.
+    """
+    reader, writer = player
+    writer.write(line)
+    return [await reader.readline() for reply in range(replies)]
+
+
+class TestMatch(unittest.TestCase):
+    def test_play(self) -> None:
+        """
+        function to test playing a headless match to a win
+        """
+        match = Match()
+        first, second = Session(None), Session(None)  # type: ignore
+        match.begin(first, second)
+        self.assertEqual((first.match, second.player_number), (match, 2))
+        self.assertRaises(MoveError, match.play, 2, 0)
+        self.assertRaises(MoveError, match.play, 1, 7)
+        for turn, col in enumerate((0, 1, 0, 1, 0, 1)):
+            self.assertIsNone(match.play(1 + turn % 2, col))
+        self.assertEqual(match.play(1, 0), 1)
+        self.assertEqual(match.finish(), (first, second))
+        self.assertIsNone(first.match)
+        self.assertLess(match.memory_footprint(), 2048)
+
+    def test_tie(self) -> None:
+        """
+        function to test a full board ending in a tie
+        """
+        match = Match(2, 2, 3)
+        match.begin(Session(None), Session(None))  # type: ignore
+        self.assertIsNone(match.play(1, 0))
+        self.assertIsNone(match.play(2, 0))
+        self.assertRaises(MoveError, match.play, 1, 0)
+        self.assertIsNone(match.play(1, 1))
+        self.assertEqual(match.play(2, 1), 0)
+
+
+class TestGameServer(unittest.TestCase):
+    def test_game(self) -> None:
+        """
+        function to test two players finding each other and playing
+        """
+        async def play() -> None:
+            server = GameServer()
+            port = await server.start()
+            first = await connect(port)
+            second = await connect(port)
+            self.assertEqual(await send(first, b"PLAY\n"), [b"WAIT\n"])
+            self.assertEqual(await send(second, b"PLAY\n"), [b"START 2\n"])
+            self.assertEqual(await first[0].readline(), b"START 1\n")
+            self.assertEqual(server.matches, 1)
+            self.assertEqual(await send(second, b"MOVE 3\n"),
+                             [b"ERROR not your turn\n"])
+            self.assertEqual(await send(first, b"MOVE x\n"),
+                             [b"ERROR no such column\n"])
+            for turn in range(6):
+                player = (first, second)[turn % 2]
+                col = b"%d" % (turn % 2)
+                moved = b"MOVED %d %s\n" % (1 + turn % 2, col)
+                self.assertEqual(await send(player, b"MOVE " + col + b"\n"),
+                                 [moved])
+                self.assertEqual(await (first, second)[1 - turn % 2][0]
+                                 .readline(), moved)
+            self.assertEqual(await send(first, b"MOVE 0\n", 2),
+                             [b"MOVED 1 0\n", b"WIN 1\n"])
+            self.assertEqual(await send(second, b"HELLO\n", 3),
+                             [b"MOVED 1 0\n", b"WIN 1\n",
+                              b"ERROR unknown command\n"])
+            self.assertEqual((server.matches, server.pooled), (0, 1))
+            self.assertEqual(await send(second, b"MOVE 0\n"),
+                             [b"ERROR not in a game\n"])
+            for player in (first, second):
+                player[1].close()
+            await server.close()
+        asyncio.run(play())
+
+    def test_leave(self) -> None:
+        """
+        function to test the opponent of a player who leaves
+        """
+        async def play() -> None:
+            server = GameServer()
+            port = await server.start()
+            first = await connect(port)
+            second = await connect(port)
+            await send(first, b"PLAY\n")
+            await send(second, b"PLAY\n")
+            await first[0].readline()
+            self.assertEqual(await send(first, b"PLAY\n"),
+                             [b"ERROR already playing\n"])
+            second[1].write(b"QUIT\n")
+            self.assertEqual(await first[0].readline(), b"LEFT\n")
+            self.assertEqual(await second[0].readline(), b"")
+            self.assertEqual(server.matches, 0)
+            first[1].close()
+            await first[1].wait_closed()
+            await asyncio.sleep(0.01)
+            self.assertEqual(server.sessions, 0)
+            await server.close()
+        asyncio.run(play())
+
+    def test_load(self) -> None:
+        """
+        function to test many games at once
+        """
+        async def play() -> None:
+            server = GameServer()
+            port = await server.start()
+            latencies = await load("127.0.0.1", port, 50)
+            self.assertGreaterEqual(latencies.count, 50 * 4)
+            # Every finished match was kept to be reused
+            self.assertEqual((server.matches, server.pooled), (0, 50))
+            await server.close()
+        asyncio.run(play())
+
+    def test_main(self) -> None:
+        """
+        function to test the load test entry point
+        """
+        with patch('builtins.print') as mock_print:
+            main(["--port", "0", "--load", "5"])
+        self.assertTrue(mock_print.call_args_list[1][0][0]
+                        .startswith("5 games"))
@@ -0,0 +1,121 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from hypothesis import given, settings, strategies
+
+from archive import ArchiveReader
+from board import Board
+from simulate import (GreedyPolicy, Policy, RandomPolicy, SearchPolicy,
+                      main, make_policy, play_game, play_games, simulate)
+
+
+class TestPolicies(unittest.TestCase):
+    def test_make_policy(self) -> None:
+        """
+        function to test building policies by name
+        """
+        self.assertIsInstance(make_policy("random"), RandomPolicy)
+        self.assertIsInstance(make_policy("greedy"), GreedyPolicy)
+        self.assertIsInstance(make_policy("ai"), SearchPolicy)
+        self.assertRaises(ValueError, make_policy, "psychic")
+        # A policy must say how it chooses
+        self.assertRaises(TypeError, Policy)
+
+    def test_random_full_column(self) -> None:
+        """
+        function to test that random play avoids full columns
+        """
+        board = Board()
+        for col in range(6):
+            for row in range(6):
+                board.drop_piece(col, 1 + (row + col // 2) % 2)
+        self.assertEqual(RandomPolicy(1).choose(board, 1), 6)
+
+    def test_greedy(self) -> None:
+        """
+        function to test that greedy play wins, then blocks
+        """
+        board = Board()
+        for col in (1, 2, 3):
+            board.drop_piece(col, 1)
+        self.assertIn(GreedyPolicy(0).choose(board, 1), (0, 4))
+        self.assertIn(GreedyPolicy(0).choose(board, 2), (0, 4))
+        board.drop_piece(6, 2)
+        board.drop_piece(6, 2)
+        board.drop_piece(6, 2)
+        self.assertEqual(GreedyPolicy(0).choose(board, 2), 6)
+
+
+class TestPlay(unittest.TestCase):
+    @settings(deadline=None)
+    @given(strategies.integers(0, 1000))
+    def test_play_game(self, seed: int) -> None:
+        """
+        function to test that a recorded game replays to its result
+        """
+        record = play_game((RandomPolicy(seed), GreedyPolicy(seed + 1)))
+        self.assertEqual(record["turns"], len(record["moves"]))
+        self.assertEqual(len(record["move_times"]), len(record["moves"]))
+        board = Board()
+        for turn, col in enumerate(record["moves"]):
+            board.drop_piece(col, 1 + turn % 2)
+        for player in (1, 2):
+            self.assertEqual(board.has_won(player),
+                             record["winner"] == player)
+        if record["winner"] == 0:
+            self.assertEqual(record["turns"], 42)
+
+    def test_play_game_connect_n(self) -> None:
+        """
+        function to test games on a larger board with five in a row
+        """
+        record = play_game((GreedyPolicy(1), GreedyPolicy(2)), 9, 7, 5)
+        board = Board(9, 7, 5)
+        for turn, col in enumerate(record["moves"]):
+            board.drop_piece(col, 1 + turn % 2)
+        if record["winner"]:
+            self.assertTrue(board.has_won(record["winner"]))
+        else:
+            self.assertEqual(record["turns"], 63)
+
+    def test_play_games(self) -> None:
+        """
+        function to test that batches are numbered and reproducible
+        """
+        records = play_games(10, 3, ("random", "random"), seed=4)
+        self.assertEqual([r["game"] for r in records], [10, 11, 12])
+        self.assertEqual(records[0]["players"], ["random", "random"])
+        again = play_games(10, 3, ("random", "random"), seed=4)
+        self.assertEqual([r["moves"] for r in records],
+                         [r["moves"] for r in again])
+
+    def test_simulate(self) -> None:
+        """
+        function to test playing games over a process pool
+        """
+        output = io.StringIO()
+        totals = simulate(25, ("greedy", "random"), output, workers=2,
+                          batch_size=10)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 25)
+        self.assertEqual(sum(totals.values()), 25)
+        games = sorted(json.loads(line)["game"] for line in lines)
+        self.assertEqual(games, list(range(25)))
+
+    def test_main(self) -> None:
+        """
+        function to test the command line entry point
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.jsonl")
+            archive = os.path.join(directory, "games.c4a")
+            with patch('builtins.print'):
+                main(["--games", "5", "--workers", "1", "--output", path,
+                      "--archive", archive])
+            with open(path) as results:
+                self.assertEqual(len(results.readlines()), 5)
+            with ArchiveReader(archive) as reader:
+                self.assertEqual(len(reader), 5)
@@ -0,0 +1,257 @@
+import io
+import os
+import struct
+import tempfile
+import unittest
+from unittest.mock import patch
+from hypothesis import given, settings, strategies
+
+from ai import SearchTimeout
+from bitboard import BitBoard
+from solver import (OpeningBook, Solution, Solver, book_positions,
+                    build_book, import_book, load_book, main, position_key)
+
+
+def play(moves: str, cols: int = 7, rows: int = 6,
+         connect: int = 4) -> BitBoard:
+    """
+    Build the position reached by a string of columns, 1 being the
+    leftmost.
+    """
+    state = BitBoard(cols, rows, connect)
+    for turn, move in enumerate(moves):
+        state.drop(int(move) - 1, 1 + turn % 2)
+    return state
+
+
+def minimax(state: BitBoard, player_number: int, played: int) -> int:
+    """
+    Score a small position by searching every move.
+    """
+    cells = state.cols * state.rows
+    best = -cells
+    for col in range(state.cols):
+        if not state.can_play(col):
+            continue
+        row = state.drop(col, player_number)
+        if state.wins_at(col, row, player_number):
+            score = (cells + 1 - played) // 2
+        elif played + 1 == cells:
+            score = 0
+        else:
+            score = -minimax(state, 3 - player_number, played + 1)
+        state.undo(col)
+        best = max(best, score)
+    return best
+
+
+class TestSolution(unittest.TestCase):
+    def test_properties(self) -> None:
+        """
+        function to test the solution getters
+        """
+        solution = Solution(3, 9, 100, 0.5)
+        self.assertEqual(solution.score, 3)
+        self.assertEqual(solution.outcome, "win")
+        self.assertEqual(solution.distance, 9)
+        self.assertEqual(solution.nodes, 100)
+        self.assertEqual(solution.elapsed, 0.5)
+        self.assertEqual(Solution(-1, 2, 0, 0.0).outcome, "loss")
+        self.assertEqual(Solution(0, 2, 0, 0.0).outcome, "draw")
+
+
+class TestSolver(unittest.TestCase):
+    def setUp(self) -> None:
+        self.solver: Solver = Solver()
+
+    @settings(deadline=None, max_examples=50)
+    @given(strategies.permutations(list(range(5)) * 4))
+    def test_matches_minimax(self, moves: list[int]) -> None:
+        """
+        function to test exact scores against a full search on a
+        small board
+        """
+        state = BitBoard(5, 4)
+        played = 0
+        for col in moves:
+            if played == 12:
+                break
+            # Skip the moves that would end the game
+            row = state.drop(col, 1 + played % 2)
+            if state.wins_at(col, row, 1 + played % 2):
+                state.undo(col)
+            else:
+                played += 1
+        player = 1 + played % 2
+        solution = self.solver.solve(state, player)
+        self.assertEqual(solution.score, minimax(state, player, played))
+
+    def test_win_in_one(self) -> None:
+        """
+        function to test a win on the next move
+        """
+        solution = self.solver.solve(play("112233"), 1)
+        self.assertEqual(solution.outcome, "win")
+        self.assertEqual(solution.distance, 1)
+        self.assertEqual(solution.score, (42 + 1 - 6) // 2)
+        self.assertEqual(self.solver.best_move(play("112233"), 1), 3)
+
+    def test_loss_in_two(self) -> None:
+        """
+        function to test a position with two threats to block
+        """
+        # Player 1 threatens both ends of 2-3-4 on the bottom row
+        state = play("2737")
+        state.drop(3, 1)
+        solution = self.solver.solve(state, 2)
+        self.assertEqual(solution.outcome, "loss")
+        self.assertEqual(solution.distance, 2)
+
+    def test_distance(self) -> None:
+        """
+        function to test converting scores back to game lengths
+        """
+        self.assertEqual(Solver.distance(0, 30, 42), 12)
+        self.assertEqual(Solver.distance(18, 6, 42), 1)
+        self.assertEqual(Solver.distance(19, 5, 42), 1)
+        self.assertEqual(Solver.distance(18, 5, 42), 3)
+        self.assertEqual(Solver.distance(-18, 5, 42), 2)
+
+    def test_game_over(self) -> None:
+        """
+        function to test that finished games are not solved
+        """
+        self.assertRaises(ValueError, self.solver.solve, play("1212121"), 2)
+        self.assertRaises(ValueError, self.solver.best_move,
+                          play("1212121"), 2)
+
+    def test_time_budget(self) -> None:
+        """
+        function to test that a hard position runs out of time
+        """
+        solver = Solver(time_budget=0.05)
+        self.assertRaises(SearchTimeout, solver.solve, BitBoard(), 1)
+
+    def test_book(self) -> None:
+        """
+        function to test that book positions are not searched
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.bin")
+            scores = {position_key(state, player): -5 for key,
+                      (state, player) in book_positions(7, 6, 2).items()}
+            OpeningBook.write(path, 7, 6, 2, scores)
+            book = OpeningBook(path)
+            solver = Solver(book)
+            self.assertEqual(solver.solve(play("44"), 1).score, -5)
+            self.assertEqual(solver.nodes, 0)
+            # Every reply to the first move scores -5, so the first
+            # move scores 5 and the center is played
+            self.assertEqual(solver.best_move(play("4"), 2), 3)
+            # A book for another board is ignored
+            self.assertIsNot(Solver(book).solve(play("44", 5, 4), 1).score,
+                             -5)
+            book.close()
+
+
+class TestOpeningBook(unittest.TestCase):
+    def test_write_and_lookup(self) -> None:
+        """
+        function to test reading back a written book
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.bin")
+            OpeningBook.write(path, 7, 6, 3, {5: 1, 1 << 48: -7, 20: 0})
+            book = load_book(path)
+            assert book is not None
+            self.assertEqual((book.cols, book.rows, book.depth), (7, 6, 3))
+            self.assertEqual(len(book), 3)
+            self.assertEqual(book.lookup(5), 1)
+            self.assertEqual(book.lookup(1 << 48), -7)
+            self.assertEqual(book.lookup(20), 0)
+            self.assertIsNone(book.lookup(6))
+            self.assertIsNone(book.lookup(1 << 50))
+            book.close()
+
+    def test_byte_layout(self) -> None:
+        """
+        function to test that a book is little-endian on any machine
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.bin")
+            OpeningBook.write(path, 7, 6, 3, {1 << 48: -7, 5: 1})
+            with open(path, "rb") as book_file:
+                data = book_file.read()
+            self.assertEqual(data, struct.pack("<4sBBBBIi2Q2b", b"C4BK", 1,
+                                               7, 6, 3, 2, 0, 5, 1 << 48,
+                                               1, -7))
+            book = OpeningBook(path)
+            self.assertEqual(book.lookup(1 << 48), -7)
+            book.close()
+
+    def test_missing_and_invalid(self) -> None:
+        """
+        function to test opening files that are not books
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.bin")
+            self.assertIsNone(load_book(path))
+            with open(path, "wb") as book:
+                book.write(b"not a book at all")
+            self.assertRaises(ValueError, OpeningBook, path)
+
+    def test_book_positions(self) -> None:
+        """
+        function to test the positions a book holds
+        """
+        positions = book_positions(7, 6, 2)
+        # Mirror images are kept once: the first move in 4 columns and
+        # 25 pairs of moves, since only playing the center twice is its
+        # own mirror image
+        self.assertEqual(len(positions), 1 + 4 + 25)
+        self.assertEqual(position_key(play("12"), 1),
+                         position_key(play("76"), 1))
+        # Transposed moves reach the same position
+        deeper = book_positions(7, 6, 3)
+        self.assertIn(position_key(play("123"), 2), deeper)
+        self.assertEqual(position_key(play("123"), 2),
+                         position_key(play("321"), 2))
+        self.assertLess(len(deeper), len(positions) + 7 ** 3)
+
+    def test_import_book(self) -> None:
+        """
+        function to test importing scores solved elsewhere
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.bin")
+            lines = io.StringIO("\n4 -1\n44 1\n")
+            self.assertEqual(import_book(lines, path), 2)
+            book = OpeningBook(path)
+            self.assertEqual(book.depth, 2)
+            self.assertEqual(book.lookup(position_key(play("44"), 1)), 1)
+            book.close()
+
+    def test_build_book(self) -> None:
+        """
+        function to test solving a book on a small board
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.bin")
+            count = build_book(path, 6, 4, 4)
+            book = OpeningBook(path)
+            self.assertEqual(len(book), count)
+            state = play("1234", 4, 4)
+            self.assertEqual(book.lookup(position_key(state, 1)),
+                             Solver().solve(state, 1).score)
+            book.close()
+
+    def test_main(self) -> None:
+        """
+        function to test the command line entry point
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.bin")
+            with patch('builtins.print') as mock_print:
+                main(["112233", "--book", path])
+            mock_print.assert_called_once()
+            self.assertTrue(mock_print.call_args[0][0].startswith("win in 1"))
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from archive import ArchiveReader, ArchiveWriter
+from thumbnails import archived_boards, main
+
+
+class TestThumbnails(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path: str = os.path.join(self.directory.name, "games.c4a")
+        with ArchiveWriter(self.path) as archive:
+            archive.write([3, 3, 4, 4, 5, 5, 6], 1)
+            archive.write([0, 1], 0)
+            archive.write([2], 0)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_archived_boards(self) -> None:
+        """
+        function to test replaying archived games
+        """
+        with ArchiveReader(self.path) as reader:
+            boards = list(archived_boards(reader))
+            self.assertEqual([len(board.moves) for board in boards],
+                             [7, 2, 1])
+            self.assertTrue(boards[0].has_won(1))
+            boards = list(archived_boards(reader, 1, 2))
+            self.assertEqual([board.moves for board in boards], [[3], [0]])
+
+    def test_main(self) -> None:
+        """
+        function to test saving pictures of an archive
+        """
+        output = os.path.join(self.directory.name, "pictures")
+        with patch('builtins.print'):
+            main([self.path, output, "--limit", "2"])
+        self.assertEqual(sorted(os.listdir(output)),
+                         ["000000.png", "000001.png"])
+        with patch('builtins.print'):
+            main([self.path, output, "--format", "raw", "--square-size",
+                  "12"])
+        self.assertEqual(os.path.getsize(os.path.join(output, "000002.rgb")),
+                         7 * 12 * 6 * 12 * 3)
@@ -0,0 +1,83 @@
+import unittest
+from hypothesis import given, strategies
+
+from transposition import TranspositionTable
+
+
+class TestTranspositionTable(unittest.TestCase):
+    def setUp(self) -> None:
+        self.table: TranspositionTable = TranspositionTable(size=16)
+
+    def test_init(self) -> None:
+        """
+        function to test the constructor and its validation
+        """
+        self.assertEqual(self.table.size, 16)
+        self.assertEqual(self.table.policy, TranspositionTable.DEPTH_PREFERRED)
+        self.assertRaises(ValueError, TranspositionTable, 0)
+        self.assertRaises(ValueError, TranspositionTable, 16, "never")
+
+    @given(strategies.integers(min_value=0, max_value=2 ** 65),
+           strategies.integers(0, 42), strategies.integers(-100, 100))
+    def test_store_and_lookup(self, key: int, depth: int, score: int) -> None:
+        """
+        function to test that stored results can be found again
+        """
+        table = TranspositionTable(size=16)
+        table.store(key, depth, score, TranspositionTable.LOWER, 3)
+        self.assertEqual(table.lookup(key),
+                         (depth, score, TranspositionTable.LOWER, 3))
+        self.assertEqual(table.hits, 1)
+
+    def test_counters(self) -> None:
+        """
+        function to test the hit, miss and collision counters
+        """
+        self.assertIsNone(self.table.lookup(5))
+        self.table.store(5, 1, 0, TranspositionTable.EXACT, 0)
+        self.assertIsNotNone(self.table.lookup(5))
+        self.assertIsNone(self.table.lookup(21))
+        self.assertEqual((self.table.hits, self.table.misses,
+                          self.table.collisions), (1, 2, 1))
+        self.table.clear()
+        self.assertEqual((self.table.hits, self.table.misses,
+                          self.table.collisions), (0, 0, 0))
+        self.assertIsNone(self.table.lookup(5))
+
+    def test_depth_preferred(self) -> None:
+        """
+        function to test that deeper results are kept
+        """
+        self.table.store(5, 6, 1, TranspositionTable.EXACT, 0)
+        self.table.store(21, 2, 2, TranspositionTable.EXACT, 0)
+        self.assertIsNone(self.table.lookup(21))
+        self.assertEqual(self.table.lookup(5)[1], 1)
+        self.table.store(5, 1, 3, TranspositionTable.EXACT, 0)
+        self.assertEqual(self.table.lookup(5)[1], 3)
+
+    def test_new_search(self) -> None:
+        """
+        function to test that deeper results of an earlier search give
+        way to shallower ones
+        """
+        self.table.store(5, 6, 1, TranspositionTable.EXACT, 0)
+        self.table.new_search()
+        self.assertEqual(self.table.generation, 1)
+        # still found by the new search
+        self.assertEqual(self.table.lookup(5)[1], 1)
+        self.table.store(21, 2, 2, TranspositionTable.EXACT, 0)
+        self.assertIsNone(self.table.lookup(5))
+        self.assertEqual(self.table.lookup(21)[1], 2)
+        # but kept from the rest of the new search's shallower results
+        self.table.store(5, 1, 3, TranspositionTable.EXACT, 0)
+        self.assertEqual(self.table.lookup(21)[1], 2)
+
+    def test_always_replace(self) -> None:
+        """
+        function to test that the newest result is kept
+        """
+        table = TranspositionTable(16, TranspositionTable.ALWAYS_REPLACE)
+        table.store(5, 6, 1, TranspositionTable.EXACT, 0)
+        table.store(21, 2, 2, TranspositionTable.EXACT, 0)
+        self.assertIsNone(table.lookup(5))
+        self.assertEqual(table.lookup(21)[1], 2)
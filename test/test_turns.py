@@ -64,4 +64,24 @@ class TestTurns(unittest.TestCase):
         """
         self.turns._turn_count = test_int
         self.turns._increment_turn()
-        self.assertEqual(self.turns._turn_count, test_int + 1)
\ No newline at end of file
+        self.assertEqual(self.turns._turn_count, test_int + 1)
+
+    def test_turns_left(self) -> None:
+        """
+        function to test the turns left on a custom board size
+        """
+        turns: Turns = Turns(20 * 20)
+        self.assertEqual(self.turns.max_turns, 42)
+        self.assertEqual(turns.max_turns, 400)
+        turns._increment_turn()
+        self.assertEqual(turns.turns_left, 399)
+
+    def test_undo_turn(self) -> None:
+        """
+        function to test taking back a turn
+        """
+        self.turns._increment_turn()
+        self.turns._switch_player()
+        self.turns.undo_turn(1)
+        self.assertEqual(self.turns.turn_count, 0)
+        self.assertEqual(self.turns.player_turn, 1)